@@ -0,0 +1,64 @@
+"""
+Summarize data/runs.jsonl by prompt version (and optionally time window):
+p50/p95/p99 latency, token and cost totals, cache hits, coalesced runs and most retrieved chunk IDs.
+Usage: python scripts/analyze_runs.py [--window 3600] [--top 5] [--json] [--rebuild]
+An index next to the log stores aggregates and the offset read, so repeat runs only
+read lines appended since the last call.
+"""
+
+import argparse
+import json
+import sys
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from src.config import RUN_LOG_PATH
+from src.run_analytics import summarize, update_index
+
+
+def _fmt_window(start) -> str:
+    if start is None:
+        return "-"
+    return datetime.fromtimestamp(start, tz=timezone.utc).strftime("%Y-%m-%d %H:%M")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Prompt-version analytics over runs.jsonl.")
+    parser.add_argument("--log", type=Path, default=RUN_LOG_PATH)
+    parser.add_argument("--window", type=int, default=0, help="Group by time window of N seconds (0 = whole log).")
+    parser.add_argument("--top", type=int, default=5, help="Most frequent chunk IDs to show per row.")
+    parser.add_argument("--json", action="store_true", help="Print rows as JSON lines.")
+    parser.add_argument("--rebuild", action="store_true", help="Ignore the saved index and rescan everything.")
+    args = parser.parse_args()
+
+    t0 = time.perf_counter()
+    groups = update_index(args.log, window_seconds=args.window, rebuild=args.rebuild)
+    rows = summarize(groups, by_window=bool(args.window), top_chunks=args.top)
+    elapsed = time.perf_counter() - t0
+    if args.json:
+        for row in rows:
+            print(json.dumps(row))
+        return
+    if not rows:
+        print("No runs logged in", args.log)
+        return
+    header = f"{'prompt':<10} {'window (UTC)':<16} {'runs':>7} {'cached':>7} {'shared':>7} {'p50 s':>7} {'p95 s':>7} {'p99 s':>7} {'in tok':>10} {'out tok':>10} {'cost $':>10}"
+    print(header)
+    print("-" * len(header))
+    for r in rows:
+        print(
+            f"{r['prompt_version']:<10} {_fmt_window(r['window_start']) if args.window else 'all':<16} {r['runs']:>7} "
+            f"{r['cache_hits']:>7} {r['coalesced']:>7} {r['latency_p50']:>7.3f} {r['latency_p95']:>7.3f} {r['latency_p99']:>7.3f} "
+            f"{r['input_tokens']:>10} {r['output_tokens']:>10} {r['cost_usd']:>10.4f}"
+        )
+        if r["top_chunks"]:
+            print("           top chunks:", ", ".join(f"{cid} ({n})" for cid, n in r["top_chunks"]))
+    print(f"\n({elapsed:.2f}s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,456 @@
+"""
+Offline load test: runs ingest, the pipeline, the FastAPI app and the batch eval engine
+against tests/fake_openai.py (deterministic chat + embeddings with configurable latency),
+so throughput, latency and memory can be compared between commits without Azure.
+A synthetic corpus is written to a temp dir (data/ and docs/ are never touched) and each
+workload runs in its own child process, so peak RSS is per workload. The query and http
+workloads are open-loop: requests start on schedule at --qps whether or not earlier ones
+have finished, and latency is measured from the scheduled start. --target-latency starts
+one extra fake chat server per value and routes chat calls across them (src/router.py),
+with per-target call counts in the report.
+Usage: python scripts/bench_load.py [--workloads ingest,query,http,eval] [--qps 20]
+       [--duration 10] [--chat-latency 0.5] [--embed-latency 0.05] [--env KEY=VALUE]
+       [--target-latency 0.2,1.5 [--hedge]] [--out bench.json]
+       python scripts/bench_load.py --compare base.json new.json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+WORKLOADS = ("ingest", "query", "http", "eval")
+COMPARE_FIELDS = ("throughput_qps", "p50_ms", "p95_ms", "p99_ms", "chunks_per_second", "seconds", "peak_rss_mb")
+
+
+# --- corpus ---------------------------------------------------------------------------
+
+
+def _vocabulary(size: int, rng: random.Random) -> list[str]:
+    syllables = ["ka", "lo", "mi", "ren", "to", "sa", "vi", "dor", "qu", "el", "an", "is"]
+    return ["".join(rng.choice(syllables) for _ in range(rng.randint(2, 4))) for _ in range(size)]
+
+
+def write_corpus(docs_dir: Path, files: int, words: int, seed: int = 0) -> list[list[str]]:
+    """Write files .txt docs of `words` pseudo-words each; returns their word lists."""
+    rng = random.Random(seed)
+    vocab = _vocabulary(3000, rng)
+    docs_dir.mkdir(parents=True, exist_ok=True)
+    docs = []
+    for i in range(files):
+        doc = [rng.choice(vocab) for _ in range(words)]
+        lines = [" ".join(doc[j : j + 12]) + "." for j in range(0, len(doc), 12)]
+        (docs_dir / f"doc_{i:05d}.txt").write_text("\n".join(lines))
+        docs.append(doc)
+    return docs
+
+
+def make_questions(docs: list[list[str]], count: int, seed: int = 1) -> list[dict]:
+    """Eval-style rows whose question quotes a passage of one doc; expected is the words that follow."""
+    rng = random.Random(seed)
+    rows = []
+    for _ in range(count):
+        doc = rng.choice(docs)
+        start = rng.randrange(0, max(1, len(doc) - 16))
+        rows.append({
+            "question": "What does the guide say about " + " ".join(doc[start : start + 8]) + "?",
+            "expected": " ".join(doc[start + 8 : start + 12]),
+        })
+    return rows
+
+
+# --- measurement ----------------------------------------------------------------------
+
+
+def peak_rss_mb() -> float:
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(rss / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def _percentiles(seconds: list[float]) -> dict:
+    if not seconds:
+        return {"p50_ms": None, "p95_ms": None, "p99_ms": None, "mean_ms": None, "max_ms": None}
+    ms = sorted(s * 1000.0 for s in seconds)
+
+    def pct(p: float) -> float:
+        return round(ms[min(len(ms) - 1, int(round(p / 100.0 * (len(ms) - 1))))], 1)
+
+    return {
+        "p50_ms": pct(50),
+        "p95_ms": pct(95),
+        "p99_ms": pct(99),
+        "mean_ms": round(sum(ms) / len(ms), 1),
+        "max_ms": round(ms[-1], 1),
+    }
+
+
+async def open_loop(call, n: int, qps: float, poisson: bool = False, seed: int = 2) -> dict:
+    """Start call(i) for i < n on a fixed (or Poisson) schedule at qps, independent of completions."""
+    rng = random.Random(seed)
+    loop = asyncio.get_running_loop()
+    latencies: list[float] = []
+    errors: dict[str, int] = {}
+
+    async def one(i: int, scheduled: float):
+        try:
+            await call(i)
+        except Exception as e:
+            errors[type(e).__name__] = errors.get(type(e).__name__, 0) + 1
+            return
+        latencies.append(loop.time() - scheduled)
+
+    start = loop.time() + 0.05
+    at = start
+    tasks = []
+    for i in range(n):
+        delay = at - loop.time()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        tasks.append(asyncio.create_task(one(i, at)))
+        at += rng.expovariate(qps) if poisson else 1.0 / qps
+    last_start = loop.time()
+    await asyncio.gather(*tasks)
+    elapsed = loop.time() - start
+    return {
+        "requests": n,
+        "ok": len(latencies),
+        "errors": errors,
+        "offered_qps": round(n / max(last_start - start, 1e-9), 2) if n > 1 else None,
+        "throughput_qps": round(len(latencies) / elapsed, 2),
+        "seconds": round(elapsed, 2),
+        **_percentiles(latencies),
+    }
+
+
+# --- workloads (child process) ----------------------------------------------------------
+
+
+def _tokenizer_fallback() -> str:
+    """Length-safe embedding needs tiktoken's BPE file; on hosts that cannot fetch it send plain text."""
+    from src.clients import embeddings_model
+    from src.config import AZURE_OPENAI_DEPLOYMENT_EMBEDDING
+
+    try:
+        import tiktoken
+
+        tiktoken.encoding_for_model(AZURE_OPENAI_DEPLOYMENT_EMBEDDING)
+        return "tiktoken"
+    except Exception:
+        for max_retries in (None, 0):  # query-time and executor-owned (ingest, scoring) instances
+            embeddings_model(max_retries).check_embedding_ctx_length = False
+        return "off"
+
+
+def _load_rows(workdir: Path) -> list[dict]:
+    with open(workdir / "questions.json") as f:
+        return json.load(f)
+
+
+def run_ingest(args, workdir: Path) -> dict:
+    from src.config import DOCS_DIR
+    from src.retriever import ingest_full
+
+    tokenizer = _tokenizer_fallback()
+    baseline = peak_rss_mb()
+    t0 = time.perf_counter()
+    _, stats = ingest_full(docs_path=DOCS_DIR, use_persist=True, workers=args.ingest_workers or None)
+    seconds = time.perf_counter() - t0
+    return {
+        "files": stats["files_changed"],
+        "failed_files": len(stats["failed_files"]),
+        "chunks": stats["chunks_added"],
+        "seconds": round(seconds, 2),
+        "chunks_per_second": round(stats["chunks_added"] / max(seconds, 1e-9), 1),
+        "embedding_tokenizer": tokenizer,
+        "baseline_rss_mb": baseline,
+    }
+
+
+def run_query(args, workdir: Path) -> dict:
+    from src.pipeline import RAGPipeline
+
+    tokenizer = _tokenizer_fallback()
+    rows = _load_rows(workdir)
+    pipeline = RAGPipeline()
+    pipeline.run(rows[0]["question"])  # warm up: store, tokenizer, first connection
+    baseline = peak_rss_mb()
+
+    async def call(i: int):
+        await pipeline.arun(rows[i % len(rows)]["question"])
+
+    try:
+        result = asyncio.run(open_loop(call, args.requests, args.qps, args.poisson))
+    finally:
+        pipeline.close()
+    return {**result, "embedding_tokenizer": tokenizer, "baseline_rss_mb": baseline}
+
+
+def run_http(args, workdir: Path) -> dict:
+    import httpx
+
+    from src import app as web
+
+    tokenizer = _tokenizer_fallback()
+    rows = _load_rows(workdir)
+    web._holder.get()
+    baseline = peak_rss_mb()
+
+    async def main():
+        transport = httpx.ASGITransport(app=web.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+
+            async def call(i: int):
+                r = await client.post("/query", data={"question": rows[i % len(rows)]["question"]})
+                if r.status_code != 200 or 'class="result error"' in r.text:
+                    raise RuntimeError(f"HTTP {r.status_code}")
+
+            return await open_loop(call, args.requests, args.qps, args.poisson)
+
+    try:
+        result = asyncio.run(main())
+    finally:
+        web._holder.close()
+    return {**result, "embedding_tokenizer": tokenizer, "baseline_rss_mb": baseline}
+
+
+def run_eval(args, workdir: Path) -> dict:
+    from src.eval_runner import run_batch_eval
+    from src.pipeline import RAGPipeline
+
+    tokenizer = _tokenizer_fallback()
+    rows = _load_rows(workdir)[: args.requests]
+    pipeline = RAGPipeline()
+    pipeline.run(rows[0]["question"])
+    baseline = peak_rss_mb()
+    latencies: list[float] = []
+    errors: dict[str, int] = {}
+
+    def record(rec: dict):
+        if "error" in rec:
+            name = rec["error"].split(":", 1)[0]
+            errors[name] = errors.get(name, 0) + 1
+        else:
+            latencies.append(rec["latency_seconds"])
+
+    t0 = time.perf_counter()
+    try:
+        summary = run_batch_eval(
+            pipeline.run,
+            iter(rows),
+            lambda got, expected: 1.0 if expected.lower() in (got or "").lower() else 0.0,
+            workdir / "eval_checkpoint.jsonl",
+            workers=args.eval_workers,
+            rate=args.qps,
+            on_result=record,
+        )
+    finally:
+        pipeline.close()
+    seconds = time.perf_counter() - t0
+    return {
+        "requests": len(rows),
+        "ok": len(latencies),
+        "errors": errors,
+        "throughput_qps": round(len(rows) / max(seconds, 1e-9), 2),
+        "seconds": round(seconds, 2),
+        **_percentiles(latencies),
+        "summary": summary,
+        "embedding_tokenizer": tokenizer,
+        "baseline_rss_mb": baseline,
+    }
+
+
+RUNNERS = {"ingest": run_ingest, "query": run_query, "http": run_http, "eval": run_eval}
+
+
+# --- orchestration (parent process) ---------------------------------------------------------
+
+
+def _fake_server(args, chat_latency: float | None = None) -> tuple[subprocess.Popen, str]:
+    cmd = [
+        sys.executable, "-m", "tests.fake_openai",
+        "--chat-latency", str(args.chat_latency if chat_latency is None else chat_latency),
+        "--token-latency", str(args.token_latency),
+        "--embed-latency", str(args.embed_latency),
+        "--jitter", str(args.jitter),
+        "--error-rate", str(args.error_rate),
+    ]
+    proc = subprocess.Popen(cmd, cwd=ROOT, stdout=subprocess.PIPE, text=True)
+    url = proc.stdout.readline().strip()
+    if not url.startswith("http"):
+        proc.kill()
+        sys.exit("Fake OpenAI server did not start")
+    return proc, url
+
+
+def _server_counts(url: str) -> dict:
+    with urllib.request.urlopen(url + "/stats", timeout=5) as r:
+        return json.load(r)
+
+
+def _child_env(args, workdir: Path, url: str, targets: list[str]) -> dict:
+    env = dict(os.environ)
+    env.update({
+        "AZURE_OPENAI_ENDPOINT": url,
+        "AZURE_OPENAI_API_KEY": "bench",
+        "RAG_DATA_DIR": str(workdir / "data"),
+        "RAG_DOCS_DIR": str(workdir / "docs"),
+        "EMBEDDING_CACHE_PATH": str(workdir / "data" / "embedding_cache.sqlite3"),
+        "LANGCHAIN_TRACING_V2": "false",
+        "OTEL_EXPORTER_OTLP_ENDPOINT": "",
+        "OTEL_TRACES_EXPORTER": "",
+        "STARTUP_WARM": "false",
+        "PYTHONPATH": str(ROOT),
+    })
+    if targets:
+        env["AZURE_OPENAI_CHAT_TARGETS"] = json.dumps(
+            [{"name": f"t{i}", "deployment": "gpt-4o", "endpoint": t} for i, t in enumerate(targets)]
+        )
+        env["CHAT_HEDGE_ENABLED"] = "true" if args.hedge else "false"
+    for item in args.env:
+        key, _, value = item.partition("=")
+        env[key] = value
+    return env
+
+
+def _run_child(args, workload: str, workdir: Path, url: str, targets: list[str]) -> dict:
+    before = _server_counts(url)
+    before_targets = [_server_counts(t)["chat"] for t in targets]
+    cmd = [sys.executable, __file__, *sys.argv[1:], "--child", workload, "--workdir", str(workdir)]
+    proc = subprocess.run(cmd, cwd=ROOT, env=_child_env(args, workdir, url, targets), capture_output=True, text=True)
+    if proc.returncode != 0:
+        print(proc.stderr[-2000:], file=sys.stderr)
+        return {"failed": f"exit code {proc.returncode}"}
+    result = json.loads(proc.stdout.strip().splitlines()[-1])
+    after = _server_counts(url)
+    result["upstream_calls"] = {k: after[k] - before.get(k, 0) for k in after}
+    if targets:
+        result["upstream_calls"]["chat"] = sum(_server_counts(t)["chat"] - b for t, b in zip(targets, before_targets))
+        result["chat_by_target"] = {
+            f"t{i}": _server_counts(t)["chat"] - b for i, (t, b) in enumerate(zip(targets, before_targets))
+        }
+    return result
+
+
+def _git_commit() -> str | None:
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True)
+        dirty = subprocess.run(["git", "diff", "--quiet", "HEAD", "--", "src", "scripts"], cwd=ROOT).returncode
+        return out.stdout.strip() + ("-dirty" if dirty else "") if out.returncode == 0 else None
+    except OSError:
+        return None
+
+
+def _print_table(results: dict):
+    print(f"{'workload':<8} {'requests':>8} {'errors':>6} {'offered':>8} {'qps':>8} {'p50_ms':>8} "
+          f"{'p95_ms':>8} {'p99_ms':>8} {'rss_mb':>7} {'chat':>6} {'embed':>6}")
+    for name, r in results.items():
+        if "failed" in r:
+            print(f"{name:<8} failed: {r['failed']}")
+            continue
+        calls = r.get("upstream_calls", {})
+        if name == "ingest":
+            print(f"{name:<8} {r['chunks']:>8} {r['failed_files']:>6} {'':>8} {'':>8} {'':>8} {'':>8} {'':>8} "
+                  f"{r['peak_rss_mb']:>7} {calls.get('chat', 0):>6} {calls.get('embeddings', 0):>6}"
+                  f"  ({r['chunks_per_second']} chunks/s, {r['seconds']}s)")
+            continue
+        print(f"{name:<8} {r['requests']:>8} {sum(r['errors'].values()):>6} {str(r.get('offered_qps') or ''):>8} "
+              f"{r['throughput_qps']:>8} {str(r['p50_ms']):>8} {str(r['p95_ms']):>8} {str(r['p99_ms']):>8} "
+              f"{r['peak_rss_mb']:>7} {calls.get('chat', 0):>6} {calls.get('embeddings', 0):>6}"
+              + (f"  (chat by target: {r['chat_by_target']})" if r.get("chat_by_target") else ""))
+
+
+def compare(base_path: Path, new_path: Path):
+    base, new = json.loads(base_path.read_text()), json.loads(new_path.read_text())
+    print(f"base {base.get('commit')} vs new {new.get('commit')}")
+    print(f"{'workload':<8} {'metric':<18} {'base':>10} {'new':>10} {'change':>8}")
+    for name, new_r in new["results"].items():
+        base_r = base["results"].get(name, {})
+        for field in COMPARE_FIELDS:
+            a, b = base_r.get(field), new_r.get(field)
+            if a is None or b is None:
+                continue
+            change = f"{(b - a) / a * 100:+.1f}%" if a else ""
+            print(f"{name:<8} {field:<18} {a:>10} {b:>10} {change:>8}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline load test against a fake Azure OpenAI endpoint.")
+    parser.add_argument("--workloads", default=",".join(WORKLOADS), help="Comma-separated: " + ",".join(WORKLOADS))
+    parser.add_argument("--qps", type=float, default=20.0, help="Target arrival rate (eval: rate limit).")
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds of load per workload (requests = qps * duration).")
+    parser.add_argument("--poisson", action="store_true", help="Poisson arrivals instead of a fixed interval.")
+    parser.add_argument("--files", type=int, default=200, help="Synthetic corpus size.")
+    parser.add_argument("--file-words", type=int, default=600)
+    parser.add_argument("--questions", type=int, default=200, help="Distinct questions, cycled through.")
+    parser.add_argument("--chat-latency", type=float, default=0.5)
+    parser.add_argument("--token-latency", type=float, default=0.0)
+    parser.add_argument("--embed-latency", type=float, default=0.05)
+    parser.add_argument("--jitter", type=float, default=0.2)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--ingest-workers", type=int, default=0, help="0 = INGEST_WORKERS.")
+    parser.add_argument("--eval-workers", type=int, default=16)
+    parser.add_argument("--target-latency", default="", help="Comma-separated chat latencies, one routed fake target each.")
+    parser.add_argument("--hedge", action="store_true", help="With --target-latency: enable hedged chat calls.")
+    parser.add_argument("--env", action="append", default=[], help="Extra KEY=VALUE for the workloads, e.g. RETRIEVAL_MODE=hybrid.")
+    parser.add_argument("--out", type=Path, help="Write results JSON here.")
+    parser.add_argument("--compare", nargs=2, type=Path, metavar=("BASE", "NEW"), help="Compare two --out files and exit.")
+    parser.add_argument("--child", choices=WORKLOADS, help=argparse.SUPPRESS)
+    parser.add_argument("--workdir", type=Path, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    args.requests = max(1, int(args.qps * args.duration))
+
+    if args.compare:
+        compare(*args.compare)
+        return
+    if args.child:
+        result = RUNNERS[args.child](args, args.workdir)
+        result["peak_rss_mb"] = peak_rss_mb()
+        print(json.dumps(result))
+        return
+
+    workloads = [w for w in args.workloads.split(",") if w]
+    unknown = set(workloads) - set(WORKLOADS)
+    if unknown:
+        sys.exit(f"Unknown workloads: {', '.join(sorted(unknown))}")
+    server, url = _fake_server(args)
+    target_servers = [_fake_server(args, float(x)) for x in args.target_latency.split(",") if x.strip()]
+    targets = [t_url for _, t_url in target_servers]
+    results = {}
+    try:
+        with tempfile.TemporaryDirectory(prefix="bench_load_") as tmp:
+            workdir = Path(tmp)
+            docs = write_corpus(workdir / "docs", args.files, args.file_words)
+            (workdir / "questions.json").write_text(json.dumps(make_questions(docs, args.questions)))
+            for workload in workloads:
+                print(f"running {workload} ...", file=sys.stderr)
+                results[workload] = _run_child(args, workload, workdir, url, targets)
+    finally:
+        for proc in [server] + [p for p, _ in target_servers]:
+            proc.terminate()
+            proc.wait()
+
+    report = {
+        "commit": _git_commit(),
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "settings": {k: v for k, v in vars(args).items() if k not in ("out", "compare", "child", "workdir")},
+        "results": results,
+    }
+    _print_table(results)
+    if args.out:
+        args.out.write_text(json.dumps(report, indent=2))
+        print(f"Wrote {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+"""
+Compare retriever backends on query latency and recall: Chroma vs the NumPy index
+(exact scan and IVF). Queries are stored chunk vectors plus a little noise, so no
+embedding calls are made; exact NumPy cosine search is the ground truth for recall@k.
+Usage: python scripts/bench_retriever.py [--queries 200] [--k 4] [--nprobe 8] [--json]
+       python scripts/bench_retriever.py --synthetic 50000 --dim 1536
+Without --synthetic it reads the persisted data/chroma collection (run ingest first).
+"""
+
+import argparse
+import json
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from dotenv import load_dotenv
+load_dotenv(ROOT / ".env")
+
+from langchain_community.vectorstores import Chroma
+
+from src.config import CHROMA_PERSIST_DIR
+from src.retriever import COLLECTION_NAME, build_numpy_index
+from src.vector_index import NumpyVectorStore
+
+
+def _synthetic_store(n: int, dim: int, seed: int = 0) -> Chroma:
+    """Ephemeral Chroma collection of clustered unit vectors (clusters make IVF meaningful)."""
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(max(1, n // 100), dim)).astype(np.float32)
+    store = Chroma(collection_name="bench_retriever")
+    store.delete_collection()
+    store = Chroma(collection_name="bench_retriever")
+    for start in range(0, n, 5000):
+        size = min(5000, n - start)
+        block = centers[rng.integers(0, len(centers), size)] + 0.3 * rng.normal(size=(size, dim)).astype(np.float32)
+        block /= np.linalg.norm(block, axis=1, keepdims=True)
+        ids = [f"c{i}" for i in range(start, start + size)]
+        store._collection.upsert(
+            ids=ids,
+            embeddings=block.tolist(),
+            documents=[f"chunk {i}" for i in range(start, start + size)],
+            metadatas=[{"row": i} for i in range(start, start + size)],
+        )
+    return store
+
+
+def _queries(store: NumpyVectorStore, count: int, seed: int = 1) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    rows = rng.choice(len(store), size=min(count, len(store)), replace=False)
+    q = np.asarray(store.vectors[np.sort(rows)]) + 0.05 * rng.normal(size=(len(rows), store.vectors.shape[1]))
+    return (q / np.linalg.norm(q, axis=1, keepdims=True)).astype(np.float32)
+
+
+def _measure(search, queries: np.ndarray) -> tuple[list[list[str]], dict]:
+    results, times = [], []
+    for q in queries:
+        t0 = time.perf_counter()
+        results.append(search(q))
+        times.append(time.perf_counter() - t0)
+    ms = np.asarray(times) * 1000.0
+    return results, {
+        "p50_ms": round(float(np.percentile(ms, 50)), 3),
+        "p95_ms": round(float(np.percentile(ms, 95)), 3),
+        "mean_ms": round(float(ms.mean()), 3),
+    }
+
+
+def _recall(results: list[list[str]], truth: list[list[str]]) -> float:
+    hits = sum(len(set(r) & set(t)) for r, t in zip(results, truth))
+    return round(hits / max(1, sum(len(t) for t in truth)), 4)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark Chroma vs NumPy retriever backends.")
+    parser.add_argument("--synthetic", type=int, default=0, help="Use N random clustered vectors instead of data/chroma.")
+    parser.add_argument("--dim", type=int, default=1536)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=4)
+    parser.add_argument("--nlist", type=int, default=0, help="IVF lists (0 = sqrt(rows)).")
+    parser.add_argument("--nprobe", type=int, default=8)
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args()
+
+    if args.synthetic:
+        store = _synthetic_store(args.synthetic, args.dim)
+    else:
+        if not CHROMA_PERSIST_DIR.exists():
+            sys.exit("No data/chroma found; run scripts/ingest.py or pass --synthetic N.")
+        store = Chroma(persist_directory=str(CHROMA_PERSIST_DIR), collection_name=COLLECTION_NAME)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        t0 = time.perf_counter()
+        build_numpy_index(store, Path(tmp) / "exact", kind="exact")
+        export_exact = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        build_numpy_index(store, Path(tmp) / "ivf", kind="ivf", nlist=args.nlist)
+        export_ivf = time.perf_counter() - t0
+        exact = NumpyVectorStore.load(Path(tmp) / "exact", embedding=None)
+        ivf = NumpyVectorStore.load(Path(tmp) / "ivf", embedding=None, nprobe=args.nprobe)
+        queries = _queries(exact, args.queries)
+
+        def ids(vs, q):
+            return [vs.chunks.chunk_id(row) for row, _ in vs.search_many([q], args.k)[0]]
+
+        truth, exact_stats = _measure(lambda q: ids(exact, q), queries)
+        ivf_results, ivf_stats = _measure(lambda q: ids(ivf, q), queries)
+        chroma_results, chroma_stats = _measure(
+            lambda q: store._collection.query(query_embeddings=[q.tolist()], n_results=args.k, include=[])["ids"][0],
+            queries,
+        )
+        rows = [
+            {"backend": "chroma", **chroma_stats, "recall": _recall(chroma_results, truth)},
+            {"backend": "numpy-exact", **exact_stats, "recall": 1.0, "export_s": round(export_exact, 2)},
+            {"backend": f"numpy-ivf(nlist={ivf.centroids.shape[0]},nprobe={args.nprobe})", **ivf_stats,
+             "recall": _recall(ivf_results, truth), "export_s": round(export_ivf, 2)},
+        ]
+
+    if args.json:
+        print(json.dumps({"vectors": len(exact), "queries": len(queries), "k": args.k, "rows": rows}))
+        return
+    print(f"{len(exact)} vectors, {len(queries)} queries, k={args.k} (recall@k vs exact cosine)")
+    print(f"{'backend':<34} {'p50_ms':>8} {'p95_ms':>8} {'mean_ms':>8} {'recall':>7}")
+    for r in rows:
+        print(f"{r['backend']:<34} {r['p50_ms']:>8} {r['p95_ms']:>8} {r['mean_ms']:>8} {r['recall']:>7}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,16 @@
 """
 Load docs from docs/, chunk, embed with Azure OpenAI, and persist to Chroma.
 Run once (or when docs change) before running queries or eval.
+Usage: python scripts/ingest.py [--incremental] [--workers N] [--batch-size N] [--in-flight N] [--tpm N]
+--incremental embeds only new/changed chunks (by file and chunk hash) and deletes
+chunks of removed files; without it the collection is rebuilt from scratch.
+Files are split in N worker processes; files that fail to load are listed at the end.
+Embedding requests run --in-flight at a time under a --tpm tokens-per-minute budget.
 """
 
+import argparse
 import sys
+import time
 from pathlib import Path
 
 # project root
@@ -13,15 +20,53 @@ sys.path.insert(0, str(ROOT))
 from dotenv import load_dotenv
 load_dotenv(ROOT / ".env")
 
-from src.config import DOCS_DIR
+from src.config import (
+    DOCS_DIR,
+    EMBEDDING_MAX_IN_FLIGHT,
+    EMBEDDING_TOKENS_PER_MINUTE,
+    INGEST_BATCH_SIZE,
+    INGEST_WORKERS,
+    RETRIEVER_BACKEND,
+)
 from src.observability import configure_tracing
-from src.retriever import build_vector_store
+from src.retriever import build_numpy_index, ingest_full, ingest_incremental
 
 
 def main():
+    parser = argparse.ArgumentParser(description="Ingest docs/ into the Chroma vector store.")
+    parser.add_argument("--incremental", action="store_true", help="Embed only changed chunks using the ingest manifest.")
+    parser.add_argument("--workers", type=int, default=INGEST_WORKERS, help="Loader/splitter processes (0 = one per CPU).")
+    parser.add_argument("--batch-size", type=int, default=INGEST_BATCH_SIZE, help="Chunks per embedding request.")
+    parser.add_argument("--in-flight", type=int, default=EMBEDDING_MAX_IN_FLIGHT, help="Concurrent embedding requests.")
+    parser.add_argument("--tpm", type=int, default=EMBEDDING_TOKENS_PER_MINUTE, help="Tokens-per-minute budget (0 = none).")
+    args = parser.parse_args()
     configure_tracing()
-    store = build_vector_store(docs_path=DOCS_DIR, use_persist=True)
-    print("Ingestion done. Vector store persisted under data/chroma.")
+    t0 = time.perf_counter()
+    opts = {
+        "docs_path": DOCS_DIR,
+        "workers": args.workers,
+        "batch_size": max(1, args.batch_size),
+        "max_in_flight": max(1, args.in_flight),
+        "tokens_per_minute": args.tpm,
+    }
+    if args.incremental:
+        store, stats = ingest_incremental(**opts)
+    else:
+        store, stats = ingest_full(use_persist=True, **opts)
+    print(
+        f"Ingestion done ({stats['mode']}): {stats['files_changed']} files changed, "
+        f"{stats['files_removed']} removed, {stats['chunks_added']} chunks embedded, "
+        f"{stats['chunks_deleted']} deleted in {time.perf_counter() - t0:.2f}s. Vector store under data/chroma."
+    )
+    print(f"Embedding: {stats['chunks_per_second']} chunks/s, {stats['embed_retries']} retries.")
+    for failed in stats["failed_files"]:
+        print(f"  failed: {failed['source']} ({failed['error']})")
+    if RETRIEVER_BACKEND == "numpy":
+        t1 = time.perf_counter()
+        rows = build_numpy_index(store)
+        print(f"NumPy index exported: {rows} vectors in {time.perf_counter() - t1:.2f}s (data/vector_index).")
+    if "embedding_cache" in stats:
+        print("Embedding cache:", stats["embedding_cache"])
 
 
 if __name__ == "__main__":
@@ -1,8 +1,11 @@
 """
 Run a single RAG query from the command line.
-Usage: python scripts/query.py "Your question here"
+Usage: python scripts/query.py [--stream] "Your question here"
+--stream prints answer tokens as they arrive and reports time to first token.
 """
 
+import argparse
+import asyncio
 import sys
 from pathlib import Path
 
@@ -16,17 +19,38 @@ from src.observability import configure_tracing
 from src.pipeline import get_pipeline
 
 
+async def _stream(pipeline, question: str) -> dict:
+    out = {}
+    print("Answer: ", end="", flush=True)
+    async for ev in pipeline.astream(question):
+        if ev["event"] == "token":
+            print(ev["data"], end="", flush=True)
+        elif ev["event"] == "done":
+            out = ev["data"]
+    print()
+    return out
+
+
 def main():
     configure_tracing()
-    if len(sys.argv) < 2:
-        print("Usage: python scripts/query.py \"Your question\"")
-        sys.exit(1)
-    question = " ".join(sys.argv[1:])
+    parser = argparse.ArgumentParser(description="Ask the RAG pipeline one question.")
+    parser.add_argument("question", nargs="+")
+    parser.add_argument("--stream", action="store_true", help="Stream the answer token by token.")
+    args = parser.parse_args()
+    question = " ".join(args.question)
     pipeline = get_pipeline()
-    out = pipeline.run(question)
-    print("Answer:", out["answer"])
+    try:
+        if args.stream:
+            out = asyncio.run(_stream(pipeline, question))
+        else:
+            out = pipeline.run(question)
+            print("Answer:", out["answer"])
+    finally:
+        pipeline.close()
     print("Chunk IDs:", out["chunk_ids"])
     print("Latency (s):", round(out["latency_seconds"], 3))
+    if out.get("ttft_seconds") is not None:
+        print("Time to first token (s):", round(out["ttft_seconds"], 3))
 
 
 if __name__ == "__main__":
@@ -1,8 +1,17 @@
 """
 Run evaluation: run each eval question through the RAG pipeline, score answers
-(exact match or semantic similarity), log scores and summary (average, pass rate).
+(exact match, token F1, embedding cosine similarity), log scores and summary (average, pass rate).
+Usage: python scripts/run_eval.py [--dataset PATH] [--workers N] [--rate RPS] [--resume]
+       [--metrics exact,token_f1,cosine] [--threshold cosine=0.9] [--score-only]
+       [--prompts v1,v2 --ks 2,4,8 [--prompt-file variants.json]]
+Questions run on a worker pool; every answered row is checkpointed to JSONL so an
+interrupted run continues with --resume. The metrics are then computed over the whole
+checkpoint in one bulk pass (--score-only re-scores an existing checkpoint without the pipeline).
+With --prompts and/or --ks every question runs under each (prompt version, k) instead, retrieving
+once for all of them (src/eval_matrix.py), and a side-by-side comparison table is printed.
 """
 
+import argparse
 import json
 import sys
 from pathlib import Path
@@ -13,52 +22,203 @@ sys.path.insert(0, str(ROOT))
 from dotenv import load_dotenv
 load_dotenv(ROOT / ".env")
 
+from src.eval_runner import iter_eval_rows, run_batch_eval, score_checkpoint
 from src.observability import configure_tracing
-from src.pipeline import get_pipeline
+from src.scoring import DEFAULT_THRESHOLDS, METRICS, exact_match
 
 
-def load_eval_set(path: Path) -> list[dict]:
-    with open(path) as f:
-        return json.load(f)
+def _checkpoint_path(dataset_path: Path) -> Path:
+    return ROOT / "data" / "eval_results" / f"{dataset_path.stem}.jsonl"
+
 
+def print_metrics(checkpoint_path: Path, metrics: list[str], thresholds: dict[str, float]):
+    """Bulk-score the checkpoint and print one line per metric."""
+    embeddings = None
+    if "cosine" in metrics:
+        from src.retriever import get_embeddings
 
-def exact_match(got: str, expected: str) -> float:
-    got = (got or "").strip().lower()
-    expected = (expected or "").strip().lower()
-    return 1.0 if expected in got or got in expected else 0.0
+        embeddings = get_embeddings(max_retries=0)  # EmbeddingExecutor retries the scoring batches
+    summary = score_checkpoint(checkpoint_path, metrics, thresholds, embeddings)
+    print(f"\n{'metric':<10} {'mean':>7} {'threshold':>9} {'passed':>12}")
+    for name, m in summary.items():
+        print(f"{name:<10} {m['mean']:>7.3f} {m['threshold']:>9.2f} {m['passed']:>6}/{m['total']:<5}")
+    print("Per-row scores:", checkpoint_path.with_suffix(".scores.jsonl"))
+    return summary
 
 
-def run_eval(dataset_path: Path | None = None):
+def run_eval(
+    dataset_path: Path | None = None,
+    workers: int = 4,
+    rate: float = 0.0,
+    resume: bool = False,
+    checkpoint_path: Path | None = None,
+    metrics: list[str] | None = None,
+    thresholds: dict[str, float] | None = None,
+    score_only: bool = False,
+):
     dataset_path = dataset_path or ROOT / "data" / "eval_dataset.json"
+    checkpoint_path = checkpoint_path or _checkpoint_path(dataset_path)
+    metrics = metrics or ["exact"]
+    if score_only:
+        if not checkpoint_path.exists():
+            print("Checkpoint not found:", checkpoint_path)
+            return
+        return print_metrics(checkpoint_path, metrics, thresholds or {})
     if not dataset_path.exists():
         print("Eval dataset not found:", dataset_path)
         return
     configure_tracing()
+    from src.pipeline import get_pipeline
+
     pipeline = get_pipeline()
-    rows = load_eval_set(dataset_path)
-    results = []
-    for i, row in enumerate(rows):
-        q = row.get("question", "")
-        expected = row.get("expected", "")
-        out = pipeline.run(q)
-        answer = out.get("answer", "")
-        score = exact_match(answer, expected)
-        results.append({
-            "question": q,
-            "expected": expected,
-            "answer": answer,
-            "score": score,
-        })
-        print(f"[{i+1}/{len(rows)}] score={score:.2f} | {q[:50]}...")
-    scores = [r["score"] for r in results]
-    avg = sum(scores) / len(scores) if scores else 0
-    pass_count = sum(1 for s in scores if s >= 0.5)
-    print("\nSummary: average score =", round(avg, 3), "| pass rate =", pass_count, "/", len(scores))
-    return results
+    completed = [0]
+
+    def progress(rec: dict):
+        completed[0] += 1
+        status = f"error={rec['error']}" if "error" in rec else f"score={rec['score']:.2f}"
+        print(f"[{completed[0]} | row {rec['index'] + 1}] {status} | {rec['question'][:50]}...")
+
+    summary = run_batch_eval(
+        pipeline.run,
+        iter_eval_rows(dataset_path),
+        exact_match,
+        checkpoint_path,
+        workers=workers,
+        rate=rate,
+        resume=resume,
+        on_result=progress,
+    )
+    print("\nSummary: average score =", round(summary["average"], 3), "| pass rate =", summary["passed"], "/", summary["total"])
+    if summary["errors"]:
+        print(f"{summary['errors']} rows failed; re-run with --resume to retry them. Results: {checkpoint_path}")
+    if metrics != ["exact"]:
+        summary["metrics"] = print_metrics(checkpoint_path, metrics, thresholds or {})
+    return summary
+
+
+def _matrix_path(dataset_path: Path) -> Path:
+    return ROOT / "data" / "eval_results" / f"{dataset_path.stem}.matrix.json"
+
+
+def load_prompt_file(path: Path) -> list[str]:
+    """Register prompt variants from JSON {version: {"system": ..., "template": ...}}; returns their versions."""
+    from src.prompts import register_prompt
+
+    with open(path) as f:
+        variants = json.load(f)
+    for version, spec in variants.items():
+        register_prompt(version, spec["system"], spec["template"])
+    return list(variants)
+
+
+def run_matrix_eval(
+    dataset_path: Path | None = None,
+    prompt_versions: list[str] | None = None,
+    ks: list[int] | None = None,
+    workers: int = 4,
+    metrics: list[str] | None = None,
+    thresholds: dict[str, float] | None = None,
+    out_path: Path | None = None,
+):
+    from src.eval_matrix import format_table, run_matrix
+    from src.prompts import PROMPT_VERSION
+
+    dataset_path = dataset_path or ROOT / "data" / "eval_dataset.json"
+    if not dataset_path.exists():
+        print("Eval dataset not found:", dataset_path)
+        return
+    configure_tracing()
+    from src.pipeline import get_pipeline
+
+    embeddings = None
+    if "cosine" in (metrics or []):
+        from src.retriever import get_embeddings
+
+        embeddings = get_embeddings(max_retries=0)  # EmbeddingExecutor retries the scoring batches
+    rows = list(iter_eval_rows(dataset_path))
+    report = run_matrix(
+        get_pipeline(),
+        rows,
+        prompt_versions or [PROMPT_VERSION],
+        ks or [],
+        metrics=metrics or ["exact"],
+        thresholds=thresholds,
+        embeddings=embeddings,
+        max_concurrency=workers,
+    )
+    print(format_table(report))
+    out_path = out_path or _matrix_path(dataset_path)
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+    out_path.write_text(json.dumps(report, indent=2))
+    print("Matrix results:", out_path)
+    return report
+
+
+def _thresholds(items: list[str]) -> dict[str, float]:
+    out = {}
+    for item in items:
+        name, _, value = item.partition("=")
+        out[name.strip()] = float(value)
+    return out
 
 
 def main():
-    run_eval()
+    parser = argparse.ArgumentParser(description="Run the eval set through the RAG pipeline.")
+    parser.add_argument("--dataset", type=Path, default=None, help="JSON array or JSONL of {question, expected}.")
+    parser.add_argument("--workers", type=int, default=4, help="Concurrent pipeline runs (default 4).")
+    parser.add_argument("--rate", type=float, default=0.0, help="Max questions started per second (0 = unlimited).")
+    parser.add_argument("--resume", action="store_true", help="Skip rows already scored in the checkpoint.")
+    parser.add_argument("--checkpoint", type=Path, default=None, help="Checkpoint JSONL (default data/eval_results/<dataset>.jsonl).")
+    parser.add_argument("--metrics", default="exact", help=f"Comma-separated metrics: {', '.join(METRICS)} (default exact).")
+    parser.add_argument(
+        "--threshold",
+        action="append",
+        default=[],
+        help="Pass threshold as metric=value, repeatable (defaults: "
+        + ", ".join(f"{k}={v}" for k, v in DEFAULT_THRESHOLDS.items())
+        + ").",
+    )
+    parser.add_argument("--score-only", action="store_true", help="Re-score the existing checkpoint; do not run the pipeline.")
+    parser.add_argument("--prompts", default=None, help="Matrix mode: comma-separated prompt versions to compare.")
+    parser.add_argument("--ks", default=None, help="Matrix mode: comma-separated retrieval k values, e.g. 2,4,8.")
+    parser.add_argument("--prompt-file", type=Path, default=None, help='JSON {version: {"system", "template"}} of extra prompt variants.')
+    parser.add_argument("--out", type=Path, default=None, help="Matrix results JSON (default data/eval_results/<dataset>.matrix.json).")
+    args = parser.parse_args()
+    metrics = [m.strip() for m in args.metrics.split(",") if m.strip()]
+    unknown = [m for m in metrics if m not in METRICS]
+    if unknown:
+        parser.error(f"unknown metrics: {', '.join(unknown)}")
+    variants = load_prompt_file(args.prompt_file) if args.prompt_file else []
+    if args.prompts or args.ks or variants:
+        from src.prompts import PROMPTS
+
+        versions = [v.strip() for v in args.prompts.split(",") if v.strip()] if args.prompts else variants or None
+        missing = [v for v in versions or [] if v not in PROMPTS]
+        if missing:
+            parser.error(f"unknown prompt versions: {', '.join(missing)} (known: {', '.join(PROMPTS)})")
+        ks = [int(k) for k in args.ks.split(",") if k.strip()] if args.ks else None
+        if ks and min(ks) < 1:
+            parser.error("--ks values must be >= 1")
+        run_matrix_eval(
+            args.dataset,
+            versions,
+            ks,
+            workers=args.workers,
+            metrics=metrics,
+            thresholds=_thresholds(args.threshold),
+            out_path=args.out,
+        )
+        return
+    run_eval(
+        args.dataset,
+        workers=args.workers,
+        rate=args.rate,
+        resume=args.resume,
+        checkpoint_path=args.checkpoint,
+        metrics=metrics,
+        thresholds=_thresholds(args.threshold),
+        score_only=args.score_only,
+    )
 
 
 if __name__ == "__main__":
@@ -1,8 +1,12 @@
 """
-Run the FastAPI RAG demo locally. Usage: python scripts/serve.py
-Serves at http://127.0.0.1:8000
+Run the FastAPI RAG demo locally. Usage: python scripts/serve.py [--workers N] [--port 8000]
+Serves at http://127.0.0.1:8000. Each worker is a separate process with its own
+pipeline; within a worker, requests run concurrently on the async path up to
+RAG_MAX_CONCURRENCY. --reload is for development and forces a single worker.
 """
 
+import argparse
+import os
 import sys
 from pathlib import Path
 
@@ -11,10 +15,27 @@ sys.path.insert(0, str(ROOT))
 
 import uvicorn
 
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Serve the RAG demo web app.")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=int(os.environ.get("PORT", "8000")))
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=int(os.environ.get("WEB_CONCURRENCY", "1")),
+        help="Number of worker processes (default: $WEB_CONCURRENCY or 1).",
+    )
+    parser.add_argument("--reload", action="store_true", help="Auto-reload on code changes (single worker).")
+    return parser.parse_args()
+
+
 if __name__ == "__main__":
+    args = parse_args()
     uvicorn.run(
         "src.app:app",
-        host="0.0.0.0",
-        port=8000,
-        reload=True,
+        host=args.host,
+        port=args.port,
+        reload=args.reload,
+        workers=None if args.reload else max(1, args.workers),
     )
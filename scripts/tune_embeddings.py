@@ -0,0 +1,99 @@
+"""
+Tune ingest embedding settings offline: runs EmbeddingExecutor against a simulated
+embeddings model (fixed latency per request, a requests-per-minute cap that answers 429
+with Retry-After, optional random 5xx) and prints chunks/sec for each setting.
+Usage: python scripts/tune_embeddings.py [--chunks 2000] [--batch-sizes 64,256]
+       [--in-flight 1,4,8] [--latency 0.2] [--rpm 600] [--tpm 0] [--error-rate 0.0]
+No Azure credentials needed; nothing is written to data/.
+"""
+
+import argparse
+import random
+import sys
+import threading
+import time
+from collections import deque
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+from src.embed_executor import EmbeddingExecutor
+
+
+class SimulatedAPIError(Exception):
+    """Shaped like an SDK error: status_code plus a response carrying headers."""
+
+    def __init__(self, status_code: int, retry_after: float | None = None):
+        super().__init__(f"simulated HTTP {status_code}")
+        self.status_code = status_code
+        self.response = type("Response", (), {"headers": {"retry-after": str(retry_after)} if retry_after else {}})()
+
+
+class SimulatedEmbeddings(DeterministicFakeEmbedding):
+    """Fake endpoint: sleeps per request, enforces a rolling requests-per-minute limit."""
+
+    latency: float = 0.2
+    rpm: int = 0
+    error_rate: float = 0.0
+    requests: int = 0
+
+    def model_post_init(self, __context):
+        self._lock = threading.Lock()
+        self._sent: deque = deque()
+
+    def embed_documents(self, texts):
+        with self._lock:
+            self.requests += 1
+            now = time.monotonic()
+            while self._sent and now - self._sent[0] > 60:
+                self._sent.popleft()
+            if self.rpm and len(self._sent) >= self.rpm:
+                raise SimulatedAPIError(429, retry_after=60 - (now - self._sent[0]))
+            self._sent.append(now)
+        time.sleep(self.latency)
+        if random.random() < self.error_rate:
+            raise SimulatedAPIError(503)
+        return super().embed_documents(texts)
+
+
+def _ints(value: str) -> list[int]:
+    return [int(v) for v in value.split(",") if v]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark embedding batch size / concurrency against a fake model.")
+    parser.add_argument("--chunks", type=int, default=2000)
+    parser.add_argument("--chunk-chars", type=int, default=800)
+    parser.add_argument("--batch-sizes", default="64,256")
+    parser.add_argument("--in-flight", default="1,4,8")
+    parser.add_argument("--latency", type=float, default=0.2, help="Seconds per simulated request.")
+    parser.add_argument("--rpm", type=int, default=0, help="Simulated requests-per-minute limit (0 = none).")
+    parser.add_argument("--tpm", type=int, default=0, help="Executor tokens-per-minute budget (0 = none).")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests failing with 503.")
+    args = parser.parse_args()
+
+    texts = [f"chunk {i} " + "x" * args.chunk_chars for i in range(args.chunks)]
+    print(f"{'batch':>6} {'in_flight':>9} {'requests':>8} {'retries':>7} {'seconds':>8} {'chunks/s':>9}")
+    for batch_size in _ints(args.batch_sizes):
+        for in_flight in _ints(args.in_flight):
+            model = SimulatedEmbeddings(size=8, latency=args.latency, rpm=args.rpm, error_rate=args.error_rate)
+            executor = EmbeddingExecutor(
+                model,
+                batch_size=batch_size,
+                max_in_flight=in_flight,
+                tokens_per_minute=args.tpm,
+                backoff_base=0.1,
+            )
+            executor.embed_documents(texts)
+            s = executor.stats()
+            print(
+                f"{batch_size:>6} {in_flight:>9} {model.requests:>8} {s['embed_retries']:>7} "
+                f"{s['embed_seconds']:>8.2f} {s['chunks_per_second']:>9.1f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
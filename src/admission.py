@@ -0,0 +1,116 @@
+"""
+Admission control for the web app. At most max_active requests run at once and at most
+max_queue wait behind them; a request arriving with the queue full is shed immediately
+(Overloaded -> 503 with Retry-After) instead of queueing until its client gives up. A
+queued request is also shed when its deadline passes before a slot frees up. Retry-After
+is estimated from the recent service time and the work ahead. Queue depth, active requests
+and shed counts are exported through src.metrics.
+"""
+
+import asyncio
+import math
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
+
+from .deadline import remaining
+from .metrics import ADMISSION_ACTIVE, ADMISSION_QUEUE_DEPTH, ADMISSION_SHED_TOTAL
+
+
+class Overloaded(Exception):
+    """Request shed by admission control; retry_after is a hint in whole seconds."""
+
+    def __init__(self, reason: str, retry_after: int):
+        super().__init__(f"Server overloaded ({reason}); retry after {retry_after}s")
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """Bounded FIFO admission for one event loop: slot(deadline) is an async context manager."""
+
+    def __init__(self, max_active: int, max_queue: int, ewma_alpha: float = 0.2):
+        self.max_active = max(1, max_active)
+        self.max_queue = max(0, max_queue)
+        self._alpha = ewma_alpha
+        self._active = 0
+        self._waiters: deque[asyncio.Future] = deque()
+        self._service_seconds = 1.0  # EWMA of time a request holds its slot
+
+    @property
+    def active(self) -> int:
+        return self._active
+
+    @property
+    def queued(self) -> int:
+        return len(self._waiters)
+
+    def retry_after(self) -> int:
+        """Seconds until a new arrival would likely get a slot: the queue drains max_active at a time."""
+        rounds = (len(self._waiters) + 1) / self.max_active
+        return max(1, math.ceil(self._service_seconds * rounds))
+
+    def _shed(self, reason: str):
+        ADMISSION_SHED_TOTAL.inc(reason=reason)
+        raise Overloaded(reason, self.retry_after())
+
+    def _publish(self):
+        ADMISSION_ACTIVE.set(self._active)
+        ADMISSION_QUEUE_DEPTH.set(len(self._waiters))
+
+    async def _acquire(self, deadline: float | None):
+        if self._active < self.max_active and not self._waiters:
+            self._active += 1
+            return
+        if len(self._waiters) >= self.max_queue:
+            self._shed("queue_full")
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        self._publish()
+        try:
+            left = remaining(deadline)
+            if left is not None and left <= 0:
+                raise TimeoutError
+            await asyncio.wait_for(asyncio.shield(waiter), left)
+        except TimeoutError:
+            if not self._abandon(waiter):
+                return  # granted a slot just as the deadline passed; take it, the pipeline will stop early
+            self._shed("deadline")
+        except BaseException:
+            if not self._abandon(waiter):
+                self._release()  # the slot was handed to us; pass it on
+            raise
+        finally:
+            self._publish()
+
+    def _abandon(self, waiter: asyncio.Future) -> bool:
+        """Drop a waiter that gave up; False if it had already been granted the slot."""
+        if waiter.done():
+            return False
+        self._waiters.remove(waiter)
+        waiter.cancel()
+        return True
+
+    def _release(self):
+        # Hand the slot straight to the oldest waiter, so arrivals cannot jump the queue.
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self._active -= 1
+
+    @asynccontextmanager
+    async def slot(self, deadline: float | None = None) -> AsyncIterator[None]:
+        """Hold one active slot for the body; raises Overloaded when shed."""
+        await self._acquire(deadline)
+        self._publish()
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            held = time.perf_counter() - t0
+            self._service_seconds += self._alpha * (held - self._service_seconds)
+            self._release()
+            self._publish()
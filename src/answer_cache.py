@@ -0,0 +1,132 @@
+"""
+Semantic answer cache in front of the RAG graph (opt-in via ANSWER_CACHE_ENABLED).
+Entries hold the question embedding, answer and chunk IDs. Lookup tries an exact match
+on the normalized question first, then the nearest cached question by cosine similarity
+above a threshold. Entries are namespaced by prompt version and chat deployment, expire
+after a TTL, and the least recently used entry is dropped when the cache is full.
+"""
+
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+
+import numpy as np
+
+
+def normalize_question(question: str) -> str:
+    return " ".join((question or "").lower().split())
+
+
+@dataclass
+class CachedAnswer:
+    question: str
+    answer: str
+    chunk_ids: list[str]
+    created: float
+    slot: int
+    similarity: float = 1.0
+
+
+class AnswerCache:
+    """
+    In-process cache; one instance per RAGPipeline, safe to share across threads.
+    Unit-normalized question vectors live in one float32 matrix (a row per slot) so a
+    nearest-neighbour lookup is a single matrix-vector product.
+    """
+
+    def __init__(
+        self,
+        prompt_version: str,
+        deployment: str,
+        threshold: float = 0.95,
+        ttl_seconds: float = 3600,
+        max_entries: int = 10_000,
+    ):
+        self.namespace = f"{prompt_version}:{deployment}"
+        self.threshold = threshold
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[str, CachedAnswer] = OrderedDict()
+        self._matrix: np.ndarray | None = None
+        self._slot_keys: list[str | None] = []
+        self._free: list[int] = []
+        self._lock = threading.Lock()
+
+    def _key(self, question: str) -> str:
+        return hashlib.sha256(f"{self.namespace}\0{normalize_question(question)}".encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def _unit(vector) -> np.ndarray:
+        v = np.asarray(vector, dtype=np.float32)
+        norm = float(np.linalg.norm(v))
+        return v / norm if norm else v
+
+    def _drop(self, key: str):
+        entry = self._entries.pop(key)
+        self._matrix[entry.slot] = 0.0
+        self._slot_keys[entry.slot] = None
+        self._free.append(entry.slot)
+
+    def _evict_expired(self, now: float):
+        # Entries are in LRU order, not creation order, so scan them all; the dict is bounded.
+        for key in [k for k, e in self._entries.items() if now - e.created > self.ttl_seconds]:
+            self._drop(key)
+
+    def _alloc_slot(self, dim: int) -> int:
+        if self._free:
+            return self._free.pop()
+        if self._matrix is None:
+            self._matrix = np.zeros((min(256, self.max_entries), dim), dtype=np.float32)
+        elif len(self._slot_keys) == len(self._matrix):
+            grown = np.zeros((min(2 * len(self._matrix), self.max_entries), dim), dtype=np.float32)
+            grown[: len(self._matrix)] = self._matrix
+            self._matrix = grown
+        self._slot_keys.append(None)
+        return len(self._slot_keys) - 1
+
+    def get(self, question: str, vector=None) -> CachedAnswer | None:
+        """Exact match first, then nearest neighbour (needs the question embedding)."""
+        key = self._key(question)
+        with self._lock:
+            self._evict_expired(time.time())
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry
+            if vector is None or not self._entries:
+                self.misses += 1
+                return None
+            # Freed slots are zero rows, so they score 0 and never pass a positive threshold.
+            sims = self._matrix[: len(self._slot_keys)] @ self._unit(vector)
+            best = int(np.argmax(sims))
+            if sims[best] < self.threshold:
+                self.misses += 1
+                return None
+            best_key = self._slot_keys[best]
+            self._entries.move_to_end(best_key)
+            self.hits += 1
+            entry = self._entries[best_key]
+            return CachedAnswer(
+                entry.question, entry.answer, entry.chunk_ids, entry.created, entry.slot, float(sims[best])
+            )
+
+    def put(self, question: str, vector, answer: str, chunk_ids: list[str]):
+        unit = self._unit(vector)
+        key = self._key(question)
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+            while len(self._entries) >= self.max_entries:
+                self._drop(next(iter(self._entries)))
+            slot = self._alloc_slot(len(unit))
+            self._matrix[slot] = unit
+            self._slot_keys[slot] = key
+            self._entries[key] = CachedAnswer(question, answer, list(chunk_ids), time.time(), slot)
+
+    def stats(self) -> dict:
+        return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
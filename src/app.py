@@ -1,35 +1,90 @@
 """
 FastAPI app for the RAG demo: one-page UI to ask questions and see answer + chunks.
+Only light modules are imported here; the pipeline (LangChain, Chroma, OpenAI) is imported
+and built by PipelineHolder, warmed in the background at startup. /health answers as soon
+as the process is up, /ready once the pipeline is built.
 """
 
+import time
+
+_IMPORT_T0 = time.perf_counter()
+
+import asyncio
+import json
 import sys
+from contextlib import AsyncExitStack, asynccontextmanager
 from pathlib import Path
 
 ROOT = Path(__file__).resolve().parent.parent
 sys.path.insert(0, str(ROOT))
 
-from fastapi import FastAPI, Form
-from fastapi.responses import HTMLResponse
+from fastapi import FastAPI, Form, HTTPException, Request
+from fastapi.responses import HTMLResponse, JSONResponse, PlainTextResponse, StreamingResponse
+from pydantic import BaseModel, Field
+from starlette.background import BackgroundTask
 
 # Load env before importing pipeline (needs Azure/LangSmith)
 from dotenv import load_dotenv
 load_dotenv(ROOT / ".env")
 
+from src.admission import AdmissionController, Overloaded
+from src.config import (
+    RAG_ADMISSION_MAX_ACTIVE,
+    RAG_ADMISSION_QUEUE_SIZE,
+    RAG_BATCH_MAX_QUESTIONS,
+    RAG_REQUEST_TIMEOUT_SECONDS,
+    STARTUP_WARM,
+)
+from src.deadline import DeadlineExceeded, deadline_after
+from src.metrics import render as render_metrics
 from src.observability import configure_tracing
-from src.pipeline import get_pipeline
+from src.startup import PipelineHolder
 
 configure_tracing()
-app = FastAPI(title="LLM Observability & Evaluation Demo", version="0.1.0")
 
-# Lazy init so ingest can run first
-_pipeline = None
+# Built once, lazily (so ingest can run first) or by the startup warm-up thread.
+_holder = PipelineHolder()
+_holder.record("import_app", time.perf_counter() - _IMPORT_T0)
+# Bounds requests running + waiting; beyond that /query* answer 503 with Retry-After right away.
+_admission = AdmissionController(RAG_ADMISSION_MAX_ACTIVE, RAG_ADMISSION_QUEUE_SIZE)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if STARTUP_WARM:
+        _holder.warm_in_background()
+    yield
+    _holder.close()  # flush buffered run-log records
+    from src.clients import aclose_clients  # httpx only; no-op if the pipeline never ran
 
+    await aclose_clients()
 
-def _get_pipeline():
-    global _pipeline
-    if _pipeline is None:
-        _pipeline = get_pipeline()
-    return _pipeline
+
+app = FastAPI(title="LLM Observability & Evaluation Demo", version="0.1.0", lifespan=lifespan)
+
+
+async def _get_pipeline():
+    pipeline = _holder.peek()
+    if pipeline is None:
+        # Build (or wait for the warm-up build) off the event loop so /health stays responsive.
+        pipeline = await asyncio.to_thread(_holder.get)
+    return pipeline
+
+
+def _request_deadline(request: Request) -> float | None:
+    """RAG_REQUEST_TIMEOUT_SECONDS from now, or sooner if the client sent X-Request-Timeout (seconds)."""
+    timeout = RAG_REQUEST_TIMEOUT_SECONDS
+    try:
+        asked = float(request.headers.get("x-request-timeout") or 0)
+    except ValueError:
+        asked = 0.0
+    if asked > 0:
+        timeout = min(timeout, asked) if timeout > 0 else asked
+    return deadline_after(timeout)
+
+
+def _retry_after(e: Overloaded) -> dict:
+    return {"Retry-After": str(e.retry_after)}
 
 
 HTML_INDEX = """
@@ -73,9 +128,43 @@ HTML_INDEX = """
     <div class="result" id="result"></div>
   </div>
   <script>
-    document.getElementById('f').onsubmit = function() {
-      document.getElementById('btn').disabled = true;
-      document.getElementById('result').innerHTML = 'Running...';
+    // Stream over SSE (/query/stream) when possible; the plain form POST is the fallback.
+    function el(tag, cls, text) {
+      var e = document.createElement(tag);
+      if (cls) e.className = cls;
+      if (text) e.textContent = text;
+      return e;
+    }
+    document.getElementById('f').onsubmit = function(ev) {
+      var btn = document.getElementById('btn');
+      var result = document.getElementById('result');
+      btn.disabled = true;
+      result.innerHTML = 'Running...';
+      if (!window.EventSource) return true;
+      ev.preventDefault();
+      var q = this.elements['question'].value;
+      var src = new EventSource('/query/stream?question=' + encodeURIComponent(q));
+      var answer = el('div', 'answer'), meta = el('div', 'meta'), chunks = el('div', 'chunks');
+      result.innerHTML = '';
+      [el('h2', '', 'Answer'), answer, meta, el('h2', 'chunks', 'Retrieved chunks'), chunks].forEach(function(n) { result.appendChild(n); });
+      src.addEventListener('chunks', function(e) {
+        var list = JSON.parse(e.data);
+        if (!list.length) chunks.appendChild(el('div', 'chunk', 'No chunks.'));
+        list.forEach(function(c, i) { chunks.appendChild(el('div', 'chunk', '[' + (i + 1) + '] ' + c.content + '...')); });
+      });
+      src.addEventListener('token', function(e) { answer.textContent += JSON.parse(e.data); });
+      src.addEventListener('done', function(e) {
+        var d = JSON.parse(e.data);
+        meta.textContent = 'Latency: ' + d.latency_seconds.toFixed(2) + 's | First token: ' + d.ttft_seconds.toFixed(2) +
+          's | Tokens: in ' + d.input_tokens + ' / out ' + d.output_tokens +
+          ' | Cost: ' + (d.cost_usd == null ? 'n/a' : '$' + d.cost_usd.toFixed(5)) + ' | Prompt: ' + d.prompt_version;
+        src.close(); btn.disabled = false;
+      });
+      src.addEventListener('error', function(e) {
+        if (e.data) result.appendChild(el('div', 'error', 'Error: ' + JSON.parse(e.data)));
+        src.close(); btn.disabled = false;
+      });
+      return false;
     };
   </script>
 </body>
@@ -89,31 +178,143 @@ async def index():
 
 
 @app.post("/query", response_class=HTMLResponse)
-async def query(question: str = Form("")):
+async def query(request: Request, question: str = Form("")):
     question = (question or "").strip()
     if not question:
         return HTML_INDEX + '<div class="result error">Please enter a question.</div>'
+    deadline = _request_deadline(request)
     try:
-        pipeline = _get_pipeline()
-        out = pipeline.run(question)
-        chunks_preview = []
-        for i, c in enumerate(out.get("retrieved_chunks", [])[:5]):
-            content = getattr(c, "page_content", str(c))[:200]
-            chunks_preview.append(f'<div class="chunk">[{i+1}] {content}...</div>')
-        chunks_html = "".join(chunks_preview) if chunks_preview else "<div class='chunk'>No chunks.</div>"
-        meta = f"Latency: {out.get('latency_seconds', 0):.2f}s | Tokens (est): in {out.get('input_tokens', 0)} / out {out.get('output_tokens', 0)} | Prompt: {out.get('prompt_version', '')}"
-        result = f"""
-        <div class="result">
-          <h2>Answer</h2>
-          <div class="answer">{_escape(out.get("answer", ""))}</div>
-          <div class="meta">{_escape(meta)}</div>
-          <h2 class="chunks">Retrieved chunks</h2>
-          <div class="chunks">{chunks_html}</div>
-        </div>
-        """
-        return HTML_INDEX + result
+        async with _admission.slot(deadline):
+            pipeline = await _get_pipeline()
+            out = await pipeline.arun(question, deadline)
+    except Overloaded as e:
+        error = f'<div class="result error">Error: {_escape(str(e))}</div>'
+        return HTMLResponse(HTML_INDEX + error, status_code=503, headers=_retry_after(e))
+    except DeadlineExceeded as e:
+        return HTMLResponse(HTML_INDEX + f'<div class="result error">Error: {_escape(str(e))}</div>', status_code=504)
     except Exception as e:
         return HTML_INDEX + f'<div class="result error">Error: {_escape(str(e))}</div>'
+    chunks_preview = []
+    for i, c in enumerate(out.get("retrieved_chunks", [])[:5]):
+        content = getattr(c, "page_content", str(c))[:200]
+        chunks_preview.append(f'<div class="chunk">[{i+1}] {content}...</div>')
+    chunks_html = "".join(chunks_preview) if chunks_preview else "<div class='chunk'>No chunks.</div>"
+    cost = out.get("cost_usd")
+    cost_text = f"${cost:.5f}" if cost is not None else "n/a"
+    meta = f"Latency: {out.get('latency_seconds', 0):.2f}s | Tokens: in {out.get('input_tokens', 0)} / out {out.get('output_tokens', 0)} | Cost: {cost_text} | Prompt: {out.get('prompt_version', '')}"
+    result = f"""
+    <div class="result">
+      <h2>Answer</h2>
+      <div class="answer">{_escape(out.get("answer", ""))}</div>
+      <div class="meta">{_escape(meta)}</div>
+      <h2 class="chunks">Retrieved chunks</h2>
+      <div class="chunks">{chunks_html}</div>
+    </div>
+    """
+    return HTML_INDEX + result
+
+
+def _sse(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+@app.get("/query/stream")
+async def query_stream(request: Request, question: str = ""):
+    """Server-Sent Events: `chunks` right after retrieval, `token` per answer piece, then `done` with run metadata."""
+    question = (question or "").strip()
+    deadline = _request_deadline(request)
+    # The admission slot is taken before the response starts (so shedding is a real 503) and
+    # held until the stream ends; the background task frees it if the stream never ran.
+    slot = AsyncExitStack()
+    if question:
+        try:
+            await slot.enter_async_context(_admission.slot(deadline))
+        except Overloaded as e:
+            return JSONResponse({"detail": str(e)}, status_code=503, headers=_retry_after(e))
+
+    async def events():
+        if not question:
+            yield _sse("error", "Please enter a question.")
+            return
+        try:
+            pipeline = await _get_pipeline()
+            async for ev in pipeline.astream(question, deadline):
+                if ev["event"] == "chunks":
+                    data = [
+                        {"content": getattr(c, "page_content", str(c))[:200]}
+                        for c in ev["data"][:5]
+                    ]
+                elif ev["event"] == "done":
+                    out = ev["data"]
+                    data = {
+                        k: out.get(k)
+                        for k in (
+                            "chunk_ids",
+                            "latency_seconds",
+                            "ttft_seconds",
+                            "input_tokens",
+                            "output_tokens",
+                            "cost_usd",
+                            "prompt_version",
+                            "target",
+                            "cache_hit",
+                        )
+                    }
+                else:
+                    data = ev["data"]
+                yield _sse(ev["event"], data)
+        except Exception as e:
+            yield _sse("error", str(e))
+        finally:
+            await slot.aclose()
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        background=BackgroundTask(slot.aclose),
+    )
+
+
+class BatchQuery(BaseModel):
+    questions: list[str]
+    # Lowers a batch's fan-out; the pipeline clamps it to RAG_MAX_CONCURRENCY either way.
+    max_concurrency: int | None = Field(default=None, ge=1)
+
+
+_BATCH_FIELDS = (
+    "question",
+    "answer",
+    "chunk_ids",
+    "latency_seconds",
+    "input_tokens",
+    "output_tokens",
+    "cost_usd",
+    "prompt_version",
+    "target",
+    "cache_hit",
+    "error",
+)
+
+
+@app.post("/query/batch")
+async def query_batch(body: BatchQuery, request: Request):
+    """JSON batch: {"questions": [...]} -> {"results": [...]} in the same order; failed items carry "error"."""
+    questions = [q.strip() for q in body.questions]
+    if not questions or any(not q for q in questions):
+        raise HTTPException(status_code=422, detail="questions must be a non-empty list of non-empty strings")
+    if len(questions) > RAG_BATCH_MAX_QUESTIONS:
+        raise HTTPException(status_code=413, detail=f"at most {RAG_BATCH_MAX_QUESTIONS} questions per request")
+    deadline = _request_deadline(request)
+    try:
+        async with _admission.slot(deadline):
+            pipeline = await _get_pipeline()
+            outs = await pipeline.arun_batch(questions, max_concurrency=body.max_concurrency, deadline=deadline)
+    except Overloaded as e:
+        raise HTTPException(status_code=503, detail=str(e), headers=_retry_after(e)) from None
+    except DeadlineExceeded as e:
+        raise HTTPException(status_code=504, detail=str(e)) from None
+    return {"results": [{k: out[k] for k in _BATCH_FIELDS if k in out} for out in outs]}
 
 
 def _escape(s: str) -> str:
@@ -122,4 +323,17 @@ def _escape(s: str) -> str:
 
 @app.get("/health")
 async def health():
+    """Liveness: the process is up (the pipeline may still be warming)."""
     return {"status": "ok"}
+
+
+@app.get("/ready")
+async def ready():
+    """Readiness: 200 once the pipeline is built, 503 while warming or after a failed build; includes startup timings."""
+    return JSONResponse(_holder.status(), status_code=200 if _holder.ready else 503)
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Prometheus text format: per-stage latency histograms, request latency, TTFT, run counts."""
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
@@ -0,0 +1,161 @@
+"""
+Compact, memory-mapped chunk store written next to the NumPy vector index. Chunk text, ID
+and metadata live in one UTF-8 blob (chunks.bin); a fixed-width row table (chunks.npy)
+holds each chunk's offset, field lengths and token count, and a sorted hash table
+(chunk_ids.npy) maps chunk IDs to rows. Every file is mapped read-only, so uvicorn workers
+share the page cache instead of each holding the corpus as Python strings and dicts, and
+retrieval returns Chunk handles (row + store) that decode their text on first access.
+
+Only the NumPy backend (RETRIEVER_BACKEND=numpy) has a chunk store: it is part of that
+export. With the default Chroma backend each worker keeps its own Chroma client, retrieval
+returns full Documents, and context assembly tokenizes chunk text per request.
+"""
+
+import hashlib
+import json
+from pathlib import Path
+from typing import Iterator, Sequence
+
+import numpy as np
+from langchain_core.documents import Document
+
+from .usage import count_tokens
+
+ROW_DTYPE = np.dtype(
+    [("start", "<i8"), ("text_len", "<i4"), ("id_len", "<i4"), ("meta_len", "<i4"), ("tokens", "<i4")]
+)
+ID_DTYPE = np.dtype([("hash", "<u8"), ("row", "<i8")])
+
+
+def _id_hash(chunk_id: str) -> int:
+    return int.from_bytes(hashlib.blake2b(chunk_id.encode(), digest_size=8).digest(), "little")
+
+
+def write_chunk_store(path: Path, ids: Sequence[str], texts: Sequence[str], metadatas: Sequence[dict]):
+    """Write chunks.bin / chunks.npy / chunk_ids.npy for rows in order (path must exist)."""
+    rows = np.zeros(len(ids), dtype=ROW_DTYPE)
+    start = 0
+    with open(path / "chunks.bin", "wb") as blob:
+        for row, (chunk_id, text, meta) in enumerate(zip(ids, texts, metadatas)):
+            text = text or ""
+            text_b = text.encode()
+            id_b = chunk_id.encode()
+            meta_b = json.dumps(meta, separators=(",", ":")).encode() if meta else b""
+            blob.write(text_b + id_b + meta_b)
+            tokens = count_tokens(text.strip()) if text.strip() else 0
+            rows[row] = (start, len(text_b), len(id_b), len(meta_b), tokens)
+            start += len(text_b) + len(id_b) + len(meta_b)
+    np.save(path / "chunks.npy", rows)
+    index = np.array([(_id_hash(chunk_id), row) for row, chunk_id in enumerate(ids)], dtype=ID_DTYPE)
+    index.sort(order="hash", kind="stable")
+    np.save(path / "chunk_ids.npy", index)
+
+
+class ChunkStore:
+    """Read-only view over a write_chunk_store() directory; rows are decoded on demand."""
+
+    def __init__(self, blob: np.ndarray, rows: np.ndarray, id_index: np.ndarray):
+        self._blob = blob
+        self._rows = rows
+        self._id_index = id_index
+
+    @classmethod
+    def open(cls, path: Path) -> "ChunkStore":
+        size = (path / "chunks.bin").stat().st_size
+        # np.memmap cannot map an empty file; a store of empty chunks has nothing to read anyway.
+        blob = np.memmap(path / "chunks.bin", dtype=np.uint8, mode="r") if size else np.zeros(0, dtype=np.uint8)
+        return cls(blob, np.load(path / "chunks.npy", mmap_mode="r"), np.load(path / "chunk_ids.npy", mmap_mode="r"))
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def _field(self, row: int, field: int) -> bytes:
+        start, text_len, id_len, meta_len, _ = self._rows[row].tolist()
+        bounds = (start, start + text_len, start + text_len + id_len, start + text_len + id_len + meta_len)
+        return self._blob[bounds[field] : bounds[field + 1]].tobytes()
+
+    def text(self, row: int) -> str:
+        return self._field(row, 0).decode()
+
+    def chunk_id(self, row: int) -> str:
+        return self._field(row, 1).decode()
+
+    def metadata(self, row: int) -> dict:
+        raw = self._field(row, 2)
+        return json.loads(raw) if raw else {}
+
+    def tokens(self, row: int) -> int:
+        """Token count of the stripped chunk text, taken at export time."""
+        return int(self._rows[row]["tokens"])
+
+    def row_of(self, chunk_id: str) -> int | None:
+        """Row for a chunk ID (binary search on its hash), or None if absent."""
+        h = np.uint64(_id_hash(chunk_id))
+        hashes = self._id_index["hash"]
+        i = int(np.searchsorted(hashes, h))
+        while i < len(hashes) and hashes[i] == h:
+            row = int(self._id_index[i]["row"])
+            if self.chunk_id(row) == chunk_id:
+                return row
+            i += 1
+        return None
+
+    def chunk(self, row: int) -> "Chunk":
+        return Chunk(self, row)
+
+    def by_ids(self, ids: Sequence[str]) -> list["Chunk"]:
+        """Handles for the IDs present, in the order given."""
+        rows = (self.row_of(chunk_id) for chunk_id in ids)
+        return [Chunk(self, row) for row in rows if row is not None]
+
+    def iter_chunks(self) -> Iterator[tuple[str, str]]:
+        """(chunk ID, text) for every row, in row order."""
+        for row in range(len(self)):
+            yield self.chunk_id(row), self.text(row)
+
+
+class Chunk:
+    """
+    Lightweight retrieval result: a row in a ChunkStore. Reads like a Document
+    (page_content, metadata, id); text and metadata are decoded once, on first access.
+    """
+
+    __slots__ = ("store", "row", "_text", "_metadata")
+
+    def __init__(self, store: ChunkStore, row: int):
+        self.store = store
+        self.row = row
+        self._text = None
+        self._metadata = None
+
+    @property
+    def page_content(self) -> str:
+        if self._text is None:
+            self._text = self.store.text(self.row)
+        return self._text
+
+    @property
+    def metadata(self) -> dict:
+        if self._metadata is None:
+            self._metadata = self.store.metadata(self.row)
+        return self._metadata
+
+    @property
+    def id(self) -> str:
+        return self.store.chunk_id(self.row)
+
+    @property
+    def tokens(self) -> int:
+        return self.store.tokens(self.row)
+
+    def to_document(self) -> Document:
+        return Document(page_content=self.page_content, metadata=dict(self.metadata), id=self.id)
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, Chunk) and other.store is self.store and other.row == self.row
+
+    def __hash__(self) -> int:
+        return hash((id(self.store), self.row))
+
+    def __repr__(self) -> str:
+        return f"Chunk(id={self.id!r}, row={self.row})"
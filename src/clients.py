@@ -0,0 +1,203 @@
+"""
+Shared HTTP clients for Azure OpenAI. One pooled httpx.Client (sync calls, ingest and
+embedding threads) and one httpx.AsyncClient (the async serving path) per process, used by
+both the chat model and the embeddings, so TLS connections to the endpoint are kept alive
+and reused instead of every model object opening its own pool. Pool size, keep-alive and
+timeouts come from config; HTTP/2 is used when enabled and the h2 package is installed.
+Each request reports whether it opened a new connection or reused one
+(rag_http_requests_total{connection="new"|"reused"}) and how long connection setup took.
+
+The async client is bound to the event loop that first uses it (the server's loop).
+"""
+
+import importlib.util
+import logging
+import threading
+import time
+
+import httpx
+
+from .config import (
+    AZURE_OPENAI_API_KEY,
+    AZURE_OPENAI_API_VERSION,
+    AZURE_OPENAI_DEPLOYMENT_CHAT,
+    AZURE_OPENAI_DEPLOYMENT_EMBEDDING,
+    AZURE_OPENAI_ENDPOINT,
+    HTTP2_ENABLED,
+    HTTP_CONNECT_TIMEOUT_SECONDS,
+    HTTP_KEEPALIVE_SECONDS,
+    HTTP_MAX_CONNECTIONS,
+    HTTP_MAX_KEEPALIVE,
+    HTTP_TIMEOUT_SECONDS,
+)
+from .metrics import HTTP_CONNECT_SECONDS, HTTP_REQUESTS_TOTAL
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_sync_client: httpx.Client | None = None
+_async_client: httpx.AsyncClient | None = None
+_embeddings: dict = {}  # max_retries (None = SDK default) -> AzureOpenAIEmbeddings
+
+
+class _ConnectionTrace:
+    """Per-request httpcore trace hook: notes whether the request had to open a connection."""
+
+    def __init__(self):
+        self.new = False
+        self.started = 0.0
+        self.ready = 0.0
+
+    def event(self, name: str, info: dict):
+        if name == "connection.connect_tcp.started":
+            self.new = True
+            self.started = time.perf_counter()
+        elif name in ("connection.connect_tcp.complete", "connection.start_tls.complete"):
+            self.ready = time.perf_counter()
+
+    def record(self, pool: str):
+        HTTP_REQUESTS_TOTAL.inc(pool=pool, connection="new" if self.new else "reused")
+        if self.new and self.ready:
+            HTTP_CONNECT_SECONDS.observe(self.ready - self.started, pool=pool)
+
+
+def _http2() -> bool:
+    if HTTP2_ENABLED and importlib.util.find_spec("h2") is None:
+        logger.warning("HTTP2_ENABLED is set but the h2 package is not installed; using HTTP/1.1")
+        return False
+    return HTTP2_ENABLED
+
+
+def _pool_kwargs() -> dict:
+    return {
+        "limits": httpx.Limits(
+            max_connections=HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=HTTP_MAX_KEEPALIVE,
+            keepalive_expiry=HTTP_KEEPALIVE_SECONDS,
+        ),
+        "timeout": timeout(),
+        "http2": _http2(),
+    }
+
+
+def timeout() -> httpx.Timeout:
+    """Per-request timeout (passed to the OpenAI client too, which otherwise sends its own 600s default)."""
+    return httpx.Timeout(HTTP_TIMEOUT_SECONDS, connect=HTTP_CONNECT_TIMEOUT_SECONDS)
+
+
+def _on_request(request: httpx.Request):
+    trace = _ConnectionTrace()
+    request.extensions["trace"] = trace.event
+    request.extensions["rag_trace"] = trace
+
+
+def _on_response(response: httpx.Response):
+    trace = response.request.extensions.get("rag_trace")
+    if trace is not None:
+        trace.record("sync")
+
+
+async def _aon_request(request: httpx.Request):
+    trace = _ConnectionTrace()
+
+    async def event(name: str, info: dict):  # httpcore awaits the hook on the async path
+        trace.event(name, info)
+
+    request.extensions["trace"] = event
+    request.extensions["rag_trace"] = trace
+
+
+async def _aon_response(response: httpx.Response):
+    trace = response.request.extensions.get("rag_trace")
+    if trace is not None:
+        trace.record("async")
+
+
+def http_client() -> httpx.Client:
+    """The process-wide pooled sync client (created on first use)."""
+    global _sync_client
+    with _lock:
+        if _sync_client is None or _sync_client.is_closed:
+            _sync_client = httpx.Client(
+                event_hooks={"request": [_on_request], "response": [_on_response]}, **_pool_kwargs()
+            )
+        return _sync_client
+
+
+def async_http_client() -> httpx.AsyncClient:
+    """The process-wide pooled async client (created on first use)."""
+    global _async_client
+    with _lock:
+        if _async_client is None or _async_client.is_closed:
+            _async_client = httpx.AsyncClient(
+                event_hooks={"request": [_aon_request], "response": [_aon_response]}, **_pool_kwargs()
+            )
+        return _async_client
+
+
+def chat_model(
+    deployment: str = AZURE_OPENAI_DEPLOYMENT_CHAT,
+    endpoint: str | None = None,
+    api_key: str | None = None,
+    **kwargs,
+):
+    """
+    AzureChatOpenAI for deployment on the shared clients (endpoint and key default to
+    AZURE_OPENAI_ENDPOINT / AZURE_OPENAI_API_KEY); kwargs go to the model (temperature, ...).
+    """
+    from langchain_openai import AzureChatOpenAI
+
+    return AzureChatOpenAI(
+        azure_endpoint=endpoint or AZURE_OPENAI_ENDPOINT,
+        api_key=api_key or AZURE_OPENAI_API_KEY,
+        api_version=AZURE_OPENAI_API_VERSION,
+        azure_deployment=deployment,
+        http_client=http_client(),
+        http_async_client=async_http_client(),
+        timeout=timeout(),
+        **kwargs,
+    )
+
+
+def embeddings_model(max_retries: int | None = None):
+    """
+    The process-wide AzureOpenAIEmbeddings on the shared clients (without the on-disk cache).
+    Callers that retry on their own (EmbeddingExecutor) ask for max_retries=0 and get a
+    separate instance, so SDK retries do not nest inside theirs; None keeps the SDK default.
+    """
+    model = _embeddings.get(max_retries)
+    if model is None:
+        from langchain_openai import AzureOpenAIEmbeddings
+
+        kwargs = {} if max_retries is None else {"max_retries": max_retries}
+        model = _embeddings[max_retries] = AzureOpenAIEmbeddings(
+            azure_endpoint=AZURE_OPENAI_ENDPOINT,
+            api_key=AZURE_OPENAI_API_KEY,
+            api_version=AZURE_OPENAI_API_VERSION,
+            azure_deployment=AZURE_OPENAI_DEPLOYMENT_EMBEDDING,
+            http_client=http_client(),
+            http_async_client=async_http_client(),
+            timeout=timeout(),
+            **kwargs,
+        )
+    return model
+
+
+def close_clients():
+    """Close the sync client; the async one needs aclose_clients() on its event loop."""
+    global _sync_client
+    with _lock:
+        client, _sync_client = _sync_client, None
+        _embeddings.clear()
+    if client is not None:
+        client.close()
+
+
+async def aclose_clients():
+    """Close both shared clients; call from the server's shutdown."""
+    global _async_client
+    close_clients()
+    with _lock:
+        client, _async_client = _async_client, None
+    if client is not None:
+        await client.aclose()
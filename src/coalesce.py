@@ -0,0 +1,77 @@
+"""
+Single-flight request coalescing. Concurrent calls with the same key share one execution:
+the first caller (the leader) runs the work, callers that arrive while it is in flight wait
+for it and get the same result or exception. Nothing is kept once the call finishes, so
+this only absorbs bursts of identical requests; repeats over time are the answer cache's job.
+"""
+
+import asyncio
+import threading
+from typing import Any, Awaitable, Callable, Hashable
+
+
+class _Call:
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: BaseException | None = None
+
+
+class SingleFlight:
+    """do() coalesces across threads, ado() across tasks on one event loop; both return (result, leader)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: dict[Hashable, _Call] = {}
+        self._tasks: dict[tuple[int, Hashable], asyncio.Future] = {}
+
+    def in_flight(self) -> int:
+        with self._lock:
+            return len(self._calls) + len(self._tasks)
+
+    def do(self, key: Hashable, fn: Callable[[], Any], timeout: float | None = None) -> tuple[Any, bool]:
+        """timeout bounds how long a follower waits (TimeoutError); the leader's own run is not cut short."""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+        if not leader:
+            if not call.done.wait(None if timeout is None else max(0.0, timeout)):
+                raise TimeoutError("timed out waiting for a coalesced call")
+            if call.error is not None:
+                raise call.error
+            return call.result, False
+        try:
+            call.result = fn()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result, True
+
+    async def ado(
+        self, key: Hashable, fn: Callable[[], Awaitable[Any]], timeout: float | None = None
+    ) -> tuple[Any, bool]:
+        # The shared work runs as its own task and every caller awaits it through shield(),
+        # so one caller being cancelled (client went away) does not cancel it for the others.
+        slot = (id(asyncio.get_running_loop()), key)
+        with self._lock:
+            task = self._tasks.get(slot)
+            leader = task is None
+            if leader:
+                task = self._tasks[slot] = asyncio.ensure_future(fn())
+                task.add_done_callback(lambda t: self._forget(slot, t))
+        if leader or timeout is None:
+            return await asyncio.shield(task), leader
+        return await asyncio.wait_for(asyncio.shield(task), max(0.0, timeout)), leader
+
+    def _forget(self, slot: tuple, task: asyncio.Future):
+        with self._lock:
+            if self._tasks.get(slot) is task:
+                del self._tasks[slot]
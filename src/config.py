@@ -16,6 +16,80 @@ AZURE_OPENAI_API_KEY = _env("AZURE_OPENAI_API_KEY")
 AZURE_OPENAI_API_VERSION = _env("AZURE_OPENAI_API_VERSION", "2024-08-01-preview")
 AZURE_OPENAI_DEPLOYMENT_CHAT = _env("AZURE_OPENAI_DEPLOYMENT_CHAT", "gpt-4o")
 AZURE_OPENAI_DEPLOYMENT_EMBEDDING = _env("AZURE_OPENAI_DEPLOYMENT_EMBEDDING", "text-embedding-3-small")
+# Route chat calls across several deployments / endpoints (src/router.py): JSON list of deployment
+# names or {"deployment", "endpoint", "api_key", "name"} objects; empty = AZURE_OPENAI_DEPLOYMENT_CHAT only
+AZURE_OPENAI_CHAT_TARGETS = _env("AZURE_OPENAI_CHAT_TARGETS")
+CHAT_ROUTER_WINDOW_SECONDS = float(_env("CHAT_ROUTER_WINDOW_SECONDS", "60"))
+CHAT_ROUTER_WINDOW_SIZE = int(_env("CHAT_ROUTER_WINDOW_SIZE", "200"))
+CHAT_ROUTER_MAX_ERROR_RATE = float(_env("CHAT_ROUTER_MAX_ERROR_RATE", "0.5"))
+CHAT_ROUTER_COOLDOWN_SECONDS = float(_env("CHAT_ROUTER_COOLDOWN_SECONDS", "30"))
+# Hedging: resend a chat call to the next-best target once the first is slower than its own percentile
+CHAT_HEDGE_ENABLED = _env("CHAT_HEDGE_ENABLED", "false").lower() in ("true", "1", "yes")
+CHAT_HEDGE_PERCENTILE = float(_env("CHAT_HEDGE_PERCENTILE", "90"))
+CHAT_HEDGE_DELAY_SECONDS = float(_env("CHAT_HEDGE_DELAY_SECONDS", "1.0"))
+# Optional JSON price overrides, USD per 1M tokens: {"deployment-or-model-prefix": [input, output]}
+CHAT_PRICES_PER_1M = _env("CHAT_PRICES_PER_1M")
+
+# Embedding cache (SQLite, keyed by deployment + text hash, LRU-bounded)
+EMBEDDING_CACHE_ENABLED = _env("EMBEDDING_CACHE_ENABLED", "true").lower() in ("true", "1", "yes")
+EMBEDDING_CACHE_MAX_ENTRIES = int(_env("EMBEDDING_CACHE_MAX_ENTRIES", "200000"))
+
+# Ingest: worker processes for loading/splitting (0 = one per CPU) and chunks per embedding batch
+INGEST_WORKERS = int(_env("INGEST_WORKERS", "0"))
+INGEST_BATCH_SIZE = int(_env("INGEST_BATCH_SIZE", "256"))
+# Embedding requests in flight during ingest, tokens-per-minute budget (0 = unlimited), retries on 429/5xx
+EMBEDDING_MAX_IN_FLIGHT = int(_env("EMBEDDING_MAX_IN_FLIGHT", "4"))
+EMBEDDING_TOKENS_PER_MINUTE = int(_env("EMBEDDING_TOKENS_PER_MINUTE", "0"))
+EMBEDDING_MAX_RETRIES = int(_env("EMBEDDING_MAX_RETRIES", "6"))
+
+# Query-time retriever backend: "chroma", or "numpy" (memory-mapped export of the Chroma collection)
+RETRIEVER_BACKEND = _env("RETRIEVER_BACKEND", "chroma").lower()
+# numpy backend layout: "exact" (full scan) or "ivf" (k-means lists; 0 lists = sqrt(rows)), lists scanned per query
+RETRIEVER_INDEX = _env("RETRIEVER_INDEX", "exact").lower()
+RETRIEVER_IVF_NLIST = int(_env("RETRIEVER_IVF_NLIST", "0"))
+RETRIEVER_IVF_NPROBE = int(_env("RETRIEVER_IVF_NPROBE", "8"))
+
+# Retrieval mode: "dense", or "hybrid" (BM25 + dense fused by reciprocal rank; candidates per side, RRF constant)
+RETRIEVAL_MODE = _env("RETRIEVAL_MODE", "dense").lower()
+HYBRID_FETCH_K = int(_env("HYBRID_FETCH_K", "20"))
+HYBRID_RRF_K = int(_env("HYBRID_RRF_K", "60"))
+
+# Context assembly: token budget for retrieved context (0 = no budget), Jaccard at which chunks count as duplicates
+CONTEXT_TOKEN_BUDGET = int(_env("CONTEXT_TOKEN_BUDGET", "3000"))
+CONTEXT_DEDUP_THRESHOLD = float(_env("CONTEXT_DEDUP_THRESHOLD", "0.8"))
+
+# Shared HTTP clients for Azure OpenAI (chat + embeddings): pool size, idle keep-alive, timeouts, opt-in HTTP/2 (needs h2)
+HTTP_MAX_CONNECTIONS = int(_env("HTTP_MAX_CONNECTIONS", "100"))
+HTTP_MAX_KEEPALIVE = int(_env("HTTP_MAX_KEEPALIVE", "20"))
+HTTP_KEEPALIVE_SECONDS = float(_env("HTTP_KEEPALIVE_SECONDS", "30"))
+HTTP_TIMEOUT_SECONDS = float(_env("HTTP_TIMEOUT_SECONDS", "60"))
+HTTP_CONNECT_TIMEOUT_SECONDS = float(_env("HTTP_CONNECT_TIMEOUT_SECONDS", "5"))
+HTTP2_ENABLED = _env("HTTP2_ENABLED", "false").lower() in ("true", "1", "yes")
+
+# Semantic answer cache (opt-in): exact repeat or cosine >= threshold reuses a previous answer
+ANSWER_CACHE_ENABLED = _env("ANSWER_CACHE_ENABLED", "false").lower() in ("true", "1", "yes")
+ANSWER_CACHE_THRESHOLD = float(_env("ANSWER_CACHE_THRESHOLD", "0.95"))
+ANSWER_CACHE_TTL_SECONDS = float(_env("ANSWER_CACHE_TTL_SECONDS", "3600"))
+ANSWER_CACHE_MAX_ENTRIES = int(_env("ANSWER_CACHE_MAX_ENTRIES", "10000"))
+
+# Run log (data/runs.jsonl): batched background writes, optional size-based rotation (0 = off)
+RUN_LOG_BATCH_SIZE = int(_env("RUN_LOG_BATCH_SIZE", "100"))
+RUN_LOG_FLUSH_SECONDS = float(_env("RUN_LOG_FLUSH_SECONDS", "1.0"))
+RUN_LOG_MAX_BYTES = int(_env("RUN_LOG_MAX_BYTES", "0"))
+
+# Serving: cap on concurrent RAG executions per process (async path).
+RAG_MAX_CONCURRENCY = int(_env("RAG_MAX_CONCURRENCY", "64"))
+# Concurrent identical questions (normalized, same prompt version and k) share one pipeline run
+RAG_COALESCE_ENABLED = _env("RAG_COALESCE_ENABLED", "true").lower() in ("true", "1", "yes")
+# Web server: build the pipeline in a background thread at startup instead of on the first request
+STARTUP_WARM = _env("STARTUP_WARM", "true").lower() in ("true", "1", "yes")
+# Largest question list accepted by POST /query/batch
+RAG_BATCH_MAX_QUESTIONS = int(_env("RAG_BATCH_MAX_QUESTIONS", "1000"))
+# Web server: deadline per request (0 = none); clients may ask for less with an X-Request-Timeout header (seconds)
+RAG_REQUEST_TIMEOUT_SECONDS = float(_env("RAG_REQUEST_TIMEOUT_SECONDS", "30"))
+# Admission control: requests running at once, and how many may wait before new ones get 503 + Retry-After
+RAG_ADMISSION_MAX_ACTIVE = int(_env("RAG_ADMISSION_MAX_ACTIVE", "0")) or RAG_MAX_CONCURRENCY
+RAG_ADMISSION_QUEUE_SIZE = int(_env("RAG_ADMISSION_QUEUE_SIZE", "64"))
 
 # LangSmith: when LANGCHAIN_TRACING_V2=true, chains and LLM calls get trace IDs,
 # latency, token usage, and prompt/completion visibility in the LangSmith UI.
@@ -25,8 +99,18 @@ LANGCHAIN_PROJECT = _env("LANGCHAIN_PROJECT", "llm-observability-demo")
 # Optional OTLP (when not using LangSmith)
 OTEL_EXPORTER_OTLP_ENDPOINT = _env("OTEL_EXPORTER_OTLP_ENDPOINT")
 OTEL_SERVICE_NAME = _env("OTEL_SERVICE_NAME", "llm-observability-demo")
+# "memory" keeps spans in a local InMemorySpanExporter (no collector or LangSmith needed)
+OTEL_TRACES_EXPORTER = _env("OTEL_TRACES_EXPORTER").lower()
 
 # Paths
 PROJECT_ROOT = Path(__file__).resolve().parent.parent
-DOCS_DIR = PROJECT_ROOT / "docs"
-CHROMA_PERSIST_DIR = PROJECT_ROOT / "data" / "chroma"
+# RAG_DOCS_DIR / RAG_DATA_DIR relocate the corpus and everything derived from it (scripts/bench_load.py uses a temp dir)
+DOCS_DIR = Path(_env("RAG_DOCS_DIR") or PROJECT_ROOT / "docs")
+DATA_DIR = Path(_env("RAG_DATA_DIR") or PROJECT_ROOT / "data")
+CHROMA_PERSIST_DIR = DATA_DIR / "chroma"
+RUN_LOG_PATH = DATA_DIR / "runs.jsonl"
+EMBEDDING_CACHE_PATH = Path(_env("EMBEDDING_CACHE_PATH") or DATA_DIR / "embedding_cache.sqlite3")
+# File and chunk hashes from the last ingest; lets scripts/ingest.py --incremental embed only changes.
+INGEST_MANIFEST_PATH = CHROMA_PERSIST_DIR / "ingest_manifest.json"
+VECTOR_INDEX_DIR = DATA_DIR / "vector_index"
+BM25_INDEX_PATH = CHROMA_PERSIST_DIR / "bm25_index.json"
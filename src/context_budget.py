@@ -0,0 +1,144 @@
+"""
+Context assembly between retrieve and generate. Walks the retrieved chunks in rank order
+and: drops near-duplicates (Jaccard similarity of hashed word 5-gram shingles at or above
+a threshold), trims text a chunk shares with an already kept neighbour (the splitter's
+chunk_overlap), and stops adding chunks once the token budget is spent. Returns the
+context string plus token counts so runs.jsonl can show how many input tokens were saved.
+Each chunk is tokenized at most once (not at all when the chunk store supplies its count);
+the before/after totals are sums of chunk counts plus separators, not a re-count of the
+joined text.
+"""
+
+import zlib
+from dataclasses import dataclass, field
+
+from .usage import count_tokens
+
+SHINGLE_WORDS = 5
+SEPARATOR = "\n\n"
+
+
+@dataclass
+class ContextStats:
+    chunks_in: int = 0
+    chunks_used: int = 0
+    duplicates_dropped: int = 0
+    overlaps_trimmed: int = 0
+    over_budget_dropped: int = 0
+    tokens_before: int = 0
+    tokens_after: int = 0
+    used: list[int] = field(default_factory=list)  # indices of retrieved chunks that made it in
+
+    @property
+    def tokens_saved(self) -> int:
+        return max(0, self.tokens_before - self.tokens_after)
+
+    def to_dict(self) -> dict:
+        return {
+            "chunks_in": self.chunks_in,
+            "chunks_used": self.chunks_used,
+            "duplicates_dropped": self.duplicates_dropped,
+            "overlaps_trimmed": self.overlaps_trimmed,
+            "over_budget_dropped": self.over_budget_dropped,
+            "tokens_before": self.tokens_before,
+            "tokens_after": self.tokens_after,
+            "tokens_saved": self.tokens_saved,
+        }
+
+
+def shingles(text: str, n: int = SHINGLE_WORDS) -> set[int]:
+    """crc32 hashes of word n-grams (the whole text as one shingle when shorter than n words)."""
+    words = text.lower().split()
+    if len(words) < n:
+        return {zlib.crc32(" ".join(words).encode())} if words else set()
+    return {zlib.crc32(" ".join(words[i : i + n]).encode()) for i in range(len(words) - n + 1)}
+
+
+def jaccard(a: set[int], b: set[int]) -> float:
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+def _shared_edge(kept: str, text: str, min_chars: int, max_chars: int) -> tuple[int, int]:
+    """(prefix, suffix) lengths of text that repeat the end / start of kept."""
+    limit = min(len(kept), len(text), max_chars)
+    if limit < min_chars:
+        return 0, 0
+    prefix = suffix = 0
+    # Anchor on a min_chars probe, then verify; the first hit from the far end is the longest overlap.
+    head = text[:min_chars]
+    pos = kept.find(head, len(kept) - limit)
+    while pos != -1:
+        if text.startswith(kept[pos:]):
+            prefix = len(kept) - pos
+            break
+        pos = kept.find(head, pos + 1)
+    tail = text[-min_chars:]
+    pos = kept.rfind(tail, 0, limit)
+    while pos != -1:
+        if text.endswith(kept[: pos + min_chars]):
+            suffix = pos + min_chars
+            break
+        pos = kept.rfind(tail, 0, pos + min_chars - 1)
+    return prefix, suffix
+
+
+def _separator_tokens(chunks: int) -> int:
+    return count_tokens(SEPARATOR) * (chunks - 1) if chunks > 1 else 0
+
+
+def assemble_context(
+    texts: list[str],
+    token_budget: int = 0,
+    dedup_threshold: float = 0.8,
+    min_overlap_chars: int = 20,
+    max_overlap_chars: int = 1000,
+    token_counts: list[int | None] | None = None,
+) -> tuple[str, ContextStats]:
+    """
+    Build the context from chunk texts (best first). token_budget <= 0 means no budget;
+    dedup_threshold > 1 disables near-duplicate removal; token_counts, when given, are the
+    precomputed counts of the stripped texts (None entries are counted here). Returns (context, stats).
+    """
+    texts = [t.strip() for t in texts]
+    counts = list(token_counts) if token_counts is not None else [None] * len(texts)
+    counts = [c if c is not None else (count_tokens(t) if t else 0) for c, t in zip(counts, texts)]
+    stats = ContextStats(chunks_in=len(texts))
+    present = [c for c, t in zip(counts, texts) if t]
+    stats.tokens_before = sum(present) + _separator_tokens(len(present))
+    kept: list[str] = []
+    kept_shingles: list[set[int]] = []
+    used_tokens = 0  # kept chunks plus the separators between them
+    separator_tokens = count_tokens(SEPARATOR)
+    for i, text in enumerate(texts):
+        if not text:
+            continue
+        sh = shingles(text)
+        if dedup_threshold <= 1 and any(jaccard(sh, other) >= dedup_threshold for other in kept_shingles):
+            stats.duplicates_dropped += 1
+            continue
+        trimmed = False
+        for other in kept:
+            prefix, suffix = _shared_edge(other, text, min_overlap_chars, max_overlap_chars)
+            if prefix or suffix:
+                text = text[prefix : len(text) - suffix].strip()
+                stats.overlaps_trimmed += 1
+                trimmed = True
+        if not text:
+            stats.duplicates_dropped += 1
+            continue
+        tokens = count_tokens(text) if trimmed else counts[i]
+        if kept:
+            tokens += separator_tokens  # the separator joining it to the chunks already kept
+        if token_budget > 0 and used_tokens + tokens > token_budget:
+            stats.over_budget_dropped += 1
+            continue  # a lower-ranked, shorter chunk may still fit
+        kept.append(text)
+        kept_shingles.append(sh)
+        used_tokens += tokens
+        stats.used.append(i)
+    context = SEPARATOR.join(kept)
+    stats.chunks_used = len(kept)
+    stats.tokens_after = used_tokens
+    return context, stats
@@ -0,0 +1,65 @@
+"""
+Per-request deadlines. A deadline is an absolute time.monotonic() value (None = no deadline)
+that travels with the request: RAGPipeline.run/arun/astream take it, and it rides in
+RAGState into the retrieve and generate nodes. Every stage checks it before starting; async
+stages run their embedding, search and chat awaits under it and are cancelled when it
+passes, sync chat calls get the remaining time as their HTTP timeout. A request its client
+has given up on therefore stops instead of spending tokens on an answer nobody reads.
+"""
+
+import asyncio
+import inspect
+import time
+from typing import Awaitable, TypeVar
+
+from .metrics import DEADLINE_EXCEEDED_TOTAL
+
+T = TypeVar("T")
+
+
+class DeadlineExceeded(TimeoutError):
+    """The request's deadline passed before or during stage."""
+
+    def __init__(self, stage: str):
+        super().__init__(f"Deadline exceeded at {stage}")
+        self.stage = stage
+
+
+def deadline_after(seconds: float | None) -> float | None:
+    """Deadline `seconds` from now; None or <= 0 means no deadline."""
+    return time.monotonic() + seconds if seconds and seconds > 0 else None
+
+
+def remaining(deadline: float | None) -> float | None:
+    """Seconds left (may be negative), or None without a deadline."""
+    return None if deadline is None else deadline - time.monotonic()
+
+
+def expired(deadline: float | None) -> bool:
+    return deadline is not None and time.monotonic() >= deadline
+
+
+def check(deadline: float | None, stage: str) -> float | None:
+    """Seconds left before stage starts; raises DeadlineExceeded if none are."""
+    left = remaining(deadline)
+    if left is not None and left <= 0:
+        DEADLINE_EXCEEDED_TOTAL.inc(stage=stage)
+        raise DeadlineExceeded(stage)
+    return left
+
+
+async def bounded(aw: Awaitable[T], deadline: float | None, stage: str) -> T:
+    """Await aw, cancelling it when the deadline passes."""
+    if deadline is None:
+        return await aw
+    try:
+        left = check(deadline, stage)
+    except DeadlineExceeded:
+        if inspect.iscoroutine(aw):
+            aw.close()  # never started; avoids the "was never awaited" warning
+        raise
+    try:
+        return await asyncio.wait_for(aw, left)
+    except TimeoutError:
+        DEADLINE_EXCEEDED_TOTAL.inc(stage=stage)
+        raise DeadlineExceeded(stage) from None
@@ -0,0 +1,176 @@
+"""
+Batched, concurrent embedding submission for ingest.
+EmbeddingExecutor takes batches of texts, keeps up to max_in_flight embedding requests
+running on a thread pool, holds requests back to stay under a tokens-per-minute budget,
+and retries rate-limited or transient failures with jittered exponential backoff
+(honouring Retry-After when the provider sends it). Works with any LangChain Embeddings,
+so throughput can be tuned against a local fake (see scripts/tune_embeddings.py).
+"""
+
+import random
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Callable, Iterable, Iterator, List
+
+from langchain_core.embeddings import Embeddings
+
+RETRYABLE_STATUS = {408, 409, 429, 500, 502, 503, 504}
+
+
+class TokenBudget:
+    """Thread-safe tokens-per-minute budget; acquire() sleeps until the tokens are available (0 disables it)."""
+
+    def __init__(self, tokens_per_minute: int):
+        self.capacity = max(0, tokens_per_minute)
+        self._rate = self.capacity / 60.0
+        self._tokens = float(self.capacity)
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens: int):
+        if not self._rate:
+            return
+        tokens = min(tokens, self.capacity)  # one oversized batch still gets through, at full-budget cost
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._last) * self._rate)
+            self._last = now
+            self._tokens -= tokens  # may go negative: later callers queue behind this reservation
+            wait_for = -self._tokens / self._rate if self._tokens < 0 else 0.0
+        if wait_for > 0:
+            time.sleep(wait_for)
+
+
+def _estimate_tokens(text: str) -> int:
+    return max(1, len(text) // 4)
+
+
+def _status(exc: Exception) -> int | None:
+    status = getattr(exc, "status_code", None)
+    if status is None:
+        status = getattr(getattr(exc, "response", None), "status_code", None)
+    return status
+
+
+def is_retryable(exc: Exception) -> bool:
+    """Rate limits, timeouts, connection errors and 5xx responses are worth retrying."""
+    status = _status(exc)
+    if status is not None:
+        return status in RETRYABLE_STATUS
+    name = type(exc).__name__
+    return any(s in name for s in ("RateLimit", "Timeout", "Connection")) or isinstance(exc, (TimeoutError, ConnectionError))
+
+
+def retry_after(exc: Exception) -> float | None:
+    """Server-requested delay in seconds from Retry-After / retry-after-ms headers, if any."""
+    headers = getattr(getattr(exc, "response", None), "headers", None) or {}
+    try:
+        if headers.get("retry-after-ms"):
+            return float(headers["retry-after-ms"]) / 1000.0
+        if headers.get("retry-after"):
+            return float(headers["retry-after"])
+    except (TypeError, ValueError):
+        pass
+    return None
+
+
+class EmbeddingExecutor:
+    """Embeds batches concurrently under a concurrency cap and TPM budget; keeps throughput stats."""
+
+    def __init__(
+        self,
+        embeddings: Embeddings,
+        batch_size: int = 256,
+        max_in_flight: int = 4,
+        tokens_per_minute: int = 0,
+        max_retries: int = 6,
+        backoff_base: float = 1.0,
+        backoff_max: float = 60.0,
+        count_tokens: Callable[[str], int] | None = None,
+    ):
+        self.embeddings = embeddings
+        self.batch_size = max(1, batch_size)
+        self.max_in_flight = max(1, max_in_flight)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self._budget = TokenBudget(tokens_per_minute)
+        # Only counted when a budget is set; the default is the rough 4-characters-per-token estimate.
+        self._count_tokens = (count_tokens or _estimate_tokens) if tokens_per_minute > 0 else None
+        self._lock = threading.Lock()
+        self.chunks = 0
+        self.tokens = 0
+        self.retries = 0
+        self.seconds = 0.0
+
+    def stats(self) -> dict:
+        return {
+            "chunks_embedded": self.chunks,
+            "embed_seconds": round(self.seconds, 3),
+            "chunks_per_second": round(self.chunks / self.seconds, 1) if self.seconds else 0.0,
+            "embed_retries": self.retries,
+        }
+
+    def _backoff(self, attempt: int, exc: Exception) -> float:
+        # Full jitter: concurrent workers hitting the same 429 must not retry in lockstep.
+        delay = random.uniform(0, min(self.backoff_max, self.backoff_base * 2**attempt))
+        return max(delay, retry_after(exc) or 0.0)
+
+    def embed_batch(self, texts: List[str]) -> List[List[float]]:
+        """One embedding request with budget and retries; raises once retries are exhausted."""
+        if self._count_tokens is not None:
+            tokens = sum(self._count_tokens(t) for t in texts)
+            self._budget.acquire(tokens)
+            with self._lock:
+                self.tokens += tokens
+        attempt = 0
+        while True:
+            try:
+                return self.embeddings.embed_documents(texts)
+            except Exception as e:
+                if attempt >= self.max_retries or not is_retryable(e):
+                    raise
+                with self._lock:
+                    self.retries += 1
+                time.sleep(self._backoff(attempt, e))
+                attempt += 1
+
+    def map(self, batches: Iterable[tuple]) -> Iterator[tuple]:
+        """
+        For each (texts, *extra) batch yield (vectors, texts, *extra) as requests complete.
+        Batches are pulled lazily, so at most max_in_flight are buffered beyond the consumer.
+        """
+        t0 = time.perf_counter()
+
+        def run(batch):
+            return (self.embed_batch(list(batch[0])), *batch)
+
+        try:
+            with ThreadPoolExecutor(max_workers=self.max_in_flight, thread_name_prefix="embed") as pool:
+                pending = set()
+                for batch in batches:
+                    if len(pending) >= self.max_in_flight:
+                        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                        yield from self._collect(done)
+                    pending.add(pool.submit(run, batch))
+                while pending:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    yield from self._collect(done)
+        finally:
+            self.seconds += time.perf_counter() - t0
+
+    def _collect(self, done) -> Iterator[tuple]:
+        for fut in done:
+            result = fut.result()
+            with self._lock:
+                self.chunks += len(result[1])
+            yield result
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """Embed texts in batch_size requests run concurrently; vectors come back in input order."""
+        batches = ((texts[i : i + self.batch_size], i) for i in range(0, len(texts), self.batch_size))
+        out: List[List[float]] = [None] * len(texts)
+        for vectors, _, start in self.map(batches):
+            out[start : start + len(vectors)] = vectors
+        return out
@@ -0,0 +1,137 @@
+"""
+Disk-backed embedding cache: wraps an Embeddings object and stores vectors in SQLite
+as float32 blobs keyed by (embedding deployment, sha256 of text). Least recently used
+rows are evicted once the cache exceeds max_entries. Hit/miss counters are kept per
+instance so ingest and eval can report how many embedding calls were avoided.
+"""
+
+import hashlib
+import sqlite3
+import threading
+import time
+from array import array
+from pathlib import Path
+from typing import List
+
+from langchain_core.embeddings import Embeddings
+
+
+def text_key(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class CachedEmbeddings(Embeddings):
+    """Embeddings wrapper that only calls the inner model for texts it has not seen before."""
+
+    def __init__(self, inner: Embeddings, path: Path, model: str, max_entries: int = 200_000):
+        self.inner = inner
+        self.model = model
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(str(path), check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            " model TEXT NOT NULL, key TEXT NOT NULL, vector BLOB NOT NULL, last_used REAL NOT NULL,"
+            " PRIMARY KEY (model, key))"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS embeddings_lru ON embeddings (last_used)")
+        self._db.commit()
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 3) if total else 0.0,
+        }
+
+    def _lookup(self, keys: List[str]) -> dict[str, List[float]]:
+        found: dict[str, List[float]] = {}
+        unique = list(dict.fromkeys(keys))
+        with self._lock:
+            # SQLite caps bound parameters, so look up in slices.
+            for i in range(0, len(unique), 500):
+                part = unique[i : i + 500]
+                marks = ",".join("?" * len(part))
+                rows = self._db.execute(
+                    f"SELECT key, vector FROM embeddings WHERE model = ? AND key IN ({marks})",
+                    [self.model, *part],
+                ).fetchall()
+                for key, blob in rows:
+                    found[key] = array("f", blob).tolist()
+            if found:
+                now = time.time()
+                self._db.executemany(
+                    "UPDATE embeddings SET last_used = ? WHERE model = ? AND key = ?",
+                    [(now, self.model, k) for k in found],
+                )
+                self._db.commit()
+        return found
+
+    def _store(self, pairs: List[tuple[str, List[float]]]):
+        if not pairs:
+            return
+        now = time.time()
+        with self._lock:
+            self._db.executemany(
+                "INSERT OR REPLACE INTO embeddings (model, key, vector, last_used) VALUES (?, ?, ?, ?)",
+                [(self.model, k, array("f", v).tobytes(), now) for k, v in pairs],
+            )
+            (count,) = self._db.execute("SELECT COUNT(*) FROM embeddings").fetchone()
+            if count > self.max_entries:
+                self._db.execute(
+                    "DELETE FROM embeddings WHERE rowid IN"
+                    " (SELECT rowid FROM embeddings ORDER BY last_used LIMIT ?)",
+                    (count - self.max_entries,),
+                )
+            self._db.commit()
+
+    def _split(self, texts: List[str]) -> tuple[List[str], dict, List[tuple[str, str]]]:
+        keys = [text_key(t) for t in texts]
+        found = self._lookup(keys)
+        missing: dict[str, str] = {}
+        for k, t in zip(keys, texts):
+            if k not in found:
+                missing.setdefault(k, t)
+        self.hits += sum(1 for k in keys if k in found)
+        self.misses += len(missing)
+        return keys, found, list(missing.items())
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        keys, found, missing = self._split(texts)
+        if missing:
+            vectors = self.inner.embed_documents([t for _, t in missing])
+            pairs = [(k, v) for (k, _), v in zip(missing, vectors)]
+            self._store(pairs)
+            found.update(pairs)
+        return [found[k] for k in keys]
+
+    def embed_query(self, text: str) -> List[float]:
+        keys, found, missing = self._split([text])
+        if missing:
+            vector = self.inner.embed_query(text)
+            self._store([(keys[0], vector)])
+            return vector
+        return found[keys[0]]
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        keys, found, missing = self._split(texts)
+        if missing:
+            vectors = await self.inner.aembed_documents([t for _, t in missing])
+            pairs = [(k, v) for (k, _), v in zip(missing, vectors)]
+            self._store(pairs)
+            found.update(pairs)
+        return [found[k] for k in keys]
+
+    async def aembed_query(self, text: str) -> List[float]:
+        keys, found, missing = self._split([text])
+        if missing:
+            vector = await self.inner.aembed_query(text)
+            self._store([(keys[0], vector)])
+            return vector
+        return found[keys[0]]
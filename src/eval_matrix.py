@@ -0,0 +1,120 @@
+"""
+Prompt-version x k evaluation matrix. Every eval question is embedded and searched once,
+at the largest k (RAGPipeline.arun_matrix); smaller k reuse a prefix of those chunks and
+every prompt variant reuses the same assembled contexts, so only the chat calls multiply.
+All cells are scored together in one bulk pass (src.scoring) and summarized side by side:
+quality per metric, generation latency, tokens and cost.
+"""
+
+import asyncio
+import time
+from typing import Iterable, Sequence
+
+import numpy as np
+
+from .config import AZURE_OPENAI_DEPLOYMENT_CHAT
+from .scoring import DEFAULT_THRESHOLDS, score_rows
+from .usage import cost_usd
+
+
+def _percentile(values: list[float], p: float) -> float | None:
+    return round(float(np.percentile(values, p)), 3) if values else None
+
+
+def run_matrix(
+    pipeline,
+    rows: Sequence[dict],
+    prompt_versions: Sequence[str],
+    ks: Sequence[int],
+    metrics: Iterable[str] = ("exact",),
+    thresholds: dict[str, float] | None = None,
+    embeddings=None,
+    max_concurrency: int | None = None,
+) -> dict:
+    """
+    Run rows ({question, expected}) through every (prompt version, k) cell. Returns
+    {"questions", "seconds", "retrieval_seconds", "cells": [summary per cell], "records":
+    [one per question per cell]}; latency per record is its own context + prompt + chat time.
+    """
+    metrics = list(metrics)
+    thresholds = {**DEFAULT_THRESHOLDS, **(thresholds or {})}
+    questions = [r.get("question", "") for r in rows]
+    expected = [r.get("expected", "") for r in rows]
+    t0 = time.perf_counter()
+    results, shared = asyncio.run(pipeline.arun_matrix(questions, list(prompt_versions), list(ks), max_concurrency))
+    seconds = time.perf_counter() - t0
+
+    records = []
+    for (version, k), runs in results.items():
+        for i, res in enumerate(runs):
+            rec = {"prompt_version": version, "k": k, "index": i, "question": questions[i], "expected": expected[i]}
+            if isinstance(res, Exception):
+                rec["error"] = f"{type(res).__name__}: {res}"
+            else:
+                answer, _, info = res
+                usage = info.get("usage") or {}
+                rec.update(
+                    answer=answer,
+                    latency_seconds=round(sum((info.get("timings") or {}).values()), 4),
+                    input_tokens=usage.get("input_tokens", 0),
+                    output_tokens=usage.get("output_tokens", 0),
+                    context_tokens=(info.get("context") or {}).get("tokens_after"),
+                )
+                deployment = (info.get("target") or {}).get("deployment") or AZURE_OPENAI_DEPLOYMENT_CHAT
+                rec["cost_usd"] = cost_usd(rec["input_tokens"], rec["output_tokens"], deployment)
+            records.append(rec)
+
+    # One bulk scoring pass over every answered run of every cell.
+    answered = [r for r in records if "error" not in r]
+    scores = score_rows([r["answer"] for r in answered], [r["expected"] for r in answered], metrics, embeddings)
+    for j, rec in enumerate(answered):
+        for m in metrics:
+            rec[m] = round(float(scores[m][j]), 4)
+
+    cells = []
+    for version, k in results:
+        cell_recs = [r for r in records if r["prompt_version"] == version and r["k"] == k]
+        ok = [r for r in cell_recs if "error" not in r]
+        latencies = [r["latency_seconds"] for r in ok]
+        cell = {"prompt_version": version, "k": k, "runs": len(cell_recs), "errors": len(cell_recs) - len(ok)}
+        for m in metrics:
+            values = [r[m] for r in ok]
+            cell[m] = round(sum(values) / len(values), 4) if values else 0.0
+            cell[f"{m}_pass_rate"] = round(sum(v >= thresholds.get(m, 0.5) for v in values) / len(values), 4) if values else 0.0
+        cell.update(
+            latency_p50=_percentile(latencies, 50),
+            latency_p95=_percentile(latencies, 95),
+            input_tokens=sum(r["input_tokens"] for r in ok),
+            output_tokens=sum(r["output_tokens"] for r in ok),
+            cost_usd=round(sum(r["cost_usd"] or 0.0 for r in ok), 6),
+        )
+        cells.append(cell)
+    return {
+        "questions": len(questions),
+        "seconds": round(seconds, 3),
+        "retrieval_seconds": round(sum(shared.values()), 3),
+        "metrics": metrics,
+        "thresholds": {m: thresholds.get(m, 0.5) for m in metrics},
+        "cells": cells,
+        "records": records,
+    }
+
+
+def format_table(report: dict) -> str:
+    """The matrix as a fixed-width table, one line per (prompt version, k) cell."""
+    metrics = report["metrics"]
+    head = f"{'prompt':<10} {'k':>3} {'runs':>5} {'err':>4} " + " ".join(f"{m:>10} {'pass':>6}" for m in metrics)
+    head += f" {'p50 s':>7} {'p95 s':>7} {'in tok':>9} {'out tok':>8} {'cost $':>9}"
+    lines = [head, "-" * len(head)]
+    for c in report["cells"]:
+        line = f"{c['prompt_version']:<10} {c['k']:>3} {c['runs']:>5} {c['errors']:>4} "
+        line += " ".join(f"{c[m]:>10.3f} {c[m + '_pass_rate']:>6.2f}" for m in metrics)
+        p50 = f"{c['latency_p50']:.3f}" if c["latency_p50"] is not None else "-"
+        p95 = f"{c['latency_p95']:.3f}" if c["latency_p95"] is not None else "-"
+        line += f" {p50:>7} {p95:>7} {c['input_tokens']:>9} {c['output_tokens']:>8} {c['cost_usd']:>9.4f}"
+        lines.append(line)
+    lines.append(
+        f"{report['questions']} questions x {len(report['cells'])} cells in {report['seconds']:.2f}s "
+        f"(shared retrieval {report['retrieval_seconds']:.2f}s, once for all cells)"
+    )
+    return "\n".join(lines)
@@ -0,0 +1,185 @@
+"""
+Batch evaluation engine: runs eval rows through the pipeline on a thread pool with an
+optional requests-per-second limit, checkpoints each scored row to JSONL as it finishes,
+and resumes from that checkpoint. Only running totals are kept in memory, so datasets
+with thousands of rows (JSON array or JSONL) stream through in constant memory.
+score_checkpoint re-scores a finished checkpoint with any src.scoring metrics in bulk.
+"""
+
+import json
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from pathlib import Path
+from typing import Callable, Iterable, Iterator
+
+from .scoring import score_rows, summarize_scores
+
+PASS_THRESHOLD = 0.5
+
+
+class RateLimiter:
+    """Thread-safe limiter spacing calls at most `rate` per second (rate <= 0 disables it)."""
+
+    def __init__(self, rate: float):
+        self._interval = 1.0 / rate if rate > 0 else 0.0
+        self._next = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        if not self._interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            wait_for = self._next - now
+            self._next = max(now, self._next) + self._interval
+        if wait_for > 0:
+            time.sleep(wait_for)
+
+
+def iter_eval_rows(path: Path) -> Iterator[dict]:
+    """Yield eval rows from a JSON array file or a JSONL file (streamed line by line)."""
+    if path.suffix == ".jsonl":
+        with open(path) as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+        return
+    with open(path) as f:
+        yield from json.load(f)
+
+
+def load_checkpoint(path: Path) -> set[int]:
+    """Indices already scored successfully; rows that errored are retried on resume."""
+    done: set[int] = set()
+    if not path.exists():
+        return done
+    with open(path) as f:
+        for line in f:
+            try:
+                rec = json.loads(line)
+            except ValueError:
+                continue  # torn last line from an interrupted run
+            if "error" not in rec:
+                done.add(rec["index"])
+    return done
+
+
+def summarize_checkpoint(path: Path) -> dict:
+    """Average score and pass count over the latest record per row in the checkpoint."""
+    latest: dict[int, tuple[float, bool]] = {}
+    with open(path) as f:
+        for line in f:
+            try:
+                rec = json.loads(line)
+            except ValueError:
+                continue
+            latest[rec["index"]] = (rec.get("score", 0.0), "error" in rec)
+    total = len(latest)
+    avg = sum(score for score, _ in latest.values()) / total if total else 0
+    passed = sum(1 for score, _ in latest.values() if score >= PASS_THRESHOLD)
+    errors = sum(1 for _, failed in latest.values() if failed)
+    return {"average": avg, "passed": passed, "total": total, "errors": errors}
+
+
+def load_latest_records(path: Path) -> dict[int, dict]:
+    """Latest successful record per row index (failed rows are left out)."""
+    latest: dict[int, dict] = {}
+    with open(path) as f:
+        for line in f:
+            try:
+                rec = json.loads(line)
+            except ValueError:
+                continue
+            if "error" in rec:
+                latest.pop(rec["index"], None)
+            else:
+                latest[rec["index"]] = rec
+    return latest
+
+
+def score_checkpoint(
+    checkpoint_path: Path,
+    metrics: Iterable[str],
+    thresholds: dict[str, float] | None = None,
+    embeddings=None,
+    scores_path: Path | None = None,
+) -> dict[str, dict]:
+    """
+    Score every answered row of a checkpoint with metrics in one bulk pass and write
+    per-row scores to scores_path (default <checkpoint>.scores.jsonl). Returns the
+    per-metric summary from summarize_scores.
+    """
+    records = load_latest_records(checkpoint_path)
+    indices = sorted(records)
+    answers = [records[i].get("answer", "") for i in indices]
+    expected = [records[i].get("expected", "") for i in indices]
+    scores = score_rows(answers, expected, list(metrics), embeddings)
+    scores_path = scores_path or checkpoint_path.with_suffix(".scores.jsonl")
+    with open(scores_path, "w") as f:
+        for row, index in enumerate(indices):
+            f.write(json.dumps({"index": index, **{m: round(float(v[row]), 4) for m, v in scores.items()}}) + "\n")
+    return summarize_scores(scores, thresholds)
+
+
+def _report(futures, on_result):
+    if on_result is not None:
+        for fut in futures:
+            on_result(fut.result())
+
+
+def run_batch_eval(
+    run_fn: Callable[[str], dict],
+    rows: Iterator[dict],
+    score_fn: Callable[[str, str], float],
+    checkpoint_path: Path,
+    workers: int = 4,
+    rate: float = 0.0,
+    resume: bool = False,
+    on_result: Callable[[dict], None] | None = None,
+) -> dict:
+    """
+    Score every row with run_fn (question -> pipeline output) and score_fn(answer, expected).
+    Each finished row is appended to checkpoint_path immediately; with resume=True rows
+    already in the checkpoint are skipped. At most 2 * workers rows are in flight at once.
+    Returns the summary from summarize_checkpoint.
+    """
+    checkpoint_path.parent.mkdir(parents=True, exist_ok=True)
+    done = load_checkpoint(checkpoint_path) if resume else set()
+    limiter = RateLimiter(rate)
+    write_lock = threading.Lock()
+    out = open(checkpoint_path, "a" if resume else "w")
+    if resume and out.tell() and not checkpoint_path.read_bytes().endswith(b"\n"):
+        out.write("\n")  # terminate a torn last line so the next record parses
+
+    def evaluate(index: int, row: dict) -> dict:
+        q = row.get("question", "")
+        expected = row.get("expected", "")
+        rec = {"index": index, "question": q, "expected": expected}
+        limiter.acquire()
+        t0 = time.perf_counter()
+        try:
+            answer = run_fn(q).get("answer", "")
+            rec.update(answer=answer, score=score_fn(answer, expected))
+        except Exception as e:  # one failing row must not kill the run
+            rec.update(answer="", score=0.0, error=f"{type(e).__name__}: {e}")
+        rec["latency_seconds"] = round(time.perf_counter() - t0, 3)
+        with write_lock:
+            out.write(json.dumps(rec) + "\n")
+            out.flush()
+        return rec
+
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+            pending = set()
+            for index, row in enumerate(rows):
+                if index in done:
+                    continue
+                if len(pending) >= 2 * max(1, workers):
+                    finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    _report(finished, on_result)
+                pending.add(pool.submit(evaluate, index, row))
+            _report(wait(pending).done, on_result)
+    finally:
+        out.close()
+    return summarize_checkpoint(checkpoint_path)
@@ -1,27 +1,39 @@
 """
-LangGraph RAG: retrieve -> build context -> generate with Azure OpenAI.
+LangGraph RAG: retrieve -> assemble context (dedupe, trim overlap, token budget) -> generate with Azure OpenAI.
 """
 
-from typing import TypedDict
+import asyncio
+from contextlib import nullcontext
+from typing import Annotated, AsyncIterator, Callable, TypedDict
 
 from langchain_core.messages import HumanMessage, SystemMessage
-from langchain_openai import AzureChatOpenAI
+from langchain_core.runnables import RunnableLambda
 from langgraph.graph import END, StateGraph
 
-from .config import (
-    AZURE_OPENAI_API_KEY,
-    AZURE_OPENAI_API_VERSION,
-    AZURE_OPENAI_DEPLOYMENT_CHAT,
-    AZURE_OPENAI_ENDPOINT,
-)
-from .prompts import RAG_SYSTEM, RAG_USER_TEMPLATE
+from .config import AZURE_OPENAI_DEPLOYMENT_CHAT, CONTEXT_DEDUP_THRESHOLD, CONTEXT_TOKEN_BUDGET
+from .context_budget import assemble_context
+from .deadline import bounded, check
+from .observability import stage
+from .prompts import get_prompt
+from .router import chat_llm
+from .usage import response_usage
+
+
+def _merge_timings(left: dict | None, right: dict | None) -> dict:
+    return {**(left or {}), **(right or {})}
 
 
 class RAGState(TypedDict):
     question: str
     chunks: list
     context: str
+    context_stats: dict  # ContextStats.to_dict(): tokens before/after assembly, chunks dropped
+    prompt_version: str  # optional; a PROMPTS key other than PROMPT_VERSION (eval matrix)
+    deadline: float | None  # optional; time.monotonic() by which the run must finish (src.deadline)
     answer: str
+    usage: dict
+    target: dict  # chat target that answered when routing: {"target", "deployment", "hedged"} (src.router)
+    timings: Annotated[dict, _merge_timings]  # stage name -> seconds, filled by each node
 
 
 def _format_doc(doc) -> str:
@@ -29,48 +41,278 @@ def _format_doc(doc) -> str:
     return content.strip()
 
 
+def _retrieved(chunks, timings: dict) -> dict:
+    return {"chunks": chunks, "timings": timings}
+
+
+def build_context(chunks: list) -> tuple[str, dict]:
+    """Assembled context for retrieved chunks and its stats (as stored in RAGState)."""
+    context, stats = assemble_context(
+        [_format_doc(c) for c in chunks],
+        token_budget=CONTEXT_TOKEN_BUDGET,
+        dedup_threshold=CONTEXT_DEDUP_THRESHOLD,
+        token_counts=[getattr(c, "tokens", None) for c in chunks],  # Chunk handles (numpy backend only) carry theirs
+    )
+    return context, stats.to_dict()
+
+
+def _assemble(state: RAGState) -> dict:
+    timings: dict = {}
+    if state.get("context") is not None:
+        return {"timings": timings}  # assembled up front and shared between runs (eval matrix)
+    with stage("build_context", timings):
+        context, stats = build_context(state["chunks"])
+    return {"context": context, "context_stats": stats, "timings": timings}
+
+
+async def _aassemble(state: RAGState) -> dict:
+    return _assemble(state)
+
+
+def _vector_search(retriever):
+    """(vectorstore, search kwargs) when the retriever is a plain similarity retriever, else None."""
+    store = getattr(retriever, "vectorstore", None)
+    if store is None or getattr(retriever, "search_type", "similarity") != "similarity":
+        return None
+    return store, dict(getattr(retriever, "search_kwargs", {}) or {})
+
+
+def _messages(state: RAGState) -> list:
+    system, template = get_prompt(state.get("prompt_version"))
+    prompt = template.format(
+        context=state["context"],
+        question=state["question"],
+    )
+    return [
+        SystemMessage(content=system),
+        HumanMessage(content=prompt),
+    ]
+
+
+def _answer_text(response) -> str:
+    return response.content if hasattr(response, "content") else str(response)
+
+
+def _generated(response, messages: list, timings: dict) -> dict:
+    answer = _answer_text(response)
+    target = (getattr(response, "response_metadata", None) or {}).get("router") or {}
+    model = target.get("deployment") or AZURE_OPENAI_DEPLOYMENT_CHAT
+    return {
+        "answer": answer,
+        "usage": response_usage(response, messages, answer, model),
+        "target": target,
+        "timings": timings,
+    }
+
+
 def create_graph(retriever, llm=None):
-    """Build a two-node graph: retrieve -> generate."""
+    """Build the graph: retrieve -> assemble_context -> generate."""
     if llm is None:
-        llm = AzureChatOpenAI(
-            azure_endpoint=AZURE_OPENAI_ENDPOINT,
-            api_key=AZURE_OPENAI_API_KEY,
-            api_version=AZURE_OPENAI_API_VERSION,
-            azure_deployment=AZURE_OPENAI_DEPLOYMENT_CHAT,
+        llm = chat_llm(
             temperature=0,
+            stream_usage=True,  # keep usage_metadata when the generate node is streamed
         )
 
+    # Split query embedding from the vector search so each gets its own stage timing.
+    search = _vector_search(retriever)
+
     def retrieve(state: RAGState) -> dict:
-        question = state["question"]
-        chunks = retriever.invoke(question)
-        context = "\n\n".join(_format_doc(c) for c in chunks)
-        return {"chunks": chunks, "context": context}
+        timings: dict = {}
+        if state.get("chunks") is not None:
+            return _retrieved(state["chunks"], timings)  # retrieved up front by a batch run
+        deadline = state.get("deadline")
+        if search is None:
+            check(deadline, "retrieve")
+            with stage("retrieve", timings):
+                chunks = retriever.invoke(state["question"])
+            return _retrieved(chunks, timings)
+        store, kwargs = search
+        check(deadline, "embed_query")
+        with stage("embed_query", timings):
+            vector = store.embeddings.embed_query(state["question"])
+        check(deadline, "vector_search")
+        with stage("vector_search", timings):
+            chunks = store.similarity_search_by_vector(vector, **kwargs)
+        return _retrieved(chunks, timings)
+
+    async def aretrieve(state: RAGState) -> dict:
+        timings: dict = {}
+        if state.get("chunks") is not None:
+            return _retrieved(state["chunks"], timings)
+        deadline = state.get("deadline")
+        if search is None:
+            with stage("retrieve", timings):
+                chunks = await bounded(retriever.ainvoke(state["question"]), deadline, "retrieve")
+            return _retrieved(chunks, timings)
+        store, kwargs = search
+        with stage("embed_query", timings):
+            vector = await bounded(store.embeddings.aembed_query(state["question"]), deadline, "embed_query")
+        with stage("vector_search", timings):
+            chunks = await bounded(store.asimilarity_search_by_vector(vector, **kwargs), deadline, "vector_search")
+        return _retrieved(chunks, timings)
 
     def generate(state: RAGState) -> dict:
-        prompt = RAG_USER_TEMPLATE.format(
-            context=state["context"],
-            question=state["question"],
-        )
-        messages = [
-            SystemMessage(content=RAG_SYSTEM),
-            HumanMessage(content=prompt),
-        ]
-        response = llm.invoke(messages)
-        answer = response.content if hasattr(response, "content") else str(response)
-        return {"answer": answer}
+        timings: dict = {}
+        deadline = state.get("deadline")
+        with stage("build_prompt", timings):
+            messages = _messages(state)
+        left = check(deadline, "chat")
+        with stage("chat", timings):
+            try:
+                # A blocking call cannot be cancelled; the time left becomes its HTTP timeout instead.
+                response = llm.invoke(messages, **({"timeout": left} if left is not None else {}))
+            except Exception:
+                check(deadline, "chat")  # report a timeout caused by the deadline as DeadlineExceeded
+                raise
+        return _generated(response, messages, timings)
 
+    async def agenerate(state: RAGState) -> dict:
+        timings: dict = {}
+        with stage("build_prompt", timings):
+            messages = _messages(state)
+        with stage("chat", timings):
+            response = await bounded(llm.ainvoke(messages), state.get("deadline"), "chat")
+        return _generated(response, messages, timings)
+
+    # Each node carries a sync and an async implementation so that
+    # compiled.invoke() and compiled.ainvoke() both run without thread hops.
     graph = StateGraph(RAGState)
-    graph.add_node("retrieve", retrieve)
-    graph.add_node("generate", generate)
+    graph.add_node("retrieve", RunnableLambda(retrieve, afunc=aretrieve, name="retrieve"))
+    graph.add_node("assemble_context", RunnableLambda(_assemble, afunc=_aassemble, name="assemble_context"))
+    graph.add_node("generate", RunnableLambda(generate, afunc=agenerate, name="generate"))
     graph.add_edge("__start__", "retrieve")
-    graph.add_edge("retrieve", "generate")
+    graph.add_edge("retrieve", "assemble_context")
+    graph.add_edge("assemble_context", "generate")
     graph.add_edge("generate", END)
     return graph.compile()
 
 
-def run_rag(compiled_graph, question: str) -> tuple[str, list]:
-    """Run the graph for one question. Returns (answer, list of retrieved doc chunks)."""
-    state = compiled_graph.invoke({"question": question})
+def _unpack(state: dict) -> tuple[str, list, dict]:
     chunks = state.get("chunks") or []
     answer = state.get("answer") or ""
-    return answer, list(chunks)
+    info = {
+        "usage": state.get("usage") or {},
+        "timings": state.get("timings") or {},
+        "context": state.get("context_stats") or {},
+        "target": state.get("target") or {},
+    }
+    return answer, list(chunks), info
+
+
+def run_rag(compiled_graph, question: str, deadline: float | None = None) -> tuple[str, list, dict]:
+    """
+    Run the graph for one question. Returns (answer, retrieved doc chunks, info) where
+    info holds "usage" (token counts), "timings" (seconds per stage) and "context"
+    (context assembly stats, including tokens_saved). Raises DeadlineExceeded once
+    deadline (time.monotonic()) passes.
+    """
+    return _unpack(compiled_graph.invoke({"question": question, "deadline": deadline}))
+
+
+async def arun_rag(compiled_graph, question: str, deadline: float | None = None) -> tuple[str, list, dict]:
+    """Async variant of run_rag; awaits the retriever and chat model instead of blocking."""
+    return _unpack(await compiled_graph.ainvoke({"question": question, "deadline": deadline}))
+
+
+def _batch_inputs(
+    questions: list[str], chunks: list[list] | None, timings: dict | None, deadline: float | None = None
+) -> list[dict]:
+    inputs = []
+    for i, q in enumerate(questions):
+        state = {"question": q, "timings": dict(timings or {}), "deadline": deadline}
+        if chunks is not None:
+            state["chunks"] = chunks[i]
+        inputs.append(state)
+    return inputs
+
+
+def _unpack_batch(states: list) -> list:
+    return [s if isinstance(s, Exception) else _unpack(s) for s in states]
+
+
+def run_rag_states(compiled_graph, states: list[dict], max_concurrency: int = 8) -> list:
+    """Batch-run prepared input states (question plus any preset chunks/context/prompt_version)."""
+    results = compiled_graph.batch(
+        states, config={"max_concurrency": max(1, max_concurrency)}, return_exceptions=True
+    )
+    return _unpack_batch(results)
+
+
+async def arun_rag_states(
+    compiled_graph, states: list[dict], max_concurrency: int = 8, slot: Callable | None = None
+) -> list:
+    """
+    Async variant of run_rag_states. With slot (a factory for an async context manager, e.g.
+    RAGPipeline's shared limiter) each run holds one slot while it runs, so a batch counts
+    against the same cap as single requests instead of adding max_concurrency on top.
+    """
+    local = asyncio.Semaphore(max(1, max_concurrency))
+
+    async def run(state: dict):
+        async with local, (slot() if slot is not None else nullcontext()):
+            return await compiled_graph.ainvoke(state)
+
+    return _unpack_batch(await asyncio.gather(*(run(s) for s in states), return_exceptions=True))
+
+
+def run_rag_batch(
+    compiled_graph,
+    questions: list[str],
+    chunks: list[list] | None = None,
+    timings: dict | None = None,
+    max_concurrency: int = 8,
+    deadline: float | None = None,
+) -> list:
+    """
+    Run many questions through compiled_graph.batch with at most max_concurrency in flight.
+    chunks (one list per question) skips the retrieve node's own search; timings for that
+    shared retrieval are copied into each run. Returns run_rag tuples, or the exception
+    for a question that failed (DeadlineExceeded for those still running at deadline),
+    in input order.
+    """
+    return run_rag_states(compiled_graph, _batch_inputs(questions, chunks, timings, deadline), max_concurrency)
+
+
+async def arun_rag_batch(
+    compiled_graph,
+    questions: list[str],
+    chunks: list[list] | None = None,
+    timings: dict | None = None,
+    max_concurrency: int = 8,
+    deadline: float | None = None,
+    slot: Callable | None = None,
+) -> list:
+    """Async variant of run_rag_batch; slot as in arun_rag_states."""
+    return await arun_rag_states(
+        compiled_graph, _batch_inputs(questions, chunks, timings, deadline), max_concurrency, slot
+    )
+
+
+async def astream_rag(
+    compiled_graph, question: str, deadline: float | None = None
+) -> AsyncIterator[tuple[str, object]]:
+    """
+    Stream one run. Yields ("chunks", chunks) as soon as retrieval finishes, then
+    ("token", text) for each piece of the generate node's answer, and finally
+    ("done", (answer, chunks, info)) with info as in run_rag.
+    """
+    answer, chunks, info = "", [], {"usage": {}, "timings": {}, "context": {}, "target": {}}
+    stream = compiled_graph.astream({"question": question, "deadline": deadline}, stream_mode=["updates", "messages"])
+    async for mode, payload in stream:
+        if mode == "messages":
+            message, meta = payload
+            if meta.get("langgraph_node") == "generate" and message.content:
+                yield "token", message.content
+        elif "retrieve" in payload:
+            chunks = list(payload["retrieve"].get("chunks") or [])
+            info["timings"].update(payload["retrieve"].get("timings") or {})
+            yield "chunks", chunks
+        elif "assemble_context" in payload:
+            info["context"] = payload["assemble_context"].get("context_stats") or {}
+            info["timings"].update(payload["assemble_context"].get("timings") or {})
+        elif "generate" in payload:
+            answer = payload["generate"].get("answer") or ""
+            info["usage"] = payload["generate"].get("usage") or {}
+            info["target"] = payload["generate"].get("target") or {}
+            info["timings"].update(payload["generate"].get("timings") or {})
+    yield "done", (answer, chunks, info)
@@ -0,0 +1,174 @@
+"""
+Hybrid retrieval: a BM25 inverted index over the ingested chunks, fused with dense vector
+search by reciprocal-rank fusion (RRF). The index is built during ingest, saved next to
+the Chroma data (data/chroma/bm25_index.json) and updated incrementally as chunks are added
+or deleted. Tokens keep inner dots/dashes/underscores, so error codes like "ERR-4012" and
+names like "gpt-4o" match as single terms.
+"""
+
+import json
+import math
+import re
+from collections import Counter
+from pathlib import Path
+from typing import Any, Iterable, List
+
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+
+INDEX_VERSION = 1
+_TOKEN = re.compile(r"[a-z0-9]+(?:[-_.][a-z0-9]+)*")
+
+
+def tokenize(text: str) -> list[str]:
+    return _TOKEN.findall(text.lower())
+
+
+def chunk_key(doc) -> str | None:
+    """The chunk ID a retrieved Document was stored under."""
+    return (getattr(doc, "metadata", None) or {}).get("doc_id") or getattr(doc, "id", None)
+
+
+class BM25Index:
+    """Okapi BM25 over chunk IDs; postings hold term frequencies by internal doc number."""
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.ids: list[str | None] = []  # doc number -> chunk ID (None once removed)
+        self.lengths: list[int] = []
+        self.postings: dict[str, dict[int, int]] = {}
+        self._num: dict[str, int] = {}
+        self._total_len = 0
+
+    def __len__(self) -> int:
+        return len(self._num)
+
+    def add(self, chunk_id: str, text: str):
+        """Index one chunk; re-adding an ID replaces it."""
+        if chunk_id in self._num:
+            self.remove([chunk_id])
+        terms = Counter(tokenize(text))
+        n = len(self.ids)
+        self.ids.append(chunk_id)
+        length = sum(terms.values())
+        self.lengths.append(length)
+        self._num[chunk_id] = n
+        self._total_len += length
+        for term, tf in terms.items():
+            self.postings.setdefault(term, {})[n] = tf
+
+    def remove(self, chunk_ids: Iterable[str]):
+        """Drop chunks; their postings are left in place and skipped until the next save compacts them."""
+        for chunk_id in chunk_ids:
+            n = self._num.pop(chunk_id, None)
+            if n is not None:
+                self.ids[n] = None
+                self._total_len -= self.lengths[n]
+
+    def search(self, query: str, k: int = 20) -> list[tuple[str, float]]:
+        """Top-k (chunk ID, BM25 score), best first."""
+        live = len(self._num)
+        if not live:
+            return []
+        avg_len = self._total_len / live or 1.0
+        scores: dict[int, float] = {}
+        for term in set(tokenize(query)):
+            posting = self.postings.get(term)
+            if not posting:
+                continue
+            df = sum(1 for n in posting if self.ids[n] is not None)
+            if not df:
+                continue
+            idf = math.log(1 + (live - df + 0.5) / (df + 0.5))
+            for n, tf in posting.items():
+                if self.ids[n] is None:
+                    continue
+                norm = tf + self.k1 * (1 - self.b + self.b * self.lengths[n] / avg_len)
+                scores[n] = scores.get(n, 0.0) + idf * tf * (self.k1 + 1) / norm
+        best = sorted(scores.items(), key=lambda kv: (-kv[1], kv[0]))[:k]
+        return [(self.ids[n], score) for n, score in best]
+
+    def _compact(self):
+        if len(self._num) == len(self.ids):
+            return
+        renumber = {old: new for new, old in enumerate(n for n, cid in enumerate(self.ids) if cid is not None)}
+        self.ids = [cid for cid in self.ids if cid is not None]
+        self.lengths = [self.lengths[old] for old in renumber]
+        self._num = {cid: n for n, cid in enumerate(self.ids)}
+        postings = {}
+        for term, posting in self.postings.items():
+            kept = {renumber[n]: tf for n, tf in posting.items() if n in renumber}
+            if kept:
+                postings[term] = kept
+        self.postings = postings
+
+    def save(self, path: Path):
+        """Compact and write atomically; postings are stored as flat [doc, tf, doc, tf, ...] lists."""
+        self._compact()
+        data = {
+            "version": INDEX_VERSION,
+            "k1": self.k1,
+            "b": self.b,
+            "ids": self.ids,
+            "lengths": self.lengths,
+            "postings": {t: [x for n, tf in p.items() for x in (n, tf)] for t, p in self.postings.items()},
+        }
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(".tmp")
+        with open(tmp, "w") as f:
+            json.dump(data, f, separators=(",", ":"))
+        tmp.replace(path)
+
+    @classmethod
+    def load(cls, path: Path) -> "BM25Index | None":
+        try:
+            with open(path) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if data.get("version") != INDEX_VERSION:
+            return None
+        index = cls(data["k1"], data["b"])
+        index.ids = data["ids"]
+        index.lengths = data["lengths"]
+        index._num = {cid: n for n, cid in enumerate(index.ids)}
+        index._total_len = sum(index.lengths)
+        index.postings = {t: dict(zip(flat[::2], flat[1::2])) for t, flat in data["postings"].items()}
+        return index
+
+
+def rrf(rankings: Iterable[List[str]], rrf_k: int = 60) -> list[str]:
+    """Reciprocal-rank fusion: each list adds 1 / (rrf_k + rank) to an ID's score."""
+    scores: dict[str, float] = {}
+    for ranking in rankings:
+        for rank, key in enumerate(ranking, start=1):
+            scores[key] = scores.get(key, 0.0) + 1.0 / (rrf_k + rank)
+    return sorted(scores, key=lambda key: -scores[key])
+
+
+class HybridRetriever(BaseRetriever):
+    """Dense top-fetch_k from the vector store and BM25 top-fetch_k, fused by RRF down to k."""
+
+    store: Any
+    index: Any
+    k: int = 4
+    fetch_k: int = 20
+    rrf_k: int = 60
+
+    def fuse(self, query: str, dense: List[Document]) -> List[Document]:
+        """Merge already-fetched dense results with BM25 results for query."""
+        by_key = {chunk_key(d): d for d in dense}
+        sparse = [cid for cid, _ in self.index.search(query, self.fetch_k)]
+        keys = rrf([list(by_key), sparse], self.rrf_k)[: self.k]
+        missing = [key for key in keys if key not in by_key]
+        if missing:
+            from .retriever import chunks_by_ids  # retriever imports this module
+
+            for doc in chunks_by_ids(self.store, missing):
+                by_key[chunk_key(doc)] = doc
+        return [by_key[key] for key in keys if key in by_key]
+
+    def _get_relevant_documents(self, query: str, *, run_manager: CallbackManagerForRetrieverRun) -> List[Document]:
+        return self.fuse(query, self.store.similarity_search(query, k=self.fetch_k))
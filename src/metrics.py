@@ -0,0 +1,139 @@
+"""
+Minimal in-process metrics with Prometheus text exposition, served at /metrics.
+Counters, gauges and histograms take label values as keyword arguments; everything is
+guarded by one lock, so it is safe from request threads, the event loop and the run-log
+writer thread. No client library needed; a Prometheus scraper reads render() directly.
+"""
+
+import threading
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+_lock = threading.Lock()
+_registry: list["_Metric"] = []
+
+
+def _labels_key(labels: dict) -> tuple:
+    return tuple(sorted(labels.items()))
+
+
+def _escape_label(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _fmt_labels(key: tuple, extra: tuple = ()) -> str:
+    items = list(key) + list(extra)
+    if not items:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape_label(v)}"' for k, v in items) + "}"
+
+
+def _fmt_value(v: float) -> str:
+    return str(int(v)) if float(v).is_integer() else repr(float(v))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help: str):
+        self.name = name
+        self.help = help
+        with _lock:
+            _registry.append(self)
+
+    def _lines(self) -> list[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help: str):
+        super().__init__(name, help)
+        self._values: dict[tuple, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = _labels_key(labels)
+        with _lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(_labels_key(labels), 0.0)
+
+    def _lines(self) -> list[str]:
+        return [f"{self.name}{_fmt_labels(k)} {_fmt_value(v)}" for k, v in self._values.items()]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def set(self, value: float, **labels):
+        with _lock:
+            self._values[_labels_key(labels)] = value
+
+    def dec(self, amount: float = 1.0, **labels):
+        self.inc(-amount, **labels)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, buckets: tuple = DEFAULT_BUCKETS):
+        super().__init__(name, help)
+        self.buckets = tuple(sorted(buckets))
+        self._series: dict[tuple, list] = {}  # key -> [bucket counts..., sum, count]
+
+    def observe(self, value: float, **labels):
+        key = _labels_key(labels)
+        with _lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * len(self.buckets) + [0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def _lines(self) -> list[str]:
+        lines = []
+        for key, series in self._series.items():
+            for bound, count in zip(self.buckets, series):
+                lines.append(f"{self.name}_bucket{_fmt_labels(key, (('le', bound),))} {count}")
+            lines.append(f"{self.name}_bucket{_fmt_labels(key, (('le', '+Inf'),))} {series[-1]}")
+            lines.append(f"{self.name}_sum{_fmt_labels(key)} {_fmt_value(series[-2])}")
+            lines.append(f"{self.name}_count{_fmt_labels(key)} {series[-1]}")
+        return lines
+
+
+def render() -> str:
+    """All registered metrics in Prometheus text format (version 0.0.4)."""
+    out = []
+    with _lock:
+        for m in _registry:
+            out.append(f"# HELP {m.name} {m.help}")
+            out.append(f"# TYPE {m.name} {m.kind}")
+            out.extend(m._lines())
+    return "\n".join(out) + "\n"
+
+
+STAGE_SECONDS = Histogram("rag_stage_seconds", "Time spent per pipeline stage.")
+REQUEST_SECONDS = Histogram("rag_request_seconds", "End-to-end RAG run latency.")
+TTFT_SECONDS = Histogram("rag_ttft_seconds", "Time to first answer token on streamed runs.")
+RUNS_TOTAL = Counter("rag_runs_total", "RAG runs by outcome.")
+STARTUP_SECONDS = Gauge("rag_startup_seconds", "Seconds spent per startup phase (imports, pipeline build).")
+HTTP_REQUESTS_TOTAL = Counter(
+    "rag_http_requests_total", "Azure OpenAI HTTP requests by client pool and whether the connection was new or reused."
+)
+HTTP_CONNECT_SECONDS = Histogram("rag_http_connect_seconds", "Time to open a new connection (TCP + TLS) to Azure OpenAI.")
+DEADLINE_EXCEEDED_TOTAL = Counter("rag_deadline_exceeded_total", "Requests stopped because their deadline passed, by stage.")
+ADMISSION_ACTIVE = Gauge("rag_admission_active", "Requests currently holding an admission slot.")
+ADMISSION_QUEUE_DEPTH = Gauge("rag_admission_queue_depth", "Requests waiting for an admission slot.")
+ADMISSION_SHED_TOTAL = Counter("rag_admission_shed_total", "Requests rejected with 503 by admission control, by reason.")
+CHAT_TARGET_CALLS_TOTAL = Counter("rag_chat_target_calls_total", "Chat calls per routed target and outcome.")
+CHAT_TARGET_LATENCY_SECONDS = Histogram(
+    "rag_chat_target_latency_seconds", "Time until a routed chat target answered (first chunk when streaming)."
+)
+CHAT_HEDGES_TOTAL = Counter(
+    "rag_chat_hedges_total", "Hedged chat calls: won when the hedge answered first, lost when the original did."
+)
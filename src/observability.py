@@ -2,20 +2,58 @@
 Observability: LangSmith tracing (primary) or optional OpenTelemetry OTLP export.
 Set LANGCHAIN_TRACING_V2=true and LANGCHAIN_PROJECT so every chain and LLM call
 is traced; you get trace IDs, latency, token usage, and prompt/completion visibility in LangSmith.
-If LangSmith is not used, OTLP endpoint can be set for environment-based trace export.
+If LangSmith is not used, OTLP endpoint can be set for environment-based trace export,
+or OTEL_TRACES_EXPORTER=memory keeps spans in a local in-memory exporter.
+stage() wraps each hot-path step (embedding, vector search, prompt, chat, log write):
+it opens an OpenTelemetry span, records the duration into the run's timings dict and
+feeds the rag_stage_seconds histogram served at /metrics.
 """
 
 import os
+import time
+from contextlib import ExitStack, contextmanager
 
-from .config import LANGCHAIN_PROJECT, LANGCHAIN_TRACING_V2, OTEL_EXPORTER_OTLP_ENDPOINT, OTEL_SERVICE_NAME
+from .config import (
+    LANGCHAIN_PROJECT,
+    LANGCHAIN_TRACING_V2,
+    OTEL_EXPORTER_OTLP_ENDPOINT,
+    OTEL_SERVICE_NAME,
+    OTEL_TRACES_EXPORTER,
+)
+from .metrics import STAGE_SECONDS
+
+_memory_exporter = None
+
+try:
+    from opentelemetry import trace as _otel_trace
+except ImportError:  # tracing is optional; stages still time and feed metrics
+    _otel_trace = None
 
 
 def configure_tracing():
     """Apply env-based tracing. LangSmith is used when LANGCHAIN_TRACING_V2 is true."""
+    global _memory_exporter
     os.environ.setdefault("LANGCHAIN_PROJECT", LANGCHAIN_PROJECT or "llm-observability-demo")
     if LANGCHAIN_TRACING_V2:
         os.environ["LANGCHAIN_TRACING_V2"] = "true"
         return
+    if OTEL_TRACES_EXPORTER == "memory":
+        if _memory_exporter is not None:
+            return  # already configured; a second provider would be rejected by OTel
+        try:
+            from opentelemetry import trace
+            from opentelemetry.sdk.resources import Resource
+            from opentelemetry.sdk.trace import TracerProvider
+            from opentelemetry.sdk.trace.export import SimpleSpanProcessor
+            from opentelemetry.sdk.trace.export.in_memory_span_exporter import InMemorySpanExporter
+
+            provider = TracerProvider(resource=Resource.create({"service.name": OTEL_SERVICE_NAME}))
+            _memory_exporter = InMemorySpanExporter()
+            provider.add_span_processor(SimpleSpanProcessor(_memory_exporter))
+            trace.set_tracer_provider(provider)
+        except Exception:
+            pass
+        return
     if OTEL_EXPORTER_OTLP_ENDPOINT and OTEL_SERVICE_NAME:
         try:
             from opentelemetry import trace
@@ -32,3 +70,24 @@ def configure_tracing():
             trace.set_tracer_provider(provider)
         except Exception:
             pass
+
+
+def memory_span_exporter():
+    """The in-memory exporter when OTEL_TRACES_EXPORTER=memory was configured, else None."""
+    return _memory_exporter
+
+
+@contextmanager
+def stage(name: str, timings: dict | None = None):
+    """Time one pipeline stage: OTel span + timings[name] (seconds) + stage histogram."""
+    with ExitStack() as stack:
+        if _otel_trace is not None:
+            stack.enter_context(_otel_trace.get_tracer("rag").start_as_current_span(f"rag.{name}"))
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - t0
+            if timings is not None:
+                timings[name] = timings.get(name, 0.0) + elapsed
+            STAGE_SECONDS.observe(elapsed, stage=name)
@@ -1,17 +1,55 @@
 """
 RAG pipeline entry point: runnable that takes a question and returns answer plus
-retrieved chunks. Logs each run for prompt monitoring (version, latency, tokens).
+retrieved chunks. Logs each run for prompt monitoring (version, latency, tokens, cost).
 """
 
+import asyncio
 import json
 import time
+from contextlib import asynccontextmanager
 from pathlib import Path
-from typing import Any
+from typing import Any, AsyncIterator
 
-from .config import PROJECT_ROOT
-from .graph import run_rag, create_graph
+from .answer_cache import AnswerCache, normalize_question
+from .coalesce import SingleFlight
+from .config import (
+    ANSWER_CACHE_ENABLED,
+    ANSWER_CACHE_MAX_ENTRIES,
+    ANSWER_CACHE_THRESHOLD,
+    ANSWER_CACHE_TTL_SECONDS,
+    AZURE_OPENAI_DEPLOYMENT_CHAT,
+    RAG_COALESCE_ENABLED,
+    RAG_MAX_CONCURRENCY,
+    RUN_LOG_BATCH_SIZE,
+    RUN_LOG_FLUSH_SECONDS,
+    RUN_LOG_MAX_BYTES,
+    RUN_LOG_PATH,
+)
+from .graph import (
+    arun_rag,
+    arun_rag_batch,
+    arun_rag_states,
+    astream_rag,
+    build_context,
+    create_graph,
+    run_rag,
+    run_rag_batch,
+)
+from .deadline import DeadlineExceeded, bounded, check, expired, remaining
+from .metrics import REQUEST_SECONDS, RUNS_TOTAL, TTFT_SECONDS
+from .observability import stage
 from .prompts import PROMPT_VERSION
-from .retriever import build_vector_store, get_retriever, load_existing_store
+from .retriever import (
+    build_vector_store,
+    chunks_by_ids,
+    get_retriever,
+    ingest_incremental,
+    load_existing_store,
+    open_search_store,
+    retrieve_many,
+)
+from .run_log import RunLogWriter
+from .usage import cost_usd
 
 
 def _chunk_ids(chunks) -> list[str]:
@@ -22,11 +60,7 @@ def _chunk_ids(chunks) -> list[str]:
     return ids
 
 
-def _token_estimate(text: str) -> int:
-    return max(1, len(text) // 4)
-
-
-def log_run(
+def run_record(
     prompt_version: str,
     question: str,
     chunk_ids: list[str],
@@ -34,21 +68,60 @@ def log_run(
     latency_seconds: float,
     input_tokens: int,
     output_tokens: int,
-    log_path: Path | None = None,
-):
-    """Append one run to JSONL for prompt monitoring and quality tracking."""
-    if log_path is None:
-        log_path = PROJECT_ROOT / "data" / "runs.jsonl"
-    log_path.parent.mkdir(parents=True, exist_ok=True)
-    row = {
+    cache_hit: bool = False,
+    token_source: str = "",
+    cost_usd: float | None = None,
+    deployment: str = AZURE_OPENAI_DEPLOYMENT_CHAT,
+    ttft_seconds: float | None = None,
+    stages: dict | None = None,
+    context_tokens: int | None = None,
+    context_tokens_saved: int = 0,
+    coalesced: bool = False,
+    target: str | None = None,
+    hedged: bool = False,
+) -> dict:
+    """One runs.jsonl row for prompt monitoring and quality tracking."""
+    return {
+        "ts": round(time.time(), 3),
         "prompt_version": prompt_version,
         "question": question[:500],
         "chunk_ids": chunk_ids,
         "answer_preview": (answer or "")[:300],
         "latency_seconds": round(latency_seconds, 3),
+        "ttft_seconds": round(ttft_seconds, 3) if ttft_seconds is not None else None,
+        "stages": stages or {},
         "input_tokens": input_tokens,
         "output_tokens": output_tokens,
+        "context_tokens": context_tokens,
+        "context_tokens_saved": context_tokens_saved,
+        "token_source": token_source,
+        "cost_usd": cost_usd,
+        "deployment": deployment,
+        "target": target,
+        "hedged": hedged,
+        "cache_hit": cache_hit,
+        "coalesced": coalesced,
     }
+
+
+def log_run(
+    prompt_version: str,
+    question: str,
+    chunk_ids: list[str],
+    answer: str,
+    latency_seconds: float,
+    input_tokens: int,
+    output_tokens: int,
+    log_path: Path | None = None,
+    cache_hit: bool = False,
+):
+    """Append one run to JSONL synchronously. RAGPipeline uses its buffered RunLogWriter instead."""
+    if log_path is None:
+        log_path = RUN_LOG_PATH
+    log_path.parent.mkdir(parents=True, exist_ok=True)
+    row = run_record(
+        prompt_version, question, chunk_ids, answer, latency_seconds, input_tokens, output_tokens, cache_hit
+    )
     with open(log_path, "a") as f:
         f.write(json.dumps(row) + "\n")
 
@@ -56,41 +129,445 @@ def log_run(
 class RAGPipeline:
     """Single runnable: question -> (answer, retrieved_chunks). Uses existing Chroma or builds from docs."""
 
-    def __init__(self, docs_path: Path | None = None, persist_store: bool = True):
+    def __init__(
+        self,
+        docs_path: Path | None = None,
+        persist_store: bool = True,
+        max_concurrency: int = RAG_MAX_CONCURRENCY,
+        answer_cache: bool = ANSWER_CACHE_ENABLED,
+        coalesce: bool = RAG_COALESCE_ENABLED,
+    ):
         self._store = load_existing_store()
-        if self._store is None:
-            self._store = build_vector_store(docs_path=docs_path, use_persist=persist_store)
-        self._retriever = get_retriever(self._store, k=4)
+        if self._store is None and persist_store:
+            # Reuses whatever the manifest says is already embedded instead of re-embedding everything.
+            self._store, _ = ingest_incremental(docs_path=docs_path)
+        elif self._store is None:
+            self._store = build_vector_store(docs_path=docs_path, use_persist=False)
+        self._store = open_search_store(self._store)  # Chroma, or its NumPy export (RETRIEVER_BACKEND)
+        self._k = 4
+        self._retriever = get_retriever(self._store, k=self._k)
         self._graph = create_graph(self._retriever)
-        self._run_log_path = PROJECT_ROOT / "data" / "runs.jsonl"
+        self._run_log_path = RUN_LOG_PATH
+        self._run_log = RunLogWriter(
+            self._run_log_path,
+            batch_size=RUN_LOG_BATCH_SIZE,
+            flush_seconds=RUN_LOG_FLUSH_SECONDS,
+            max_bytes=RUN_LOG_MAX_BYTES,
+        )
+        # Bounds in-flight arun() calls; excess callers wait instead of piling onto Azure.
+        self._max_concurrency = max(1, max_concurrency)
+        self._limiter = asyncio.Semaphore(self._max_concurrency)
+        self._answer_cache = (
+            AnswerCache(
+                PROMPT_VERSION,
+                AZURE_OPENAI_DEPLOYMENT_CHAT,
+                threshold=ANSWER_CACHE_THRESHOLD,
+                ttl_seconds=ANSWER_CACHE_TTL_SECONDS,
+                max_entries=ANSWER_CACHE_MAX_ENTRIES,
+            )
+            if answer_cache
+            else None
+        )
+        # Identical questions in flight at the same time share one run (see _flight_key).
+        self._flights = SingleFlight() if coalesce else None
 
-    def run(self, question: str) -> dict[str, Any]:
-        """Run RAG and return answer, chunks, and run metadata (latency, token estimates)."""
+    def run(self, question: str, deadline: float | None = None) -> dict[str, Any]:
+        """
+        Run RAG and return answer, chunks, and run metadata (latency, tokens, cost).
+        deadline (time.monotonic(), see src.deadline) stops the run with DeadlineExceeded
+        once it passes; a coalesced request waits for the shared run at most that long,
+        and runs again itself if the shared run stopped at its leader's earlier deadline.
+        """
+        if self._flights is None:
+            return self._run(question, deadline)
         t0 = time.perf_counter()
-        answer, chunks = run_rag(self._graph, question)
+        while True:
+            led = []
+
+            def lead():
+                led.append(True)
+                return self._run(question, deadline)
+
+            try:
+                out, leader = self._flights.do(self._flight_key(question), lead, timeout=remaining(deadline))
+            except DeadlineExceeded:
+                if led or expired(deadline):
+                    raise
+                continue  # the shared run stopped at its leader's deadline, not ours: run it again
+            except TimeoutError:
+                check(deadline, "coalesced")
+                raise
+            return out if leader else self._follow(question, out, t0)
+
+    async def arun(self, question: str, deadline: float | None = None) -> dict[str, Any]:
+        """Async run: same result as run(), without blocking the event loop; work is cancelled at deadline."""
+        if self._flights is None:
+            return await self._arun(question, deadline)
+        t0 = time.perf_counter()
+        while True:
+            led = []
+
+            async def lead():
+                led.append(True)
+                return await self._arun(question, deadline)
+
+            try:
+                out, leader = await self._flights.ado(self._flight_key(question), lead, timeout=remaining(deadline))
+            except DeadlineExceeded:
+                if led or expired(deadline):
+                    raise
+                continue  # the shared run stopped at its leader's deadline, not ours: run it again
+            except TimeoutError:
+                check(deadline, "coalesced")
+                raise
+            return out if leader else self._follow(question, out, t0)
+
+    @asynccontextmanager
+    async def _slot(self, deadline: float | None):
+        """One of the max_concurrency run slots; waiting for it counts against the deadline."""
+        await bounded(self._limiter.acquire(), deadline, "queue")
+        try:
+            yield
+        finally:
+            self._limiter.release()
+
+    def _run(self, question: str, deadline: float | None = None) -> dict[str, Any]:
+        t0 = time.perf_counter()
+        vector = None
+        if self._answer_cache is not None:
+            check(deadline, "answer_cache")
+            with stage("answer_cache"):
+                vector = self._store.embeddings.embed_query(question)
+                out = self._cached(question, vector, t0)
+            if out is not None:
+                self._log(out)
+                return out
+        answer, chunks, info = run_rag(self._graph, question, deadline)
         latency = time.perf_counter() - t0
-        chunk_ids = _chunk_ids(chunks)
-        context = "\n\n".join(getattr(c, "page_content", str(c)) for c in chunks)
-        input_tokens = _token_estimate(question + context)
-        output_tokens = _token_estimate(answer)
-        log_run(
-            PROMPT_VERSION,
-            question,
-            chunk_ids,
-            answer,
-            latency,
-            input_tokens,
-            output_tokens,
-            self._run_log_path,
+        out = self._result(question, answer, chunks, latency, info)
+        self._remember(out, vector)
+        self._log(out)
+        return out
+
+    async def _arun(self, question: str, deadline: float | None = None) -> dict[str, Any]:
+        t0 = time.perf_counter()
+        vector = None
+        if self._answer_cache is not None:
+            with stage("answer_cache"):
+                vector = await bounded(self._store.embeddings.aembed_query(question), deadline, "answer_cache")
+                out = self._cached(question, vector, t0)
+            if out is not None:
+                self._log(out)
+                return out
+        async with self._slot(deadline):
+            answer, chunks, info = await arun_rag(self._graph, question, deadline)
+            latency = time.perf_counter() - t0
+        out = self._result(question, answer, chunks, latency, info)
+        self._remember(out, vector)
+        self._log(out)
+        return out
+
+    async def astream(self, question: str, deadline: float | None = None) -> AsyncIterator[dict[str, Any]]:
+        """
+        Streaming run. Yields {"event": "chunks", "data": chunks} once retrieval is done,
+        {"event": "token", "data": text} per answer piece, then {"event": "done", "data": result}
+        where result is what arun() returns plus ttft_seconds (time to first answer token).
+        Raises DeadlineExceeded mid-stream if deadline passes first.
+        """
+        t0 = time.perf_counter()
+        vector = None
+        if self._answer_cache is not None:
+            with stage("answer_cache"):
+                vector = await bounded(self._store.embeddings.aembed_query(question), deadline, "answer_cache")
+                out = self._cached(question, vector, t0)
+            if out is not None:
+                out["ttft_seconds"] = out["latency_seconds"]
+                self._log(out)
+                yield {"event": "chunks", "data": out["retrieved_chunks"]}
+                yield {"event": "token", "data": out["answer"]}
+                yield {"event": "done", "data": out}
+                return
+        ttft = None
+        async with self._slot(deadline):
+            async for kind, payload in astream_rag(self._graph, question, deadline):
+                if kind == "token":
+                    if ttft is None:
+                        ttft = time.perf_counter() - t0
+                    yield {"event": "token", "data": payload}
+                elif kind == "chunks":
+                    yield {"event": "chunks", "data": payload}
+                else:
+                    answer, chunks, info = payload
+            latency = time.perf_counter() - t0
+        out = self._result(question, answer, chunks, latency, info)
+        out["ttft_seconds"] = ttft if ttft is not None else latency
+        self._remember(out, vector)
+        self._log(out)
+        yield {"event": "done", "data": out}
+
+    def run_batch(
+        self, questions: list[str], max_concurrency: int | None = None, deadline: float | None = None
+    ) -> list[dict[str, Any]]:
+        """
+        Run many questions at once: one embedding call for all of them, one vector query,
+        then chat completions fanned out through the graph's batch() with at most
+        max_concurrency (never more than the pipeline's own) in flight, and all log rows
+        written together. Results are in input
+        order and shaped like run()'s; a question that failed (or was still running at
+        deadline) has an "error" instead.
+        """
+        if not questions:
+            return []
+        t0 = time.perf_counter()
+        timings: dict = {}
+        check(deadline, "embed_query")
+        with stage("embed_query", timings):
+            vectors = self._store.embeddings.embed_documents(questions)
+        outs, todo = self._batch_cache(questions, vectors, t0)
+        with stage("vector_search", timings):
+            chunks = retrieve_many(
+                self._retriever, self._store, [questions[i] for i in todo], [vectors[i] for i in todo], k=self._k
+            )
+        results = run_rag_batch(
+            self._graph,
+            [questions[i] for i in todo],
+            chunks,
+            timings,
+            max_concurrency=self._batch_concurrency(max_concurrency),
+            deadline=deadline,
+        )
+        return self._batch_finish(questions, vectors, outs, todo, results)
+
+    async def arun_batch(
+        self, questions: list[str], max_concurrency: int | None = None, deadline: float | None = None
+    ) -> list[dict[str, Any]]:
+        """
+        Async run_batch: awaits the embedding call and chat completions. Each run also takes
+        one of the pipeline's arun() slots, so batches and single requests share one cap.
+        """
+        if not questions:
+            return []
+        t0 = time.perf_counter()
+        timings: dict = {}
+        with stage("embed_query", timings):
+            vectors = await bounded(self._store.embeddings.aembed_documents(questions), deadline, "embed_query")
+        outs, todo = self._batch_cache(questions, vectors, t0)
+        with stage("vector_search", timings):
+            chunks = await asyncio.to_thread(
+                retrieve_many,
+                self._retriever,
+                self._store,
+                [questions[i] for i in todo],
+                [vectors[i] for i in todo],
+                k=self._k,
+            )
+        results = await arun_rag_batch(
+            self._graph,
+            [questions[i] for i in todo],
+            chunks,
+            timings,
+            max_concurrency=self._batch_concurrency(max_concurrency),
+            deadline=deadline,
+            slot=lambda: self._slot(deadline),
         )
+        return self._batch_finish(questions, vectors, outs, todo, results)
+
+    async def arun_matrix(
+        self,
+        questions: list[str],
+        prompt_versions: list[str],
+        ks: list[int],
+        max_concurrency: int | None = None,
+    ) -> tuple[dict[tuple[str, int], list], dict]:
+        """
+        Answer every question under every (prompt version, k) while retrieving once: one
+        embedding call and one search at max(ks), smaller k take a prefix of those chunks,
+        and each (question, k) context is assembled once and shared by all prompt versions.
+        All generations fan out together, each holding one of the pipeline's run slots. Returns ({(version, k): [run_rag
+        tuple or exception per question]}, shared retrieval timings); runs are not logged.
+        Empty ks means the pipeline's own k.
+        """
+        timings: dict = {}
+        ks = list(ks) or [self._k]
+        if not questions:
+            return {(v, k): [] for v in prompt_versions for k in ks}, timings
+        k_max = max(ks)
+        retriever = self._retriever if k_max == self._k else get_retriever(self._store, k=k_max)
+        with stage("embed_query", timings):
+            vectors = await self._store.embeddings.aembed_documents(questions)
+        with stage("vector_search", timings):
+            chunks = await asyncio.to_thread(retrieve_many, retriever, self._store, questions, vectors, k=k_max)
+        contexts: dict[int, list] = {}
+        for k in ks:
+            contexts[k] = []
+            for docs in chunks:
+                t = time.perf_counter()
+                context, stats = build_context(docs[:k])
+                contexts[k].append((docs[:k], context, stats, {"build_context": time.perf_counter() - t}))
+        cells = [(v, k) for v in prompt_versions for k in ks]
+        states = [
+            {
+                "question": q,
+                "chunks": docs,
+                "context": context,
+                "context_stats": stats,
+                "prompt_version": v,
+                "timings": dict(build),
+            }
+            for v, k in cells
+            for q, (docs, context, stats, build) in zip(questions, contexts[k])
+        ]
+        results = await arun_rag_states(
+            self._graph, states, self._batch_concurrency(max_concurrency), slot=lambda: self._slot(None)
+        )
+        n = len(questions)
+        return {cell: results[i * n : (i + 1) * n] for i, cell in enumerate(cells)}, timings
+
+    def _batch_concurrency(self, requested: int | None) -> int:
+        """A caller's batch fan-out, clamped to the pipeline's max_concurrency."""
+        return max(1, min(requested or self._max_concurrency, self._max_concurrency))
+
+    def _batch_cache(self, questions: list[str], vectors: list, t0: float) -> tuple[list, list[int]]:
+        """Answer-cache hits filled in; indices of the questions that still need a run."""
+        outs: list = [None] * len(questions)
+        if self._answer_cache is None:
+            return outs, list(range(len(questions)))
+        todo = []
+        for i, (q, v) in enumerate(zip(questions, vectors)):
+            outs[i] = self._cached(q, v, t0)
+            if outs[i] is None:
+                todo.append(i)
+        return outs, todo
+
+    def _batch_finish(self, questions: list[str], vectors: list, outs: list, todo: list[int], results: list) -> list:
+        for i, res in zip(todo, results):
+            if isinstance(res, Exception):
+                outs[i] = self._result(questions[i], "", [], 0.0, info={})
+                outs[i]["error"] = f"{type(res).__name__}: {res}"
+                continue
+            answer, chunks, info = res
+            # Runs finish together, so each run's latency is the shared retrieval plus its own stages.
+            latency = sum((info.get("timings") or {}).values())
+            outs[i] = self._result(questions[i], answer, chunks, latency, info)
+            self._remember(outs[i], vectors[i])
+        self._log_many(outs)
+        return outs
+
+    def _cached(self, question: str, vector, t0: float) -> dict[str, Any] | None:
+        """Answer-cache lookup; a hit costs no chat tokens and re-reads its chunks by ID."""
+        hit = self._answer_cache.get(question, vector)
+        if hit is None:
+            return None
+        chunks = chunks_by_ids(self._store, hit.chunk_ids)
+        out = self._result(question, hit.answer, chunks, time.perf_counter() - t0, info={})
+        out.update(
+            chunk_ids=hit.chunk_ids,
+            cache_hit=True,
+            cache_similarity=round(hit.similarity, 4),
+        )
+        return out
+
+    def _flight_key(self, question: str) -> str:
+        return f"{PROMPT_VERSION}\0{self._k}\0{normalize_question(question)}"
+
+    def _follow(self, question: str, shared: dict[str, Any], t0: float) -> dict[str, Any]:
+        """Result for a request that waited on an identical in-flight run: same answer, no tokens spent."""
+        out = {
+            **shared,
+            "question": question,
+            "latency_seconds": time.perf_counter() - t0,
+            "ttft_seconds": None,
+            "input_tokens": 0,
+            "output_tokens": 0,
+            "token_source": "",
+            "cost_usd": 0.0,
+            "stages": {},
+            "coalesced": True,
+        }
+        self._log(out)
+        return out
+
+    def _remember(self, out: dict[str, Any], vector):
+        if self._answer_cache is not None and vector is not None:
+            self._answer_cache.put(out["question"], vector, out["answer"], out["chunk_ids"])
+
+    def close(self):
+        """Flush queued run-log records; call on shutdown."""
+        self._run_log.close()
+
+    def _observe(self, out: dict[str, Any]) -> bool:
+        """Request metrics for one result; False for a failed batch item (not written to the log)."""
+        if "error" in out:
+            RUNS_TOTAL.inc(outcome="error")
+            return False
+        REQUEST_SECONDS.observe(out["latency_seconds"])
+        if out["ttft_seconds"] is not None:
+            TTFT_SECONDS.observe(out["ttft_seconds"])
+        RUNS_TOTAL.inc(outcome="coalesced" if out["coalesced"] else "cache_hit" if out["cache_hit"] else "ok")
+        return True
+
+    def _log(self, out: dict[str, Any]):
+        self._observe(out)
+        with stage("log_write"):
+            self._run_log.write(self._record(out))
+
+    def _log_many(self, outs: list[dict[str, Any]]):
+        records = [self._record(o) for o in outs if self._observe(o)]
+        with stage("log_write"):
+            self._run_log.write_many(records)
+
+    @staticmethod
+    def _record(out: dict[str, Any]) -> dict:
+        return run_record(
+            out["prompt_version"],
+            out["question"],
+            out["chunk_ids"],
+            out["answer"],
+            out["latency_seconds"],
+            out["input_tokens"],
+            out["output_tokens"],
+            cache_hit=out["cache_hit"],
+            token_source=out["token_source"],
+            cost_usd=out["cost_usd"],
+            ttft_seconds=out["ttft_seconds"],
+            stages=out["stages"],
+            context_tokens=out["context_tokens"],
+            context_tokens_saved=out["context_tokens_saved"],
+            coalesced=out["coalesced"],
+            deployment=out["deployment"],
+            target=out["target"],
+            hedged=out["hedged"],
+        )
+
+    @staticmethod
+    def _result(question: str, answer: str, chunks: list, latency: float, info: dict) -> dict[str, Any]:
+        usage = info.get("usage") or {}
+        context = info.get("context") or {}
+        target = info.get("target") or {}
+        deployment = target.get("deployment") or AZURE_OPENAI_DEPLOYMENT_CHAT
+        chunk_ids = _chunk_ids(chunks)
+        input_tokens = usage.get("input_tokens", 0)
+        output_tokens = usage.get("output_tokens", 0)
         return {
+            "question": question,
             "answer": answer,
             "retrieved_chunks": chunks,
             "chunk_ids": chunk_ids,
             "latency_seconds": latency,
+            "ttft_seconds": None,
             "input_tokens": input_tokens,
             "output_tokens": output_tokens,
+            "context_tokens": context.get("tokens_after"),
+            "context_tokens_saved": context.get("tokens_saved", 0),
+            "token_source": usage.get("token_source", ""),
+            "cost_usd": cost_usd(input_tokens, output_tokens, deployment) if usage else 0.0,
+            "stages": {k: round(v, 4) for k, v in (info.get("timings") or {}).items()},
             "prompt_version": PROMPT_VERSION,
+            "deployment": deployment,
+            "target": target.get("target"),
+            "hedged": bool(target.get("hedged")),
+            "cache_hit": False,
+            "coalesced": False,
         }
 
 
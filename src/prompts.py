@@ -1,6 +1,8 @@
 """
 RAG prompt template and version for monitoring.
 Change PROMPT_VERSION when you iterate on the template so runs can be compared.
+PROMPTS keeps every known version as (system, user template); the pipeline serves
+PROMPT_VERSION, and the eval matrix (scripts/run_eval.py --prompts) compares any of them.
 """
 
 PROMPT_VERSION = "v1"
@@ -15,6 +17,28 @@ Question: {question}
 Answer:"""
 
 
+PROMPTS: dict[str, tuple[str, str]] = {
+    PROMPT_VERSION: (RAG_SYSTEM, RAG_USER_TEMPLATE),
+}
+
+
+def register_prompt(version: str, system: str, template: str):
+    """Add or replace a prompt variant; template must use {context} and {question}."""
+    template.format(context="", question="")  # fail fast on a bad placeholder
+    missing = [name for name in ("{context}", "{question}") if name not in template]
+    if missing:
+        raise ValueError(f"Prompt template {version!r} is missing {', '.join(missing)}")
+    PROMPTS[version] = (system, template)
+
+
+def get_prompt(version: str | None = None) -> tuple[str, str]:
+    """(system, user template) for version (default PROMPT_VERSION)."""
+    try:
+        return PROMPTS[version or PROMPT_VERSION]
+    except KeyError:
+        raise KeyError(f"Unknown prompt version {version!r} (known: {', '.join(PROMPTS)})") from None
+
+
 def get_rag_prompt_context(context: str, question: str) -> dict:
     """Fill the RAG user template. Returns dict for LangChain format."""
     return {
@@ -1,80 +1,468 @@
 """
 Document loading, chunking, embedding, and vector store.
 Uses Azure OpenAI embeddings; store is Chroma with optional persistence.
+Chunks get deterministic IDs (source path + content hash), and a manifest of file
+and chunk hashes lets incremental ingest embed only what changed. Ingest parses files
+in a process pool and embeds chunks in bounded batches as they stream in, so memory
+stays flat regardless of corpus size; embedding requests go through EmbeddingExecutor
+(concurrency cap, TPM budget, retries on 429).
 """
 
+import hashlib
+import json
+import logging
+import os
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from dataclasses import dataclass
+from multiprocessing import get_context
 from pathlib import Path
-from typing import List
+from typing import Iterable, Iterator, List
 
 from langchain_community.document_loaders import DirectoryLoader, PyPDFLoader, TextLoader
 from langchain_community.vectorstores import Chroma
-from langchain_openai import AzureOpenAIEmbeddings
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 
+from .clients import embeddings_model
 from .config import (
-    AZURE_OPENAI_API_KEY,
-    AZURE_OPENAI_API_VERSION,
     AZURE_OPENAI_DEPLOYMENT_EMBEDDING,
-    AZURE_OPENAI_ENDPOINT,
+    BM25_INDEX_PATH,
     CHROMA_PERSIST_DIR,
     DOCS_DIR,
+    EMBEDDING_CACHE_ENABLED,
+    EMBEDDING_CACHE_MAX_ENTRIES,
+    EMBEDDING_CACHE_PATH,
+    EMBEDDING_MAX_IN_FLIGHT,
+    EMBEDDING_MAX_RETRIES,
+    EMBEDDING_TOKENS_PER_MINUTE,
+    HYBRID_FETCH_K,
+    HYBRID_RRF_K,
+    INGEST_BATCH_SIZE,
+    INGEST_MANIFEST_PATH,
+    INGEST_WORKERS,
+    RETRIEVAL_MODE,
+    RETRIEVER_BACKEND,
+    RETRIEVER_INDEX,
+    RETRIEVER_IVF_NLIST,
+    RETRIEVER_IVF_NPROBE,
+    VECTOR_INDEX_DIR,
 )
+from .embed_executor import EmbeddingExecutor
+from .embedding_cache import CachedEmbeddings
+from .hybrid import BM25Index, HybridRetriever
+from .usage import count_tokens
+from .vector_index import NumpyVectorStore, index_lock, read_meta, write_index
 
+logger = logging.getLogger(__name__)
 
-def get_embeddings() -> AzureOpenAIEmbeddings:
-    return AzureOpenAIEmbeddings(
-        azure_endpoint=AZURE_OPENAI_ENDPOINT,
-        api_key=AZURE_OPENAI_API_KEY,
-        api_version=AZURE_OPENAI_API_VERSION,
-        azure_deployment=AZURE_OPENAI_DEPLOYMENT_EMBEDDING,
+COLLECTION_NAME = "rag_docs"
+LOADERS = {".txt": TextLoader, ".pdf": PyPDFLoader}
+
+
+def get_embeddings(max_retries: int | None = None) -> Embeddings:
+    """
+    Azure OpenAI embeddings (shared HTTP clients), wrapped in the on-disk cache unless
+    EMBEDDING_CACHE_ENABLED is off. Pass max_retries=0 when EmbeddingExecutor does the retrying.
+    """
+    embeddings = embeddings_model(max_retries)
+    if not EMBEDDING_CACHE_ENABLED:
+        return embeddings
+    return CachedEmbeddings(
+        embeddings,
+        path=EMBEDDING_CACHE_PATH,
+        model=AZURE_OPENAI_DEPLOYMENT_EMBEDDING,
+        max_entries=EMBEDDING_CACHE_MAX_ENTRIES,
     )
 
 
+def iter_doc_files(docs_path: Path) -> List[Path]:
+    """Sorted .txt and .pdf files under docs_path."""
+    if not docs_path.exists():
+        return []
+    return sorted(p for p in docs_path.rglob("*") if p.is_file() and p.suffix in LOADERS)
+
+
+def load_file(path: Path) -> List:
+    """Load one .txt or .pdf file into LangChain documents ([] if it cannot be parsed, with a warning)."""
+    try:
+        return LOADERS[path.suffix](str(path)).load()
+    except Exception as e:
+        logger.warning("Could not load %s: %s: %s", path, type(e).__name__, e)
+        return []
+
+
 def load_docs_from_directory(docs_path: Path) -> List:
-    """Load .txt and .pdf from docs_path into LangChain documents."""
+    """Load .txt and .pdf from docs_path into LangChain documents (all in memory; ingest streams instead)."""
     docs = []
-    if not docs_path.exists():
-        return docs
-    for ext, loader_cls in [(".txt", TextLoader), (".pdf", PyPDFLoader)]:
-        for path in docs_path.rglob(f"*{ext}"):
-            try:
-                loader = loader_cls(str(path))
-                docs.extend(loader.load())
-            except Exception:
-                pass
+    for path in iter_doc_files(docs_path):
+        docs.extend(load_file(path))
     return docs
 
 
+def _sha256(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def file_hash(path: Path) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def chunk_hash(doc) -> str:
+    """Hash of chunk text plus page, so a moved PDF chunk counts as changed."""
+    page = doc.metadata.get("page", "")
+    return _sha256(f"{page}\0{doc.page_content}".encode("utf-8"))
+
+
+def assign_chunk_ids(chunks: List, source: str) -> List[str]:
+    """
+    Give each chunk of one source a stable ID derived from (source, chunk hash, occurrence).
+    Unchanged chunks keep their ID when other parts of the file are edited. The ID is also
+    written to metadata["doc_id"], which the pipeline logs as the chunk ID.
+    """
+    ids = []
+    seen: dict[str, int] = {}
+    for doc in chunks:
+        h = chunk_hash(doc)
+        n = seen.get(h, 0)
+        seen[h] = n + 1
+        chunk_id = _sha256(f"{source}\0{h}\0{n}".encode("utf-8"))[:32]
+        doc.metadata["doc_id"] = chunk_id
+        doc.metadata["chunk_hash"] = h
+        ids.append(chunk_id)
+    return ids
+
+
+def _splitter(chunk_size: int, chunk_overlap: int) -> RecursiveCharacterTextSplitter:
+    return RecursiveCharacterTextSplitter(
+        chunk_size=chunk_size,
+        chunk_overlap=chunk_overlap,
+        length_function=len,
+    )
+
+
+@dataclass
+class FileChunks:
+    """Result of loading and splitting one file in an ingest worker."""
+
+    source: str  # path relative to the docs root
+    digest: str
+    chunks: list
+    ids: list[str]
+    error: str | None = None
+
+
+def _process_file(path: str, docs_root: str, chunk_size: int, chunk_overlap: int, digest: str = "") -> FileChunks:
+    """Load, split and ID one file. Runs in a worker process, so it only takes picklable args."""
+    p = Path(path)
+    source = p.relative_to(docs_root).as_posix()
+    try:
+        digest = digest or file_hash(p)
+        chunks = _splitter(chunk_size, chunk_overlap).split_documents(LOADERS[p.suffix](path).load())
+        return FileChunks(source, digest, chunks, assign_chunk_ids(chunks, source))
+    except Exception as e:
+        return FileChunks(source, digest, [], [], f"{type(e).__name__}: {e}")
+
+
+def iter_file_chunks(
+    files: List[Path],
+    docs_path: Path,
+    chunk_size: int = 800,
+    chunk_overlap: int = 100,
+    workers: int | None = None,
+    digests: dict[Path, str] | None = None,
+) -> Iterator[FileChunks]:
+    """
+    Load and split files in a process pool, yielding each file's chunks as soon as it is done
+    (completion order). At most 2 * workers files are parsed ahead of the consumer, so a slow
+    embedding step holds back parsing instead of letting chunks pile up in memory.
+    """
+    digests = digests or {}
+    workers = workers or INGEST_WORKERS or os.cpu_count() or 1
+    if workers <= 1 or len(files) <= 1:
+        for f in files:
+            yield _process_file(str(f), str(docs_path), chunk_size, chunk_overlap, digests.get(f, ""))
+        return
+    # spawn, not fork: the parent may hold Chroma/SQLite handles and threads.
+    with ProcessPoolExecutor(max_workers=workers, mp_context=get_context("spawn")) as pool:
+        pending = set()
+        for f in files:
+            if len(pending) >= 2 * workers:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for fut in done:
+                    yield fut.result()
+            pending.add(
+                pool.submit(_process_file, str(f), str(docs_path), chunk_size, chunk_overlap, digests.get(f, ""))
+            )
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for fut in done:
+                yield fut.result()
+
+
+def _batches(pairs: Iterable[tuple[str, object]], batch_size: int) -> Iterator[tuple[list, list, list]]:
+    """Group (id, document) pairs into (texts, ids, documents) batches."""
+    ids, docs = [], []
+    for chunk_id, doc in pairs:
+        ids.append(chunk_id)
+        docs.append(doc)
+        if len(docs) >= batch_size:
+            yield [d.page_content for d in docs], ids, docs
+            ids, docs = [], []
+    if docs:
+        yield [d.page_content for d in docs], ids, docs
+
+
+def _add_in_batches(store: Chroma, pairs: Iterable[tuple[str, object]], executor: EmbeddingExecutor) -> int:
+    """Embed (id, document) pairs through executor and upsert them; returns how many were added."""
+    added = 0
+    for vectors, texts, ids, docs in executor.map(_batches(pairs, executor.batch_size)):
+        # Same write Chroma.add_documents does, minus its own (unbatched, unretried) embedding call.
+        store._collection.upsert(ids=ids, embeddings=vectors, documents=texts, metadatas=[d.metadata for d in docs])
+        added += len(ids)
+    return added
+
+
+def _executor(store: Chroma, batch_size: int, max_in_flight: int, tokens_per_minute: int) -> EmbeddingExecutor:
+    return EmbeddingExecutor(
+        store.embeddings,
+        batch_size=batch_size,
+        max_in_flight=max_in_flight,
+        tokens_per_minute=tokens_per_minute,
+        max_retries=EMBEDDING_MAX_RETRIES,
+        count_tokens=lambda text: count_tokens(text, AZURE_OPENAI_DEPLOYMENT_EMBEDDING),
+    )
+
+
+def _report_failure(stats: dict, fc: FileChunks):
+    stats["failed_files"].append({"source": fc.source, "error": fc.error})
+    logger.warning("Skipping %s: %s", fc.source, fc.error)
+
+
+def _manifest_settings(chunk_size: int, chunk_overlap: int) -> dict:
+    # Any change here invalidates every stored chunk, so incremental ingest falls back to a full build.
+    return {
+        "chunk_size": chunk_size,
+        "chunk_overlap": chunk_overlap,
+        "embedding_deployment": AZURE_OPENAI_DEPLOYMENT_EMBEDDING,
+    }
+
+
+def load_manifest(path: Path | None = None) -> dict | None:
+    path = path or INGEST_MANIFEST_PATH
+    if not path.exists():
+        return None
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def save_manifest(manifest: dict, path: Path | None = None):
+    path = path or INGEST_MANIFEST_PATH
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(".tmp")
+    with open(tmp, "w") as f:
+        json.dump(manifest, f)
+    tmp.replace(path)
+
+
+def _manifest_entry(digest: str, chunks: list, ids: list[str]) -> dict:
+    return {
+        "hash": digest,
+        "chunks": {cid: c.metadata["chunk_hash"] for cid, c in zip(ids, chunks)},
+    }
+
+
+def _open_store(persist: bool, embeddings=None) -> Chroma:
+    return Chroma(
+        persist_directory=str(CHROMA_PERSIST_DIR) if persist else None,
+        embedding_function=embeddings or get_embeddings(),
+        collection_name=COLLECTION_NAME,
+    )
+
+
+def _ingest_embeddings(embeddings: Embeddings | None) -> Embeddings:
+    # EmbeddingExecutor retries each batch itself; SDK retries nested inside would multiply
+    # the attempts per batch and hide them from its TPM pacing and retry stats.
+    return embeddings or get_embeddings(max_retries=0)
+
+
+def _finish_ingest(store: Chroma, persist: bool, embeddings: Embeddings | None, stats: dict) -> tuple[Chroma, dict]:
+    """Reopen the ingested collection with query-time embeddings (SDK retries on) for the caller."""
+    if hasattr(store.embeddings, "stats"):
+        stats["embedding_cache"] = store.embeddings.stats()
+    return _open_store(persist, embeddings), stats
+
+
+def _new_stats(mode: str) -> dict:
+    return {
+        "mode": mode,
+        "files_changed": 0,
+        "files_removed": 0,
+        "chunks_added": 0,
+        "chunks_deleted": 0,
+        "failed_files": [],
+    }
+
+
+def ingest_full(
+    docs_path: Path | None = None,
+    chunk_size: int = 800,
+    chunk_overlap: int = 100,
+    use_persist: bool = True,
+    workers: int | None = None,
+    batch_size: int = INGEST_BATCH_SIZE,
+    max_in_flight: int = EMBEDDING_MAX_IN_FLIGHT,
+    tokens_per_minute: int = EMBEDDING_TOKENS_PER_MINUTE,
+    embeddings: Embeddings | None = None,
+) -> tuple[Chroma, dict]:
+    """
+    Rebuild the collection from docs_path: files are parsed in a process pool and their
+    chunks embedded in batches as they arrive (max_in_flight concurrent requests under a
+    tokens_per_minute budget). Returns (store, stats); files that fail to load are listed
+    in stats["failed_files"] and left out. Pass embeddings to ingest with a fake model.
+    """
+    path = docs_path or DOCS_DIR
+    files = iter_doc_files(path)
+    if not files:
+        raise ValueError(f"No .txt or .pdf files found under {path}")
+    if use_persist:
+        CHROMA_PERSIST_DIR.mkdir(parents=True, exist_ok=True)
+        # Invalidate first: if the rebuild dies partway, the next incremental run finds no
+        # manifest and rebuilds instead of trusting a half-empty collection.
+        INGEST_MANIFEST_PATH.unlink(missing_ok=True)
+        BM25_INDEX_PATH.unlink(missing_ok=True)
+    store = _open_store(use_persist, _ingest_embeddings(embeddings))
+    # Full rebuild: drop whatever the previous ingest left so no stale chunks survive.
+    store.delete_collection()
+    store = _open_store(use_persist, store.embeddings)
+    stats = _new_stats("full")
+    manifest_files: dict = {}
+    bm25 = BM25Index()
+
+    def pairs():
+        for fc in iter_file_chunks(files, path, chunk_size, chunk_overlap, workers):
+            if fc.error:
+                _report_failure(stats, fc)
+                continue
+            manifest_files[fc.source] = _manifest_entry(fc.digest, fc.chunks, fc.ids)
+            stats["files_changed"] += 1
+            for cid, chunk in zip(fc.ids, fc.chunks):
+                bm25.add(cid, chunk.page_content)
+            yield from zip(fc.ids, fc.chunks)
+
+    executor = _executor(store, batch_size, max_in_flight, tokens_per_minute)
+    stats["chunks_added"] = _add_in_batches(store, pairs(), executor)
+    stats.update(executor.stats())
+    if not stats["chunks_added"]:
+        raise ValueError(f"No chunks could be loaded from {path}")
+    if use_persist:
+        save_manifest({"settings": _manifest_settings(chunk_size, chunk_overlap), "files": manifest_files})
+        bm25.save(BM25_INDEX_PATH)
+    return _finish_ingest(store, use_persist, embeddings, stats)
+
+
 def build_vector_store(
     docs_path: Path | None = None,
     chunk_size: int = 800,
     chunk_overlap: int = 100,
     use_persist: bool = True,
+    workers: int | None = None,
 ):
-    """Load docs, chunk, embed, and return a Chroma vector store."""
+    """Load docs, chunk, embed, and return a Chroma vector store (full rebuild)."""
+    store, _ = ingest_full(docs_path, chunk_size, chunk_overlap, use_persist, workers)
+    return store
+
+
+def ingest_incremental(
+    docs_path: Path | None = None,
+    chunk_size: int = 800,
+    chunk_overlap: int = 100,
+    workers: int | None = None,
+    batch_size: int = INGEST_BATCH_SIZE,
+    max_in_flight: int = EMBEDDING_MAX_IN_FLIGHT,
+    tokens_per_minute: int = EMBEDDING_TOKENS_PER_MINUTE,
+    embeddings: Embeddings | None = None,
+) -> tuple[Chroma, dict]:
+    """
+    Sync the persisted Chroma store with docs_path using the ingest manifest.
+    Unchanged files are skipped by file hash; in changed files only chunks with new
+    hashes are embedded; chunks of edited or removed files that no longer exist are deleted.
+    A changed file that fails to load keeps its previous chunks and manifest entry.
+    Returns (store, stats) where stats counts the files and chunks touched.
+    """
     path = docs_path or DOCS_DIR
-    raw_docs = load_docs_from_directory(path)
-    if not raw_docs:
-        raise ValueError(f"No .txt or .pdf files found under {path}")
+    manifest = load_manifest()
+    settings = _manifest_settings(chunk_size, chunk_overlap)
+    if manifest is None or manifest.get("settings") != settings or not CHROMA_PERSIST_DIR.exists():
+        return ingest_full(
+            path,
+            chunk_size,
+            chunk_overlap,
+            use_persist=True,
+            workers=workers,
+            batch_size=batch_size,
+            max_in_flight=max_in_flight,
+            tokens_per_minute=tokens_per_minute,
+            embeddings=embeddings,
+        )
 
-    splitter = RecursiveCharacterTextSplitter(
-        chunk_size=chunk_size,
-        chunk_overlap=chunk_overlap,
-        length_function=len,
-    )
-    chunks = splitter.split_documents(raw_docs)
+    store = _open_store(True, _ingest_embeddings(embeddings))
+    old_files: dict = manifest.get("files", {})
+    new_files: dict = {}
+    to_delete: list[str] = []
+    stats = _new_stats("incremental")
+    bm25 = BM25Index.load(BM25_INDEX_PATH) or build_bm25_index(store)
 
-    embeddings = get_embeddings()
-    persist_dir = str(CHROMA_PERSIST_DIR) if use_persist else None
-    if persist_dir:
-        CHROMA_PERSIST_DIR.mkdir(parents=True, exist_ok=True)
+    changed, digests = [], {}
+    for f in iter_doc_files(path):
+        rel = f.relative_to(path).as_posix()
+        digest = file_hash(f)
+        previous = old_files.get(rel)
+        if previous and previous["hash"] == digest:
+            new_files[rel] = previous
+        else:
+            changed.append(f)
+            digests[f] = digest
 
-    return Chroma.from_documents(
-        documents=chunks,
-        embedding=embeddings,
-        persist_directory=persist_dir,
-        collection_name="rag_docs",
-    )
+    def pairs():
+        for fc in iter_file_chunks(changed, path, chunk_size, chunk_overlap, workers, digests):
+            previous = old_files.get(fc.source)
+            if fc.error:
+                _report_failure(stats, fc)
+                if previous:
+                    new_files[fc.source] = previous
+                continue
+            old_ids = set(previous["chunks"]) if previous else set()
+            to_delete.extend(sorted(old_ids - set(fc.ids)))
+            new_files[fc.source] = _manifest_entry(fc.digest, fc.chunks, fc.ids)
+            stats["files_changed"] += 1
+            for cid, chunk in zip(fc.ids, fc.chunks):
+                if cid not in old_ids:
+                    bm25.add(cid, chunk.page_content)
+                    yield cid, chunk
+
+    executor = _executor(store, batch_size, max_in_flight, tokens_per_minute)
+    stats["chunks_added"] = _add_in_batches(store, pairs(), executor)
+    stats.update(executor.stats())
+
+    for rel in set(old_files) - set(new_files):
+        to_delete.extend(old_files[rel]["chunks"])
+        stats["files_removed"] += 1
+
+    if to_delete:
+        store.delete(ids=to_delete)
+        bm25.remove(to_delete)
+    stats["chunks_deleted"] = len(to_delete)
+    save_manifest({"settings": settings, "files": new_files})
+    bm25.save(BM25_INDEX_PATH)
+    return _finish_ingest(store, True, embeddings, stats)
 
 
 def load_existing_store():
@@ -85,12 +473,136 @@ def load_existing_store():
         return Chroma(
             persist_directory=str(CHROMA_PERSIST_DIR),
             embedding_function=get_embeddings(),
-            collection_name="rag_docs",
+            collection_name=COLLECTION_NAME,
         )
     except Exception:
         return None
 
 
+def build_bm25_index(store) -> BM25Index:
+    """BM25 index over every chunk already in store (used when no saved index exists)."""
+    index = BM25Index()
+    if isinstance(store, NumpyVectorStore):
+        for cid, text in store.chunks.iter_chunks():
+            index.add(cid, text)
+        return index
+    for offset in range(0, store._collection.count(), 5000):
+        page = store._collection.get(include=["documents"], limit=5000, offset=offset)
+        for cid, text in zip(page["ids"], page["documents"]):
+            index.add(cid, text or "")
+    return index
+
+
 def get_retriever(store, k: int = 4):
-    """Return a retriever that yields top-k chunks."""
+    """Return a retriever that yields top-k chunks: dense, or BM25 + dense with RETRIEVAL_MODE=hybrid."""
+    if RETRIEVAL_MODE == "hybrid":
+        index = BM25Index.load(BM25_INDEX_PATH)
+        if index is None:
+            logger.warning("No BM25 index at %s; building one in memory", BM25_INDEX_PATH)
+            index = build_bm25_index(store)
+        return HybridRetriever(store=store, index=index, k=k, fetch_k=max(k, HYBRID_FETCH_K), rrf_k=HYBRID_RRF_K)
     return store.as_retriever(search_kwargs={"k": k})
+
+
+def similarity_search_many(store, vectors: List[List[float]], k: int = 4, **kwargs) -> List[List[Document]]:
+    """Top-k documents for each query vector (Chunk handles from the NumPy store); one collection query on Chroma."""
+    if not vectors:
+        return []
+    if isinstance(store, NumpyVectorStore):
+        return [[store.chunks.chunk(row) for row, _ in hits] for hits in store.search_many(vectors, k)]
+    if not isinstance(store, Chroma):
+        return [store.similarity_search_by_vector(v, k=k, **kwargs) for v in vectors]
+    res = store._collection.query(
+        query_embeddings=vectors,
+        n_results=k,
+        where=kwargs.get("filter"),
+        include=["documents", "metadatas"],
+    )
+    return [
+        [Document(page_content=text, metadata=meta or {}, id=doc_id) for doc_id, text, meta in zip(ids, texts, metas)]
+        for ids, texts, metas in zip(res["ids"], res["documents"], res["metadatas"])
+    ]
+
+
+def chunks_by_ids(store, ids: List[str]) -> List[Document]:
+    """
+    Stored chunks for ids, in the order given (IDs not in the store are skipped): Chunk
+    handles from the NumPy store, Documents read straight from the collection on Chroma,
+    whose LangChain wrapper does not implement get_by_ids.
+    """
+    if not ids:
+        return []
+    if isinstance(store, NumpyVectorStore) or not isinstance(store, Chroma):
+        return list(store.get_by_ids(ids))
+    res = store._collection.get(ids=list(ids), include=["documents", "metadatas"])
+    found = {
+        doc_id: Document(page_content=text or "", metadata=meta or {}, id=doc_id)
+        for doc_id, text, meta in zip(res["ids"], res["documents"], res["metadatas"])
+    }
+    return [found[doc_id] for doc_id in ids if doc_id in found]
+
+
+def retrieve_many(retriever, store, questions: List[str], vectors: List[List[float]], k: int = 4) -> List[List[Document]]:
+    """Chunks for many already-embedded questions, honouring a hybrid retriever's BM25 fusion."""
+    if isinstance(retriever, HybridRetriever):
+        dense = similarity_search_many(store, vectors, k=retriever.fetch_k)
+        return [retriever.fuse(q, docs) for q, docs in zip(questions, dense)]
+    return similarity_search_many(store, vectors, k=k)
+
+
+def _index_stamp(kind: str, nlist: int) -> str | None:
+    """Identifies the ingest state an index was exported from; None if there is no manifest."""
+    if not INGEST_MANIFEST_PATH.exists():
+        return None
+    digest = _sha256(INGEST_MANIFEST_PATH.read_bytes())
+    return f"{digest}:{kind}:{nlist}"
+
+
+def _collection_pages(store: Chroma, page_size: int = 5000):
+    for offset in range(0, store._collection.count(), page_size):
+        page = store._collection.get(
+            include=["embeddings", "documents", "metadatas"], limit=page_size, offset=offset
+        )
+        yield page["ids"], page["embeddings"], page["documents"], page["metadatas"]
+
+
+def _export_numpy_index(store: Chroma, path: Path, kind: str, nlist: int) -> int:
+    count = store._collection.count()
+    if not count:
+        raise ValueError("Chroma collection is empty; run ingest first")
+    space = (store._collection.metadata or {}).get("hnsw:space", "l2")  # rank exactly as Chroma does
+    write_index(path, _collection_pages(store), count, _index_stamp(kind, nlist) or "", kind, nlist, space)
+    return count
+
+
+def build_numpy_index(
+    store: Chroma,
+    path: Path | None = None,
+    kind: str = RETRIEVER_INDEX,
+    nlist: int = RETRIEVER_IVF_NLIST,
+) -> int:
+    """Export the Chroma collection (vectors, texts, metadata) to a NumPy index; returns rows written."""
+    path = path or VECTOR_INDEX_DIR
+    with index_lock(path):
+        return _export_numpy_index(store, path, kind, nlist)
+
+
+def open_search_store(store):
+    """
+    The store to query: the Chroma store itself, or with RETRIEVER_BACKEND=numpy its
+    memory-mapped export, re-exported first when the ingest manifest has changed since.
+    Only one process exports at a time; workers that waited for it open its result.
+    """
+    if RETRIEVER_BACKEND != "numpy" or not isinstance(store, Chroma):
+        return store
+    stamp = _index_stamp(RETRIEVER_INDEX, RETRIEVER_IVF_NLIST)
+    if stamp is None:
+        logger.warning("RETRIEVER_BACKEND=numpy needs a persisted ingest; using Chroma")
+        return store
+    meta = read_meta(VECTOR_INDEX_DIR)
+    if meta is None or meta.get("stamp") != stamp:
+        with index_lock(VECTOR_INDEX_DIR):
+            meta = read_meta(VECTOR_INDEX_DIR)  # another worker may have exported it while we waited
+            if meta is None or meta.get("stamp") != stamp:
+                _export_numpy_index(store, VECTOR_INDEX_DIR, RETRIEVER_INDEX, RETRIEVER_IVF_NLIST)
+    return NumpyVectorStore.load(VECTOR_INDEX_DIR, store.embeddings, nprobe=RETRIEVER_IVF_NPROBE)
@@ -0,0 +1,395 @@
+"""
+Latency-aware routing of chat calls across several deployments / endpoints
+(AZURE_OPENAI_CHAT_TARGETS), so one deployment's slow tail is not the app's p99.
+ChatRouter is itself a chat model and drops into the graph in place of AzureChatOpenAI.
+
+Each target keeps a rolling window (CHAT_ROUTER_WINDOW_SECONDS, at most
+CHAT_ROUTER_WINDOW_SIZE calls) of response latency, meaning time until it answered (the
+whole reply, or the first chunk when streaming), plus errors. A call goes to the healthy
+target with the lowest median. A target with no recent samples is probed by one call at a
+time, which is also how a target that recovered gets traffic back. A target whose recent
+error rate reaches CHAT_ROUTER_MAX_ERROR_RATE, or that fails three times in a row, sits out
+CHAT_ROUTER_COOLDOWN_SECONDS. A failed call moves on to the next target.
+
+With CHAT_HEDGE_ENABLED, if the first target has not answered within its own
+CHAT_HEDGE_PERCENTILE latency, the same request also goes to the next-best target (or the
+same one, if it is the only one), and the first answer wins. The other call is cancelled on
+the async path; on the sync path it is left to finish and its answer is discarded. The
+target that answered, and whether a hedge was sent, ride on response_metadata["router"] and
+end up in runs.jsonl.
+"""
+
+import asyncio
+import json
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any, AsyncIterator, Callable
+from urllib.parse import urlparse
+
+from langchain_core.callbacks import AsyncCallbackManagerForLLMRun, CallbackManagerForLLMRun
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from pydantic import ConfigDict, PrivateAttr
+
+from .clients import chat_model
+from .config import (
+    AZURE_OPENAI_CHAT_TARGETS,
+    AZURE_OPENAI_DEPLOYMENT_CHAT,
+    AZURE_OPENAI_ENDPOINT,
+    CHAT_HEDGE_DELAY_SECONDS,
+    CHAT_HEDGE_ENABLED,
+    CHAT_HEDGE_PERCENTILE,
+    CHAT_ROUTER_COOLDOWN_SECONDS,
+    CHAT_ROUTER_MAX_ERROR_RATE,
+    CHAT_ROUTER_WINDOW_SECONDS,
+    CHAT_ROUTER_WINDOW_SIZE,
+)
+from .metrics import CHAT_HEDGES_TOTAL, CHAT_TARGET_CALLS_TOTAL, CHAT_TARGET_LATENCY_SECONDS
+
+# Inner calls run without callbacks: the router's own run carries tracing and streamed tokens,
+# so a hedged pair never streams two answers into the same response.
+_NO_CALLBACKS = {"callbacks": []}
+_MIN_HEDGE_SAMPLES = 5  # below this the percentile is noise; CHAT_HEDGE_DELAY_SECONDS is used
+
+
+class ChatTarget:
+    """One chat deployment on one endpoint, with its rolling latency / error window."""
+
+    def __init__(
+        self,
+        name: str,
+        model: BaseChatModel,
+        deployment: str = AZURE_OPENAI_DEPLOYMENT_CHAT,
+        window_seconds: float = CHAT_ROUTER_WINDOW_SECONDS,
+        window_size: int = CHAT_ROUTER_WINDOW_SIZE,
+        max_error_rate: float = CHAT_ROUTER_MAX_ERROR_RATE,
+        cooldown_seconds: float = CHAT_ROUTER_COOLDOWN_SECONDS,
+    ):
+        self.name = name
+        self.model = model
+        self.deployment = deployment
+        self.window_seconds = window_seconds
+        self.max_error_rate = max_error_rate
+        self.cooldown_seconds = cooldown_seconds
+        self.in_flight = 0
+        self._consecutive_errors = 0
+        self._samples: deque[tuple[float, float, bool]] = deque(maxlen=max(1, window_size))  # (at, seconds, ok)
+        self._down_until = 0.0
+        self._lock = threading.Lock()
+
+    def _recent(self) -> list[tuple[float, float, bool]]:
+        cutoff = time.monotonic() - self.window_seconds
+        with self._lock:
+            while self._samples and self._samples[0][0] < cutoff:
+                self._samples.popleft()
+            return list(self._samples)
+
+    def started(self):
+        with self._lock:
+            self.in_flight += 1
+
+    def finished(self, seconds: float | None, ok: bool):
+        """End of a call; seconds None means it was cancelled (lost a hedge) and is not a sample."""
+        with self._lock:
+            self.in_flight -= 1
+            if seconds is None:
+                return
+            self._samples.append((time.monotonic(), seconds, ok))
+            self._consecutive_errors = 0 if ok else self._consecutive_errors + 1
+            streak = self._consecutive_errors
+        CHAT_TARGET_CALLS_TOTAL.inc(target=self.name, outcome="ok" if ok else "error")
+        if ok:
+            CHAT_TARGET_LATENCY_SECONDS.observe(seconds, target=self.name)
+            return
+        samples = self._recent()
+        errors = sum(1 for _, _, good in samples if not good)
+        # Down on a high error rate over the window, or on a run of failures after a good history.
+        if streak >= 3 or (len(samples) >= 3 and errors / len(samples) >= self.max_error_rate):
+            self._down_until = time.monotonic() + self.cooldown_seconds
+
+    def latency(self, percentile: float = 50.0, min_samples: int = 1) -> float | None:
+        """Percentile of recent successful latencies, or None with fewer than min_samples."""
+        ok = sorted(seconds for _, seconds, good in self._recent() if good)
+        if len(ok) < max(1, min_samples):
+            return None
+        return ok[min(len(ok) - 1, int(percentile / 100.0 * len(ok)))]
+
+    @property
+    def healthy(self) -> bool:
+        return time.monotonic() >= self._down_until
+
+    def stats(self) -> dict:
+        samples = self._recent()
+        return {
+            "name": self.name,
+            "deployment": self.deployment,
+            "healthy": self.healthy,
+            "calls": len(samples),
+            "errors": sum(1 for _, _, good in samples if not good),
+            "in_flight": self.in_flight,
+            "p50": self.latency(50),
+            "p95": self.latency(95),
+        }
+
+
+class ChatRouter(BaseChatModel):
+    """Chat model that routes (and optionally hedges) each call across targets; see module docstring."""
+
+    targets: list[Any]
+    hedge: bool = CHAT_HEDGE_ENABLED
+    hedge_percentile: float = CHAT_HEDGE_PERCENTILE
+    hedge_delay: float = CHAT_HEDGE_DELAY_SECONDS
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    _pool: ThreadPoolExecutor | None = PrivateAttr(default=None)
+    _pool_lock: Any = PrivateAttr(default_factory=threading.Lock)
+
+    @property
+    def _llm_type(self) -> str:
+        return "chat-router"
+
+    @property
+    def _identifying_params(self) -> dict:
+        return {"targets": [t.name for t in self.targets], "hedge": self.hedge}
+
+    # --- target choice ---------------------------------------------------------------
+
+    def ranked(self) -> list[ChatTarget]:
+        """Targets best first: healthy before unhealthy, then by median latency."""
+
+        def key(t: ChatTarget):
+            p50 = t.latency(50)
+            if p50 is None:
+                p50 = 0.0 if t.in_flight == 0 else float("inf")  # probe an unmeasured target one call at a time
+            return (not t.healthy, p50)
+
+        return sorted(self.targets, key=key)
+
+    def _plan(self) -> tuple[ChatTarget, ChatTarget | None, float | None]:
+        """(first target, backup, seconds to wait before hedging to the backup; None = only on failure)."""
+        order = self.ranked()
+        first = order[0]
+        backup = order[1] if len(order) > 1 else (first if self.hedge else None)
+        if not self.hedge or backup is None:
+            return first, backup, None
+        delay = first.latency(self.hedge_percentile, _MIN_HEDGE_SAMPLES)
+        return first, backup, max(0.0, delay if delay is not None else self.hedge_delay)
+
+    @staticmethod
+    def _tag(message: BaseMessage, target: ChatTarget, hedged: bool) -> BaseMessage:
+        message.response_metadata["router"] = {"target": target.name, "deployment": target.deployment, "hedged": hedged}
+        return message
+
+    # --- sync ------------------------------------------------------------------------
+
+    def _executor(self) -> ThreadPoolExecutor:
+        with self._pool_lock:
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(max_workers=32, thread_name_prefix="chat-hedge")
+            return self._pool
+
+    @staticmethod
+    def _call(target: ChatTarget, messages: list[BaseMessage], kwargs: dict) -> BaseMessage:
+        target.started()
+        t0 = time.perf_counter()
+        try:
+            message = target.model.invoke(messages, config=_NO_CALLBACKS, **kwargs)
+        except Exception:
+            target.finished(time.perf_counter() - t0, ok=False)
+            raise
+        target.finished(time.perf_counter() - t0, ok=True)
+        return message
+
+    def _generate(
+        self,
+        messages: list[BaseMessage],
+        stop: list[str] | None = None,
+        run_manager: CallbackManagerForLLMRun | None = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        kwargs = {**kwargs, "stop": stop} if stop else kwargs
+        first, backup, delay = self._plan()
+        if delay is None:
+            try:
+                message, target = self._call(first, messages, kwargs), first
+            except Exception:
+                if backup is None:
+                    raise
+                message, target = self._call(backup, messages, kwargs), backup
+            return ChatResult(generations=[ChatGeneration(message=self._tag(message, target, False))])
+
+        pool = self._executor()
+        primary = pool.submit(self._call, first, messages, kwargs)
+        futures: dict[Future, ChatTarget] = {primary: first}
+        done, _ = wait(futures, timeout=delay)
+        hedged = not done
+        if hedged or next(iter(done)).exception() is not None:
+            futures[pool.submit(self._call, backup, messages, kwargs)] = backup
+        error: BaseException | None = None
+        pending = set(futures)
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for f in done:
+                if f.exception() is None:
+                    if hedged:
+                        CHAT_HEDGES_TOTAL.inc(outcome="lost" if f is primary else "won")
+                    return ChatResult(generations=[ChatGeneration(message=self._tag(f.result(), futures[f], hedged))])
+                error = f.exception()
+        raise error
+
+    # --- async -----------------------------------------------------------------------
+
+    async def _race(self, call: Callable[[ChatTarget], Any]) -> tuple[Any, ChatTarget, bool]:
+        """Run call(first), hedging / failing over to the backup per _plan; (result, target, hedged)."""
+        first, backup, delay = self._plan()
+        primary = asyncio.ensure_future(call(first))
+        tasks: dict[asyncio.Task, ChatTarget] = {primary: first}
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=delay)
+            hedged = not done
+            failed = bool(done) and next(iter(done)).exception() is not None
+            if (hedged or failed) and backup is not None:
+                tasks[asyncio.ensure_future(call(backup))] = backup
+            error: BaseException | None = None
+            pending = {t for t in tasks if not t.done() or t.exception() is None}
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for t in done:
+                    if t.exception() is None:
+                        if hedged:
+                            CHAT_HEDGES_TOTAL.inc(outcome="lost" if t is primary else "won")
+                        await self._discard(t, done)
+                        return t.result(), tasks[t], hedged
+                    error = t.exception()
+            raise error if error is not None else primary.exception()
+        finally:
+            for t in tasks:
+                if not t.done():
+                    t.cancel()
+
+    @staticmethod
+    async def _discard(winner: asyncio.Task, done: set):
+        """Close an opened stream that finished in the same instant as the winner."""
+        for t in done:
+            if t is not winner and t.exception() is None and isinstance(t.result(), tuple):
+                await t.result()[0].aclose()
+
+    async def _agenerate(
+        self,
+        messages: list[BaseMessage],
+        stop: list[str] | None = None,
+        run_manager: AsyncCallbackManagerForLLMRun | None = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        kwargs = {**kwargs, "stop": stop} if stop else kwargs
+
+        async def call(target: ChatTarget) -> BaseMessage:
+            target.started()
+            t0 = time.perf_counter()
+            try:
+                message = await target.model.ainvoke(messages, config=_NO_CALLBACKS, **kwargs)
+            except asyncio.CancelledError:
+                target.finished(None, ok=False)
+                raise
+            except Exception:
+                target.finished(time.perf_counter() - t0, ok=False)
+                raise
+            target.finished(time.perf_counter() - t0, ok=True)
+            return message
+
+        message, target, hedged = await self._race(call)
+        return ChatResult(generations=[ChatGeneration(message=self._tag(message, target, hedged))])
+
+    async def _astream(
+        self,
+        messages: list[BaseMessage],
+        stop: list[str] | None = None,
+        run_manager: AsyncCallbackManagerForLLMRun | None = None,
+        **kwargs: Any,
+    ) -> AsyncIterator[ChatGenerationChunk]:
+        kwargs = {**kwargs, "stop": stop} if stop else kwargs
+
+        async def open_stream(target: ChatTarget):
+            # The race is to the first chunk; the winner's stream is then read to the end.
+            target.started()
+            t0 = time.perf_counter()
+            stream = target.model.astream(messages, config=_NO_CALLBACKS, **kwargs)
+            try:
+                chunk = await stream.__anext__()
+            except asyncio.CancelledError:
+                target.finished(None, ok=False)
+                raise
+            except Exception:
+                target.finished(time.perf_counter() - t0, ok=False)
+                raise
+            target.finished(time.perf_counter() - t0, ok=True)
+            return stream, chunk
+
+        (stream, chunk), target, hedged = await self._race(open_stream)
+        self._tag(chunk, target, hedged)
+        try:
+            while True:
+                gen = ChatGenerationChunk(message=chunk)
+                if run_manager is not None:
+                    await run_manager.on_llm_new_token(chunk.content, chunk=gen)
+                yield gen
+                try:
+                    chunk = await stream.__anext__()
+                except StopAsyncIteration:
+                    return
+        finally:
+            await stream.aclose()
+
+    def stats(self) -> list[dict]:
+        return [t.stats() for t in self.targets]
+
+
+def parse_targets(spec: str) -> list[dict]:
+    """
+    AZURE_OPENAI_CHAT_TARGETS: a JSON list whose items are a deployment name or
+    {"deployment", "endpoint", "api_key", "name"} (endpoint and key default to the main ones).
+    """
+    if not spec:
+        return []
+    items = json.loads(spec)
+    if not isinstance(items, list):
+        raise ValueError("AZURE_OPENAI_CHAT_TARGETS must be a JSON list")
+    targets = []
+    for item in items:
+        item = {"deployment": item} if isinstance(item, str) else dict(item)
+        item.setdefault("deployment", AZURE_OPENAI_DEPLOYMENT_CHAT)
+        if not item.get("name"):
+            endpoint = item.get("endpoint")
+            host = urlparse(endpoint).netloc if endpoint and endpoint != AZURE_OPENAI_ENDPOINT else ""
+            item["name"] = f"{item['deployment']}@{host}" if host else item["deployment"]
+        targets.append(item)
+    names = [t["name"] for t in targets]
+    if len(set(names)) != len(names):
+        raise ValueError(f"Duplicate chat target names: {names}; set a distinct name per target")
+    return targets
+
+
+def build_router(targets: list[dict], hedge: bool = CHAT_HEDGE_ENABLED, **model_kwargs) -> ChatRouter:
+    """ChatRouter over target dicts (as from parse_targets); model_kwargs go to each AzureChatOpenAI."""
+    return ChatRouter(
+        targets=[
+            ChatTarget(
+                t["name"],
+                chat_model(t["deployment"], endpoint=t.get("endpoint"), api_key=t.get("api_key"), **model_kwargs),
+                deployment=t["deployment"],
+            )
+            for t in targets
+        ],
+        hedge=hedge,
+    )
+
+
+def chat_llm(**model_kwargs) -> BaseChatModel:
+    """The graph's chat model: a ChatRouter when targets or hedging are configured, else one AzureChatOpenAI."""
+    targets = parse_targets(AZURE_OPENAI_CHAT_TARGETS)
+    if not targets and not CHAT_HEDGE_ENABLED:
+        return chat_model(**model_kwargs)
+    return build_router(targets or [{"name": AZURE_OPENAI_DEPLOYMENT_CHAT, "deployment": AZURE_OPENAI_DEPLOYMENT_CHAT}], **model_kwargs)
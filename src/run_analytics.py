@@ -0,0 +1,265 @@
+"""
+Analytics over data/runs.jsonl for comparing prompt versions.
+Streams the log in one pass into per-(prompt_version, time window) aggregates: run count,
+latency histogram (log-spaced buckets, ~1% error on p50/p95/p99), token and cost totals, cache hits,
+coalesced runs and chunk-ID frequency. Aggregates and the byte offset reached are saved in an index file,
+so the next call reads only lines appended since; rotated runs-*.jsonl.gz segments are
+picked up once. Memory is bounded by the number of groups, not the number of lines.
+"""
+
+import gzip
+import hashlib
+import json
+import math
+from collections import Counter
+from pathlib import Path
+
+# Latency histogram: bucket i covers [GROWTH**i, GROWTH**(i+1)) milliseconds.
+GROWTH = 1.02
+_LOG_GROWTH = math.log(GROWTH)
+INDEX_VERSION = 3
+_HEAD_BYTES = 4096
+
+
+class GroupStats:
+    """Mergeable aggregate for one (prompt_version, window) group."""
+
+    def __init__(self):
+        self.runs = 0
+        self.cache_hits = 0
+        self.coalesced = 0
+        self.latency_sum = 0.0
+        self.input_tokens = 0
+        self.output_tokens = 0
+        self.cost_usd = 0.0
+        self.buckets: Counter = Counter()
+        self.chunks: Counter = Counter()
+
+    def add(self, rec: dict):
+        self.runs += 1
+        self.cache_hits += 1 if rec.get("cache_hit") else 0
+        self.coalesced += 1 if rec.get("coalesced") else 0
+        latency = float(rec.get("latency_seconds") or 0.0)
+        self.latency_sum += latency
+        self.buckets[_bucket(latency)] += 1
+        self.input_tokens += int(rec.get("input_tokens") or 0)
+        self.output_tokens += int(rec.get("output_tokens") or 0)
+        self.cost_usd += float(rec.get("cost_usd") or 0.0)
+        self.chunks.update(rec.get("chunk_ids") or ())
+
+    def merge(self, other: "GroupStats"):
+        self.runs += other.runs
+        self.cache_hits += other.cache_hits
+        self.coalesced += other.coalesced
+        self.latency_sum += other.latency_sum
+        self.input_tokens += other.input_tokens
+        self.output_tokens += other.output_tokens
+        self.cost_usd += other.cost_usd
+        self.buckets.update(other.buckets)
+        self.chunks.update(other.chunks)
+
+    def percentile(self, p: float) -> float:
+        """Approximate latency percentile in seconds (bucket midpoint)."""
+        if not self.runs:
+            return 0.0
+        rank = max(1, math.ceil(p / 100 * self.runs))
+        seen = 0
+        for b in sorted(self.buckets):
+            seen += self.buckets[b]
+            if seen >= rank:
+                return _bucket_value(b)
+        return _bucket_value(max(self.buckets))
+
+    def summary(self, top_chunks: int = 5) -> dict:
+        return {
+            "runs": self.runs,
+            "cache_hits": self.cache_hits,
+            "coalesced": self.coalesced,
+            "latency_mean": round(self.latency_sum / self.runs, 3) if self.runs else 0.0,
+            "latency_p50": round(self.percentile(50), 3),
+            "latency_p95": round(self.percentile(95), 3),
+            "latency_p99": round(self.percentile(99), 3),
+            "input_tokens": self.input_tokens,
+            "output_tokens": self.output_tokens,
+            "cost_usd": round(self.cost_usd, 4),
+            "top_chunks": self.chunks.most_common(top_chunks),
+        }
+
+    def to_json(self) -> dict:
+        return {
+            "runs": self.runs,
+            "cache_hits": self.cache_hits,
+            "coalesced": self.coalesced,
+            "latency_sum": self.latency_sum,
+            "input_tokens": self.input_tokens,
+            "output_tokens": self.output_tokens,
+            "cost_usd": self.cost_usd,
+            "buckets": {str(k): v for k, v in self.buckets.items()},
+            "chunks": dict(self.chunks),
+        }
+
+    @classmethod
+    def from_json(cls, data: dict) -> "GroupStats":
+        g = cls()
+        g.runs = data["runs"]
+        g.cache_hits = data["cache_hits"]
+        g.coalesced = data["coalesced"]
+        g.latency_sum = data["latency_sum"]
+        g.input_tokens = data["input_tokens"]
+        g.output_tokens = data["output_tokens"]
+        g.cost_usd = data["cost_usd"]
+        g.buckets = Counter({int(k): v for k, v in data["buckets"].items()})
+        g.chunks = Counter(data["chunks"])
+        return g
+
+
+def _bucket(latency_seconds: float) -> int:
+    ms = latency_seconds * 1000.0
+    if ms < 1.0:
+        return -1  # everything under 1 ms shares one bucket
+    return int(math.log(ms) / _LOG_GROWTH)
+
+
+def _bucket_value(b: int) -> float:
+    if b < 0:
+        return 0.0005
+    return GROWTH ** (b + 0.5) / 1000.0
+
+
+def _window_start(ts, window_seconds: int):
+    if ts is None:
+        return None
+    if not window_seconds:
+        return 0
+    return int(ts // window_seconds * window_seconds)
+
+
+def _group_key(rec: dict, window_seconds: int) -> str:
+    # JSON object keys must be strings; "\t" cannot appear in a version name from PROMPT_VERSION.
+    return f"{rec.get('prompt_version', '')}\t{_window_start(rec.get('ts'), window_seconds)}"
+
+
+def _head_signature(path: Path, length: int, opener=open) -> str:
+    """Hash of the first `length` bytes; identifies a log file across appends and rotation."""
+    with opener(path, "rb") as f:
+        return hashlib.sha256(f.read(length)).hexdigest()
+
+
+def _same_file(path: Path, active: dict | None, opener=open) -> bool:
+    return bool(active) and _head_signature(path, active["head_len"], opener) == active["head"]
+
+
+def _consume(f, groups: dict, window_seconds: int) -> int:
+    """Fold complete lines from f into groups; returns bytes consumed (excludes a torn tail)."""
+    consumed = 0
+    for raw in f:
+        if not raw.endswith(b"\n"):
+            break  # writer is mid-batch; pick it up next time
+        consumed += len(raw)
+        try:
+            rec = json.loads(raw)
+        except ValueError:
+            continue
+        key = _group_key(rec, window_seconds)
+        g = groups.get(key)
+        if g is None:
+            g = groups[key] = GroupStats()
+        g.add(rec)
+    return consumed
+
+
+def _index_path(log_path: Path) -> Path:
+    return log_path.with_name(log_path.name + ".index.json")
+
+
+def _empty_index(window_seconds: int) -> dict:
+    return {"version": INDEX_VERSION, "window_seconds": window_seconds, "segments": [], "active": None, "groups": {}}
+
+
+def _load_index(log_path: Path, window_seconds: int) -> dict:
+    empty = _empty_index(window_seconds)
+    path = _index_path(log_path)
+    if not path.exists():
+        return empty
+    try:
+        with open(path) as f:
+            index = json.load(f)
+    except (OSError, ValueError):
+        return empty
+    if index.get("version") != INDEX_VERSION or index.get("window_seconds") != window_seconds:
+        return empty
+    return index
+
+
+def _save_index(log_path: Path, index: dict):
+    path = _index_path(log_path)
+    tmp = path.with_suffix(".tmp")
+    with open(tmp, "w") as f:
+        json.dump(index, f)
+    tmp.replace(path)
+
+
+def _segments(log_path: Path) -> list[Path]:
+    """Rotated segments written by RunLogWriter, oldest first (timestamped names sort in order)."""
+    return sorted(log_path.parent.glob(f"{log_path.stem}-*{log_path.suffix}.gz"))
+
+
+def update_index(log_path: Path, window_seconds: int = 0, rebuild: bool = False) -> dict[tuple[str, int | None], GroupStats]:
+    """
+    Bring the saved aggregates up to date with log_path (and its rotated segments) and return
+    them keyed by (prompt_version, window_start). window_seconds=0 groups by prompt version only.
+    """
+    index = _empty_index(window_seconds) if rebuild else _load_index(log_path, window_seconds)
+    groups = {k: GroupStats.from_json(v) for k, v in index["groups"].items()}
+    active = index.get("active")  # {"head", "head_len", "offset"} of the file last read as runs.jsonl
+    done_segments = set(index["segments"])
+
+    for seg in _segments(log_path):
+        if seg.name in done_segments:
+            continue
+        skip = 0
+        if _same_file(seg, active, gzip.open):
+            skip = active["offset"]  # this segment is the file we were reading; resume inside it
+            active = None
+        with gzip.open(seg, "rb") as f:
+            f.seek(skip)
+            _consume(f, groups, window_seconds)
+        done_segments.add(seg.name)
+
+    if log_path.exists():
+        offset = active["offset"] if _same_file(log_path, active) else 0
+        with open(log_path, "rb") as f:
+            f.seek(offset)
+            offset += _consume(f, groups, window_seconds)
+        head_len = min(offset, _HEAD_BYTES)
+        active = {"head": _head_signature(log_path, head_len), "head_len": head_len, "offset": offset}
+
+    index.update(
+        segments=sorted(done_segments),
+        active=active,
+        groups={k: g.to_json() for k, g in groups.items()},
+    )
+    _save_index(log_path, index)
+    out = {}
+    for key, g in groups.items():
+        version, window = key.split("\t", 1)
+        out[(version, None if window == "None" else int(window))] = g
+    return out
+
+
+def summarize(
+    groups: dict[tuple[str, int | None], GroupStats],
+    by_window: bool = True,
+    top_chunks: int = 5,
+) -> list[dict]:
+    """Rows sorted by prompt version then window; by_window=False merges windows per version."""
+    merged: dict[tuple[str, int | None], GroupStats] = {}
+    for (version, window), g in groups.items():
+        key = (version, window if by_window else None)
+        if key not in merged:
+            merged[key] = GroupStats()
+        merged[key].merge(g)
+    rows = []
+    for (version, window), g in sorted(merged.items(), key=lambda kv: (kv[0][0], kv[0][1] or 0)):
+        rows.append({"prompt_version": version, "window_start": window, **g.summary(top_chunks)})
+    return rows
@@ -0,0 +1,136 @@
+"""
+Buffered run logger for data/runs.jsonl. Callers enqueue records without touching the
+file; a background thread writes them in batches (when batch_size records are queued or
+flush_seconds have passed) with a single write per batch, so lines never interleave.
+Optional size-based rotation renames the full file and gzips it in the writer thread.
+"""
+
+import atexit
+import gzip
+import json
+import queue
+import shutil
+import threading
+import time
+from pathlib import Path
+
+from .metrics import STAGE_SECONDS
+
+_STOP = object()
+
+
+class RunLogWriter:
+    """One writer per log file; RAGPipeline owns it and closes it on shutdown."""
+
+    def __init__(
+        self,
+        path: Path,
+        batch_size: int = 100,
+        flush_seconds: float = 1.0,
+        max_bytes: int = 0,
+    ):
+        self.path = path
+        self.batch_size = max(1, batch_size)
+        self.flush_seconds = flush_seconds
+        self.max_bytes = max_bytes
+        self.written = 0
+        self._queue: queue.Queue = queue.Queue()
+        self._closed = False
+        self._thread = threading.Thread(target=self._loop, name="run-log-writer", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def write(self, record: dict):
+        """Queue one record; never blocks on disk."""
+        if self._closed:
+            raise RuntimeError("RunLogWriter is closed")
+        self._queue.put(record)
+
+    def write_many(self, records: list[dict]):
+        """Queue several records as one item; they land in the same batched write."""
+        if self._closed:
+            raise RuntimeError("RunLogWriter is closed")
+        if records:
+            self._queue.put(list(records))
+
+    def flush(self, timeout: float | None = None):
+        """Block until everything queued so far is on disk; returns at once after close()."""
+        if self._closed:
+            return  # close() already wrote everything and the writer thread is gone
+        done = threading.Event()
+        self._queue.put(done)
+        done.wait(timeout)
+
+    def close(self):
+        """Flush remaining records and stop the writer thread (idempotent)."""
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(_STOP)
+        self._thread.join()
+        # A flush() that raced close() may have queued its marker behind _STOP; release it.
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if isinstance(item, threading.Event):
+                item.set()
+        atexit.unregister(self.close)
+
+    def _loop(self):
+        batch: list[dict] = []
+        waiters: list[threading.Event] = []
+        deadline = None
+        while True:
+            timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                item = None
+            stop = item is _STOP
+            if isinstance(item, threading.Event):
+                waiters.append(item)
+            elif isinstance(item, (dict, list)):
+                if isinstance(item, dict):
+                    batch.append(item)
+                else:
+                    batch.extend(item)
+                if deadline is None:
+                    deadline = time.monotonic() + self.flush_seconds
+            due = deadline is not None and time.monotonic() >= deadline
+            if batch and (stop or waiters or due or len(batch) >= self.batch_size):
+                self._write_batch(batch)
+                batch = []
+                deadline = None
+            for w in waiters:
+                w.set()
+            waiters = []
+            if stop:
+                return
+
+    def _write_batch(self, batch: list[dict]):
+        t0 = time.perf_counter()
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.path, "a") as f:
+                f.write("".join(json.dumps(r) + "\n" for r in batch))
+            self.written += len(batch)
+            if self.max_bytes and self.path.stat().st_size >= self.max_bytes:
+                self._rotate()
+        except OSError:
+            # Logging must never take down the request path; drop the batch.
+            pass
+        STAGE_SECONDS.observe(time.perf_counter() - t0, stage="log_flush")
+
+    def _rotate(self):
+        stamp = time.strftime("%Y%m%d-%H%M%S")
+        segment = self.path.with_name(f"{self.path.stem}-{stamp}{self.path.suffix}")
+        n = 1
+        while segment.exists() or Path(f"{segment}.gz").exists():
+            segment = self.path.with_name(f"{self.path.stem}-{stamp}-{n}{self.path.suffix}")
+            n += 1
+        self.path.rename(segment)
+        with open(segment, "rb") as src, gzip.open(f"{segment}.gz", "wb") as dst:
+            shutil.copyfileobj(src, dst)
+        segment.unlink()
@@ -0,0 +1,131 @@
+"""
+Answer scoring for the eval harness, over a whole dataset at once. Every metric maps
+(answers, expected) lists to a float32 score array: "exact" (normalized containment, the
+original check), "token_f1" (SQuAD-style token overlap) and "cosine" (embedding similarity).
+Cosine embeds the distinct answer and expected texts in bulk batches through
+EmbeddingExecutor (concurrent, retried) and the cached embeddings model, then scores every
+row with one NumPy product, so repeated scoring runs reuse vectors and 10k rows take seconds.
+Add a metric by putting a function of that shape in METRICS; each metric has its own
+pass threshold (DEFAULT_THRESHOLDS).
+"""
+
+import re
+import string
+from collections import Counter
+from typing import Callable, Iterable, Sequence
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from .config import EMBEDDING_MAX_IN_FLIGHT, EMBEDDING_MAX_RETRIES
+from .embed_executor import EmbeddingExecutor
+
+DEFAULT_THRESHOLDS = {"exact": 1.0, "token_f1": 0.5, "cosine": 0.85}
+
+_ARTICLES = re.compile(r"\b(a|an|the)\b")
+_PUNCT = str.maketrans("", "", string.punctuation)
+
+
+def normalize_answer(text: str) -> str:
+    """Lowercase, drop punctuation and articles, collapse whitespace."""
+    return " ".join(_ARTICLES.sub(" ", (text or "").lower().translate(_PUNCT)).split())
+
+
+def exact_match(got: str, expected: str) -> float:
+    """1.0 if either text contains the other (case-insensitive), else 0.0."""
+    got = (got or "").strip().lower()
+    expected = (expected or "").strip().lower()
+    return 1.0 if expected in got or got in expected else 0.0
+
+
+def token_f1(got: str, expected: str) -> float:
+    got_tokens = normalize_answer(got).split()
+    expected_tokens = normalize_answer(expected).split()
+    if not got_tokens or not expected_tokens:
+        return float(got_tokens == expected_tokens)
+    common = sum((Counter(got_tokens) & Counter(expected_tokens)).values())
+    if not common:
+        return 0.0
+    precision = common / len(got_tokens)
+    recall = common / len(expected_tokens)
+    return 2 * precision * recall / (precision + recall)
+
+
+def pairwise(fn: Callable[[str, str], float]) -> Callable:
+    """Lift a per-row scorer to the bulk metric signature."""
+
+    def metric(answers: Sequence[str], expected: Sequence[str], embeddings: Embeddings | None = None) -> np.ndarray:
+        return np.fromiter((fn(a, e) for a, e in zip(answers, expected)), dtype=np.float32, count=len(answers))
+
+    return metric
+
+
+def embed_texts(
+    texts: Sequence[str],
+    embeddings: Embeddings,
+    batch_size: int = 256,
+    max_in_flight: int = EMBEDDING_MAX_IN_FLIGHT,
+) -> np.ndarray:
+    """Unit-normalized float32 rows for texts; each distinct text is embedded once, in concurrent batches."""
+    unique = list(dict.fromkeys(t or " " for t in texts))
+    executor = EmbeddingExecutor(
+        embeddings, batch_size=batch_size, max_in_flight=max_in_flight, max_retries=EMBEDDING_MAX_RETRIES
+    )
+    matrix = None
+    batches = ((unique[i : i + batch_size], i) for i in range(0, len(unique), batch_size))
+    # Each batch goes straight into a float32 matrix, so only batch_size vectors exist as Python lists at once.
+    for vectors, _, start in executor.map(batches):
+        block = np.asarray(vectors, dtype=np.float32)
+        if matrix is None:
+            matrix = np.empty((len(unique), block.shape[1]), dtype=np.float32)
+        matrix[start : start + len(block)] = block
+    matrix /= np.maximum(np.linalg.norm(matrix, axis=1, keepdims=True), 1e-12)
+    row = {t: i for i, t in enumerate(unique)}
+    return matrix[[row[t or " "] for t in texts]]
+
+
+def cosine(answers: Sequence[str], expected: Sequence[str], embeddings: Embeddings | None = None) -> np.ndarray:
+    if embeddings is None:
+        raise ValueError("the cosine metric needs an embeddings model")
+    if not len(answers):
+        return np.zeros(0, dtype=np.float32)
+    vectors = embed_texts(list(answers) + list(expected), embeddings)
+    a, e = vectors[: len(answers)], vectors[len(answers) :]
+    return np.einsum("ij,ij->i", a, e)
+
+
+METRICS: dict[str, Callable] = {
+    "exact": pairwise(exact_match),
+    "token_f1": pairwise(token_f1),
+    "cosine": cosine,
+}
+
+
+def score_rows(
+    answers: Sequence[str],
+    expected: Sequence[str],
+    metrics: Iterable[str] = ("exact",),
+    embeddings: Embeddings | None = None,
+) -> dict[str, np.ndarray]:
+    """Scores per metric, each an array aligned with the rows."""
+    unknown = [m for m in metrics if m not in METRICS]
+    if unknown:
+        raise ValueError(f"Unknown metrics: {', '.join(unknown)} (available: {', '.join(METRICS)})")
+    return {m: METRICS[m](answers, expected, embeddings) for m in metrics}
+
+
+def summarize_scores(scores: dict[str, np.ndarray], thresholds: dict[str, float] | None = None) -> dict[str, dict]:
+    """Mean, pass count and pass rate per metric; a row passes when its score >= the metric's threshold."""
+    thresholds = {**DEFAULT_THRESHOLDS, **(thresholds or {})}
+    out = {}
+    for name, values in scores.items():
+        threshold = thresholds.get(name, 0.5)
+        passed = int(np.count_nonzero(values >= threshold))
+        out[name] = {
+            "mean": round(float(values.mean()), 4) if len(values) else 0.0,
+            "threshold": threshold,
+            "passed": passed,
+            "total": len(values),
+            "pass_rate": round(passed / len(values), 4) if len(values) else 0.0,
+        }
+    return out
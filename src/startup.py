@@ -0,0 +1,96 @@
+"""
+Cold-start control for the web server. PipelineHolder defers the heavy imports
+(LangChain, LangGraph, Chroma, OpenAI via src.pipeline) until the pipeline is first needed,
+builds it exactly once even under concurrent first requests, and can warm it in a
+background thread at startup. Phase timings (imports, pipeline build, tokenizer load)
+are kept for /ready and exported as the rag_startup_seconds gauge.
+"""
+
+import logging
+import threading
+import time
+
+from .metrics import STARTUP_SECONDS
+
+logger = logging.getLogger(__name__)
+
+
+class PipelineHolder:
+    """Thread-safe lazy RAGPipeline: state goes idle -> warming -> ready (or failed, retried on next get)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pipeline = None
+        self._thread: threading.Thread | None = None
+        self.state = "idle"
+        self.error: str | None = None
+        self.timings: dict[str, float] = {}
+
+    @property
+    def ready(self) -> bool:
+        return self._pipeline is not None
+
+    def peek(self):
+        """The pipeline if it is built, else None; never blocks or builds."""
+        return self._pipeline
+
+    def record(self, name: str, seconds: float):
+        """Store one startup phase duration (also exported as rag_startup_seconds{phase=name})."""
+        self.timings[name] = round(seconds, 3)
+        STARTUP_SECONDS.set(seconds, phase=name)
+
+    def get(self):
+        """Return the pipeline, building it on first use; concurrent callers wait for one build."""
+        if self._pipeline is not None:
+            return self._pipeline
+        with self._lock:
+            if self._pipeline is not None:
+                return self._pipeline
+            self.state = "warming"
+            t0 = time.perf_counter()
+            try:
+                t = time.perf_counter()
+                from .pipeline import get_pipeline
+
+                self.record("import_pipeline", time.perf_counter() - t)
+                t = time.perf_counter()
+                pipeline = get_pipeline()
+                self.record("build_pipeline", time.perf_counter() - t)
+                t = time.perf_counter()
+                from .usage import count_tokens
+
+                count_tokens("warm up")  # loads the tokenizer so the first request does not
+                self.record("load_tokenizer", time.perf_counter() - t)
+            except Exception as e:
+                self.state = "failed"
+                self.error = f"{type(e).__name__}: {e}"
+                logger.exception("Pipeline startup failed")
+                raise
+            self.record("total", time.perf_counter() - t0)
+            self._pipeline = pipeline
+            self.state = "ready"
+            self.error = None
+            logger.info("Pipeline ready in %.2fs %s", self.timings["total"], self.timings)
+            return pipeline
+
+    def warm_in_background(self) -> threading.Thread:
+        """Start building the pipeline in a daemon thread (no-op if already built or warming)."""
+        with self._lock:
+            if self._pipeline is not None or (self._thread is not None and self._thread.is_alive()):
+                return self._thread
+            self._thread = threading.Thread(target=self._warm, name="pipeline-warmup", daemon=True)
+            self._thread.start()
+            return self._thread
+
+    def _warm(self):
+        try:
+            self.get()
+        except Exception:
+            pass  # recorded in state/error; the next request retries
+
+    def status(self) -> dict:
+        return {"status": self.state, "error": self.error, "startup_seconds": dict(self.timings)}
+
+    def close(self):
+        if self._pipeline is not None:
+            self._pipeline.close()
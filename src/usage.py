@@ -0,0 +1,105 @@
+"""
+Token usage and cost accounting for chat calls.
+Prefers the provider's usage_metadata on the AzureChatOpenAI response; when it is missing,
+counts tokens with a local tiktoken encoding that is loaded lazily on first use and cached
+(tiktoken fetches its BPE file once; set TIKTOKEN_CACHE_DIR for offline hosts). If no
+encoding can be loaded, falls back to the old len // 4 estimate.
+"""
+
+import json
+import threading
+
+from .config import AZURE_OPENAI_DEPLOYMENT_CHAT, CHAT_PRICES_PER_1M
+
+# USD per 1M (input, output) tokens, matched by deployment/model name prefix (longest first).
+# Override or extend with CHAT_PRICES_PER_1M='{"my-deployment": [2.5, 10.0]}'.
+DEFAULT_PRICES_PER_1M = {
+    "gpt-4o-mini": (0.15, 0.60),
+    "gpt-4o": (2.50, 10.00),
+    "gpt-4.1-nano": (0.10, 0.40),
+    "gpt-4.1-mini": (0.40, 1.60),
+    "gpt-4.1": (2.00, 8.00),
+    # GPT-4 Turbo and the preview snapshots cost a third of the original gpt-4; the bare
+    # "gpt-4" prefix would otherwise price them at 30/60.
+    "gpt-4-turbo": (10.00, 30.00),
+    "gpt-4-1106-preview": (10.00, 30.00),
+    "gpt-4-0125-preview": (10.00, 30.00),
+    "gpt-4-vision-preview": (10.00, 30.00),
+    "gpt-4-32k": (60.00, 120.00),
+    "gpt-4": (30.00, 60.00),
+    "gpt-35-turbo": (0.50, 1.50),
+}
+
+_encodings: dict = {}
+_encoding_lock = threading.Lock()
+
+
+def _prices(overrides: str = CHAT_PRICES_PER_1M) -> list[tuple[str, tuple[float, float]]]:
+    """(lowercase prefix, prices) pairs, longest prefix first, with overrides applied."""
+    prices = {k.lower(): v for k, v in DEFAULT_PRICES_PER_1M.items()}
+    if overrides:
+        try:
+            prices.update({k.lower(): tuple(v) for k, v in json.loads(overrides).items()})
+        except (ValueError, TypeError, AttributeError):
+            pass
+    return sorted(prices.items(), key=lambda kv: len(kv[0]), reverse=True)
+
+
+# Parsed once at import, like the rest of the config; cost_usd runs on every request.
+_PRICES = _prices()
+
+
+def _encoding(model: str):
+    """tiktoken encoding for model (o200k_base if unknown); None if tiktoken is unavailable."""
+    with _encoding_lock:
+        if model in _encodings:
+            return _encodings[model]
+        enc = None
+        try:
+            import tiktoken
+
+            try:
+                enc = tiktoken.encoding_for_model(model)
+            except KeyError:
+                enc = tiktoken.get_encoding("o200k_base")
+        except Exception:
+            enc = None  # not installed or BPE file not reachable; remember so we do not retry per call
+        _encodings[model] = enc
+        return enc
+
+
+def count_tokens(text: str, model: str = AZURE_OPENAI_DEPLOYMENT_CHAT) -> int:
+    enc = _encoding(model)
+    if enc is None:
+        return max(1, len(text) // 4)
+    return len(enc.encode(text, disallowed_special=()))
+
+
+def count_message_tokens(messages: list, model: str = AZURE_OPENAI_DEPLOYMENT_CHAT) -> int:
+    # ~4 tokens of chat framing per message plus 3 to prime the reply, as in OpenAI's cookbook.
+    return sum(count_tokens(str(m.content), model) + 4 for m in messages) + 3
+
+
+def response_usage(response, messages: list, answer: str, model: str = AZURE_OPENAI_DEPLOYMENT_CHAT) -> dict:
+    """Usage for one chat call: provider-reported when present, local tokenizer otherwise."""
+    meta = getattr(response, "usage_metadata", None) or {}
+    if meta.get("input_tokens") or meta.get("output_tokens"):
+        return {
+            "input_tokens": int(meta.get("input_tokens") or 0),
+            "output_tokens": int(meta.get("output_tokens") or 0),
+            "token_source": "usage",
+        }
+    return {
+        "input_tokens": count_message_tokens(messages, model),
+        "output_tokens": count_tokens(answer, model),
+        "token_source": "tokenizer",
+    }
+
+
+def cost_usd(input_tokens: int, output_tokens: int, deployment: str = AZURE_OPENAI_DEPLOYMENT_CHAT) -> float | None:
+    """Cost of one call from the per-deployment price table; None if the deployment is not priced."""
+    name = (deployment or "").lower()
+    for prefix, (price_in, price_out) in _PRICES:
+        if name.startswith(prefix):
+            return round((input_tokens * price_in + output_tokens * price_out) / 1_000_000, 6)
+    return None
@@ -0,0 +1,271 @@
+"""
+In-process vector index: chunk embeddings as a float32 .npy matrix that is memory-mapped
+at startup and searched with one matrix-vector product (exact top-k under the Chroma
+collection's own distance: l2, cosine or ip, so rankings match Chroma). For larger
+corpora an IVF layout (rows grouped by k-means cluster, only the nprobe closest clusters
+scanned per query) trades a little recall for speed. Chunk text, IDs and metadata go to a
+memory-mapped chunk store alongside (src.chunk_store), so search results are Chunk handles
+and no worker loads the corpus into Python objects. The index is an export of the Chroma
+collection, so Chroma stays the source of truth for ingest; see retriever.open_search_store.
+Exports are serialized across processes by a file lock (index_lock), so uvicorn workers
+starting together produce one export and the rest just open it.
+"""
+
+import fcntl
+import json
+import math
+import shutil
+import tempfile
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Iterable, List, Sequence
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from langchain_core.vectorstores import VectorStore
+
+from .chunk_store import Chunk, ChunkStore, write_chunk_store
+
+INDEX_VERSION = 2
+_QUERY_BLOCK = 64  # queries scored per matrix product in search_many
+
+
+def _normalize(m: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(m, axis=-1, keepdims=True)
+    return m / np.maximum(norms, 1e-12)
+
+
+def _top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    """Indices of the k largest scores per row, best first."""
+    k = min(k, scores.shape[-1])
+    if k <= 0:
+        return np.empty(scores.shape[:-1] + (0,), dtype=np.int64)
+    part = np.argpartition(-scores, k - 1, axis=-1)[..., :k]
+    order = np.argsort(-np.take_along_axis(scores, part, axis=-1), axis=-1, kind="stable")
+    return np.take_along_axis(part, order, axis=-1)
+
+
+def _kmeans(vectors: np.ndarray, nlist: int, iterations: int = 10, seed: int = 0) -> np.ndarray:
+    """Spherical k-means centroids (unit rows), fitted on a sample of at most 256 rows per list."""
+    rng = np.random.default_rng(seed)
+    n = len(vectors)
+    sample = vectors[rng.choice(n, size=min(n, 256 * nlist), replace=False)]
+    centroids = sample[rng.choice(len(sample), size=nlist, replace=False)].copy()
+    for _ in range(iterations):
+        assign = np.argmax(sample @ centroids.T, axis=1)
+        for c in range(nlist):
+            members = sample[assign == c]
+            if len(members):
+                centroids[c] = members.sum(axis=0)
+        centroids = _normalize(centroids)
+    return centroids.astype(np.float32)
+
+
+@contextmanager
+def index_lock(path: Path):
+    """Exclusive lock on <path>.lock, held while one process checks and (re)writes the index at path."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path.with_name(path.name + ".lock"), "a") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def _write_files(tmp: Path, pages, count: int, stamp: str, kind: str, nlist: int, space: str):
+    ids: list[str] = []
+    texts: list[str] = []
+    metadatas: list[dict] = []
+    matrix = None
+    row = 0
+    for page_ids, page_vectors, page_texts, page_metas in pages:
+        block = np.asarray(page_vectors, dtype=np.float32)
+        if space == "cosine":
+            block = _normalize(block)
+        if matrix is None:
+            matrix = np.lib.format.open_memmap(tmp / "vectors.npy", mode="w+", dtype=np.float32, shape=(count, block.shape[1]))
+        matrix[row : row + len(block)] = block
+        row += len(block)
+        ids.extend(page_ids)
+        texts.extend(page_texts)
+        metadatas.extend(m or {} for m in page_metas)
+    if matrix is None or row != count:
+        raise ValueError(f"Expected {count} vectors, got {row}")
+
+    meta = {
+        "version": INDEX_VERSION,
+        "stamp": stamp,
+        "kind": kind,
+        "space": space,
+        "count": count,
+        "dim": int(matrix.shape[1]),
+    }
+    if kind == "ivf":
+        nlist = nlist or max(1, int(math.sqrt(count)))
+        vectors = np.asarray(matrix)
+        centroids = _kmeans(_normalize(vectors), min(nlist, count))
+        assign = np.concatenate(
+            [np.argmax(vectors[i : i + 4096] @ centroids.T, axis=1) for i in range(0, count, 4096)]
+        )
+        order = np.argsort(assign, kind="stable")
+        matrix[:] = vectors[order]
+        ids = [ids[i] for i in order]
+        texts = [texts[i] for i in order]
+        metadatas = [metadatas[i] for i in order]
+        offsets = np.searchsorted(assign[order], np.arange(len(centroids) + 1))
+        np.save(tmp / "centroids.npy", centroids)
+        np.save(tmp / "offsets.npy", offsets.astype(np.int64))
+        meta["nlist"] = len(centroids)
+    if space == "l2":
+        sq = np.concatenate([np.einsum("ij,ij->i", matrix[i : i + 4096], matrix[i : i + 4096]) for i in range(0, count, 4096)])
+        np.save(tmp / "sq_norms.npy", sq.astype(np.float32))
+    matrix.flush()
+    del matrix
+    write_chunk_store(tmp, ids, texts, metadatas)
+    meta["created"] = round(time.time(), 3)
+    with open(tmp / "meta.json", "w") as f:
+        json.dump(meta, f)
+
+
+def write_index(
+    path: Path,
+    pages: Iterable[tuple[list, list, list, list]],
+    count: int,
+    stamp: str,
+    kind: str = "exact",
+    nlist: int = 0,
+    space: str = "l2",
+):
+    """
+    Write an index from (ids, embeddings, texts, metadatas) pages totalling count rows.
+    Vectors stream into a memory-mapped .npy (unit-normalized when space="cosine");
+    kind="ivf" then reorders rows by cluster.
+    The directory is replaced atomically, so a running reader never sees a half-written index.
+    Files are built in a private temp dir; callers that may race other processes hold index_lock(path).
+    """
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = Path(tempfile.mkdtemp(prefix=path.name + ".tmp-", dir=path.parent))
+    tmp.chmod(0o755)  # mkdtemp makes it owner-only; it becomes the index directory
+    try:
+        _write_files(tmp, pages, count, stamp, kind, nlist, space)
+    except BaseException:
+        shutil.rmtree(tmp, ignore_errors=True)
+        raise
+    old = None
+    if path.exists():
+        # Readers keep their maps of the replaced files; the old directory only loses its name.
+        old = Path(tempfile.mkdtemp(prefix=path.name + ".old-", dir=path.parent)) / path.name
+        path.rename(old)
+    tmp.rename(path)
+    if old is not None:
+        shutil.rmtree(old.parent, ignore_errors=True)
+
+
+def read_meta(path: Path) -> dict | None:
+    try:
+        with open(path / "meta.json") as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return meta if meta.get("version") == INDEX_VERSION else None
+
+
+class NumpyVectorStore(VectorStore):
+    """Read-only vector store over a write_index() directory; drop-in for Chroma at query time."""
+
+    def __init__(
+        self,
+        embedding: Embeddings,
+        vectors: np.ndarray,
+        chunks: ChunkStore,
+        centroids: np.ndarray | None = None,
+        offsets: np.ndarray | None = None,
+        nprobe: int = 8,
+        space: str = "cosine",
+        sq_norms: np.ndarray | None = None,
+    ):
+        self._embedding = embedding
+        self.vectors = vectors
+        self.chunks = chunks
+        self.centroids = centroids
+        self.offsets = offsets
+        self.nprobe = max(1, nprobe)
+        self.space = space
+        self.sq_norms = sq_norms
+
+    @classmethod
+    def load(cls, path: Path, embedding: Embeddings, nprobe: int = 8) -> "NumpyVectorStore":
+        """Memory-map vectors.npy and the chunk store (pages are read on demand and shared between processes)."""
+        vectors = np.load(path / "vectors.npy", mmap_mode="r")
+        meta = read_meta(path) or {}
+        centroids = offsets = sq_norms = None
+        if (path / "centroids.npy").exists():
+            centroids = np.load(path / "centroids.npy")
+            offsets = np.load(path / "offsets.npy")
+        if (path / "sq_norms.npy").exists():
+            sq_norms = np.load(path / "sq_norms.npy")
+        return cls(
+            embedding,
+            vectors,
+            ChunkStore.open(path),
+            centroids,
+            offsets,
+            nprobe,
+            space=meta.get("space", "cosine"),
+            sq_norms=sq_norms,
+        )
+
+    @property
+    def embeddings(self) -> Embeddings:
+        return self._embedding
+
+    def __len__(self) -> int:
+        return len(self.chunks)
+
+    def _ivf_rows(self, query: np.ndarray) -> np.ndarray:
+        lists = _top_k(self.centroids @ _normalize(query), self.nprobe)
+        return np.concatenate([np.arange(self.offsets[c], self.offsets[c + 1]) for c in lists])
+
+    def _scores(self, dots: np.ndarray, rows=slice(None)) -> np.ndarray:
+        # Higher is better. For l2, ||x - q||^2 = ||x||^2 - 2x.q + ||q||^2 and ||q|| is constant per query.
+        if self.space == "l2":
+            return 2.0 * dots - self.sq_norms[rows]
+        return dots
+
+    def search_many(self, vectors: Sequence[Sequence[float]], k: int = 4) -> List[List[tuple[int, float]]]:
+        """(row, score) top-k per query vector; score is cosine/inner product, or 2x.q - ||x||^2 for l2."""
+        queries = np.asarray(vectors, dtype=np.float32).reshape(len(vectors), -1)
+        if self.space == "cosine":
+            queries = _normalize(queries)
+        out: List[List[tuple[int, float]]] = []
+        if self.centroids is not None:
+            for q in queries:
+                rows = self._ivf_rows(q)
+                scores = self._scores(self.vectors[rows] @ q, rows)
+                best = _top_k(scores, k)
+                out.append([(int(rows[i]), float(scores[i])) for i in best])
+            return out
+        for start in range(0, len(queries), _QUERY_BLOCK):
+            block = queries[start : start + _QUERY_BLOCK]
+            scores = self._scores(block @ self.vectors.T)
+            for row_scores, best in zip(scores, _top_k(scores, k)):
+                out.append([(int(i), float(row_scores[i])) for i in best])
+        return out
+
+    def similarity_search_by_vector(self, embedding: List[float], k: int = 4, **kwargs: Any) -> List[Chunk]:
+        return [self.chunks.chunk(row) for row, _ in self.search_many([embedding], k)[0]]
+
+    def similarity_search(self, query: str, k: int = 4, **kwargs: Any) -> List[Chunk]:
+        return self.similarity_search_by_vector(self._embedding.embed_query(query), k)
+
+    def get_by_ids(self, ids: Sequence[str], /) -> List[Chunk]:
+        return self.chunks.by_ids(ids)
+
+    def add_texts(self, texts: Iterable[str], metadatas: list[dict] | None = None, **kwargs: Any) -> List[str]:
+        raise NotImplementedError("NumpyVectorStore is read-only; ingest into Chroma and re-export")
+
+    @classmethod
+    def from_texts(cls, texts: List[str], embedding: Embeddings, metadatas: list[dict] | None = None, **kwargs: Any):
+        raise NotImplementedError("Build the index with retriever.build_numpy_index")
@@ -0,0 +1,119 @@
+"""
+Shared fixtures. src.config reads the environment once at import, so a session-wide
+FakeOpenAIServer is started and AZURE_OPENAI_ENDPOINT / RAG_DATA_DIR point at it (and a temp
+dir) before any test module imports src. Per-test state (Chroma dir, manifest, BM25 index,
+vector index, run log) is redirected into tmp_path by the data_dir fixture.
+"""
+
+import os
+import shutil
+import tempfile
+from pathlib import Path
+
+import pytest
+
+from tests.fake_openai import FakeOpenAIServer
+
+_SERVER = FakeOpenAIServer(chat_latency=0.0, embed_latency=0.0, answer_words=12)
+_SESSION_DIR = Path(tempfile.mkdtemp(prefix="rag-tests-"))
+
+DOCS = {
+    "service.txt": (
+        "The ingest service splits every document into chunks, embeds them in batches and "
+        "writes them to the vector store. Chunks keep stable IDs derived from their content."
+    ),
+    "errors.txt": (
+        "Troubleshooting: a request that fails with ERR-999 means the embedding deployment "
+        "rejected the batch. Lower INGEST_BATCH_SIZE and run the ingest again."
+    ),
+    "serving.txt": (
+        "The web server answers questions through the async pipeline. Identical questions that "
+        "arrive together share one run, and every request carries a deadline."
+    ),
+}
+
+
+def pytest_configure(config):
+    _SERVER.start()
+    os.environ.update({
+        "AZURE_OPENAI_ENDPOINT": _SERVER.url,
+        "AZURE_OPENAI_API_KEY": "test",
+        "AZURE_OPENAI_CHAT_TARGETS": "",
+        "CHAT_HEDGE_ENABLED": "false",
+        "RAG_DATA_DIR": str(_SESSION_DIR / "data"),
+        "RAG_DOCS_DIR": str(_SESSION_DIR / "docs"),
+        "EMBEDDING_CACHE_ENABLED": "false",
+        "ANSWER_CACHE_ENABLED": "false",
+        "INGEST_WORKERS": "1",
+        "LANGCHAIN_TRACING_V2": "false",
+        "OTEL_EXPORTER_OTLP_ENDPOINT": "",
+        "OTEL_TRACES_EXPORTER": "",
+        "STARTUP_WARM": "false",
+    })
+
+
+def pytest_unconfigure(config):
+    _SERVER.stop()
+    shutil.rmtree(_SESSION_DIR, ignore_errors=True)
+
+
+@pytest.fixture
+def fake_openai():
+    """The session fake endpoint; latency and error settings are restored after the test."""
+    saved = (_SERVER.chat_latency, _SERVER.token_latency, _SERVER.embed_latency, _SERVER.error_rate)
+    yield _SERVER
+    _SERVER.chat_latency, _SERVER.token_latency, _SERVER.embed_latency, _SERVER.error_rate = saved
+
+
+@pytest.fixture(autouse=True)
+def _fresh_clients():
+    from src import clients
+
+    # Send plain text, as scripts/bench_load.py does offline: token-ID input needs tiktoken's cl100k file.
+    for max_retries in (None, 0):
+        clients.embeddings_model(max_retries).check_embedding_ctx_length = False
+    yield
+    # The shared async client is bound to the event loop that first used it; each test runs its own loop.
+    clients.close_clients()
+    clients._async_client = None
+
+
+@pytest.fixture
+def data_dir(tmp_path, monkeypatch) -> Path:
+    """Point ingest, the indexes and the run log at tmp_path/data."""
+    from src import pipeline, retriever
+
+    data = tmp_path / "data"
+    chroma = data / "chroma"
+    monkeypatch.setattr(retriever, "CHROMA_PERSIST_DIR", chroma)
+    monkeypatch.setattr(retriever, "INGEST_MANIFEST_PATH", chroma / "ingest_manifest.json")
+    monkeypatch.setattr(retriever, "BM25_INDEX_PATH", chroma / "bm25_index.json")
+    monkeypatch.setattr(retriever, "VECTOR_INDEX_DIR", data / "vector_index")
+    monkeypatch.setattr(pipeline, "RUN_LOG_PATH", data / "runs.jsonl")
+    return data
+
+
+@pytest.fixture
+def docs_dir(tmp_path) -> Path:
+    docs = tmp_path / "docs"
+    docs.mkdir()
+    for name, text in DOCS.items():
+        (docs / name).write_text(text)
+    return docs
+
+
+@pytest.fixture
+def make_pipeline(data_dir, docs_dir):
+    """Factory for RAGPipeline over the test corpus (ingested on first build); closed after the test."""
+    from src.pipeline import RAGPipeline
+
+    built = []
+
+    def make(**kwargs) -> RAGPipeline:
+        p = RAGPipeline(docs_path=docs_dir, **kwargs)
+        built.append(p)
+        return p
+
+    yield make
+    for p in built:
+        p.close()
@@ -0,0 +1,260 @@
+"""
+Deterministic local stand-in for the Azure OpenAI chat and embeddings endpoints, for
+tests, benchmarks and offline runs (tests/conftest.py, scripts/bench_load.py). Speaks the REST shapes the OpenAI SDK
+uses: /openai/deployments/<name>/chat/completions (plain or SSE streaming, with usage) and
+/openai/deployments/<name>/embeddings (strings or token-ID arrays). Answers are derived
+from a hash of the prompt and embeddings are hashed bag-of-words vectors, so the same input
+always gets the same output and related texts still land near each other.
+
+Latency, jitter and error rate are plain attributes and can be changed while the server
+runs; GET /stats returns request counts. Standalone: python -m tests.fake_openai --port 8001 --chat-latency 0.5
+"""
+
+import argparse
+import json
+import math
+import random
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+_WORDS = (
+    "the service retries failed calls with backoff and logs each attempt so latency and cost "
+    "stay visible per prompt version while the index keeps chunks close to their source"
+).split()
+
+
+def _tokens(text: str) -> list[str]:
+    return text.lower().split()
+
+
+def hashed_embedding(items, dim: int) -> list[float]:
+    """Unit vector from hashed terms (words of a string, or token IDs); empty input hashes to one axis."""
+    vec = [0.0] * dim
+    terms = _tokens(items) if isinstance(items, str) else [str(t) for t in items]
+    for term in terms or [""]:
+        h = zlib.crc32(term.encode())
+        vec[h % dim] += 1.0 if (h >> 16) & 1 else -1.0
+    norm = math.sqrt(sum(v * v for v in vec)) or 1.0
+    return [v / norm for v in vec]
+
+
+class _HTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 1024  # listen backlog; the default of 5 drops connections under load
+
+    def handle_error(self, request, client_address):
+        import sys
+
+        if not isinstance(sys.exc_info()[1], ConnectionError):  # client hung up (deadline, cancel): not an error here
+            super().handle_error(request, client_address)
+
+
+class FakeOpenAIServer:
+    """Threaded HTTP server; start() runs it in a daemon thread, url is the azure_endpoint to use."""
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        chat_latency: float = 0.5,
+        token_latency: float = 0.0,
+        embed_latency: float = 0.05,
+        jitter: float = 0.0,
+        error_rate: float = 0.0,
+        answer_words: int = 40,
+        dim: int = 256,
+        seed: int = 0,
+    ):
+        self.chat_latency = chat_latency  # seconds before the first token / the whole reply
+        self.token_latency = token_latency  # seconds between streamed tokens
+        self.embed_latency = embed_latency
+        self.jitter = jitter  # each delay is scaled by a uniform factor in [1 - jitter, 1 + jitter]
+        self.error_rate = error_rate  # fraction of requests answered with 503
+        self.answer_words = answer_words
+        self.dim = dim
+        self.counts = {"chat": 0, "embeddings": 0, "errors": 0}
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._httpd = _HTTPServer((host, port), _handler(self))
+        self._thread: threading.Thread | None = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "FakeOpenAIServer":
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name="fake-openai", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _delay(self, seconds: float) -> float:
+        with self._lock:
+            factor = 1.0 + self.jitter * (2 * self._rng.random() - 1) if self.jitter else 1.0
+        return max(0.0, seconds * factor)
+
+    def _fail(self, kind: str) -> bool:
+        with self._lock:
+            self.counts[kind] += 1
+            failed = self.error_rate > 0 and self._rng.random() < self.error_rate
+            if failed:
+                self.counts["errors"] += 1
+            return failed
+
+    def answer(self, prompt: str) -> list[str]:
+        """Deterministic reply words for a prompt: its own first words, then filler chosen by its hash."""
+        seed = zlib.crc32(prompt.encode())
+        head = _tokens(prompt)[:8]
+        filler = [_WORDS[(seed + i * 7) % len(_WORDS)] for i in range(max(0, self.answer_words - len(head)))]
+        return (head + filler)[: self.answer_words]
+
+
+def _handler(server: FakeOpenAIServer):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # keep-alive, so client connection pooling is exercised
+
+        def log_message(self, format, *args):
+            pass
+
+        def do_GET(self):
+            if self.path.split("?", 1)[0] == "/stats":
+                with server._lock:
+                    counts = dict(server.counts)
+                return self._json(200, counts)
+            self._json(404, {"error": {"message": f"unknown path {self.path}"}})
+
+        def do_POST(self):
+            path = self.path.split("?", 1)[0]
+            body = json.loads(self.rfile.read(int(self.headers.get("content-length") or 0)) or b"{}")
+            if path.endswith("/chat/completions"):
+                self._chat(body)
+            elif path.endswith("/embeddings"):
+                self._embeddings(body)
+            else:
+                self._json(404, {"error": {"message": f"unknown path {path}"}})
+
+        def _json(self, status: int, payload: dict, headers: dict | None = None):
+            data = json.dumps(payload).encode()
+            self.send_response(status)
+            self.send_header("content-type", "application/json")
+            self.send_header("content-length", str(len(data)))
+            for k, v in (headers or {}).items():
+                self.send_header(k, v)
+            self.end_headers()
+            self.wfile.write(data)
+
+        def _error(self):
+            self._json(503, {"error": {"code": "ServiceUnavailable", "message": "injected failure"}}, {"retry-after": "1"})
+
+        def _embeddings(self, body: dict):
+            time.sleep(server._delay(server.embed_latency))
+            if server._fail("embeddings"):
+                return self._error()
+            inputs = body.get("input", "")
+            if isinstance(inputs, str) or (inputs and isinstance(inputs[0], int)):
+                inputs = [inputs]
+            data = [
+                {"object": "embedding", "index": i, "embedding": hashed_embedding(item, server.dim)}
+                for i, item in enumerate(inputs)
+            ]
+            tokens = sum(len(_tokens(x)) if isinstance(x, str) else len(x) for x in inputs)
+            self._json(200, {
+                "object": "list",
+                "data": data,
+                "model": body.get("model", "fake-embedding"),
+                "usage": {"prompt_tokens": tokens, "total_tokens": tokens},
+            })
+
+        def _chat(self, body: dict):
+            time.sleep(server._delay(server.chat_latency))
+            if server._fail("chat"):
+                return self._error()
+            prompt = "\n".join(str(m.get("content", "")) for m in body.get("messages", []))
+            words = server.answer(prompt)
+            usage = {
+                "prompt_tokens": max(1, len(prompt) // 4),
+                "completion_tokens": len(words),
+                "total_tokens": max(1, len(prompt) // 4) + len(words),
+            }
+            base = {"id": f"chatcmpl-{zlib.crc32(prompt.encode()):08x}", "created": int(time.time()), "model": "gpt-4o"}
+            if not body.get("stream"):
+                message = {"role": "assistant", "content": " ".join(words)}
+                return self._json(200, {
+                    **base,
+                    "object": "chat.completion",
+                    "choices": [{"index": 0, "message": message, "finish_reason": "stop"}],
+                    "usage": usage,
+                })
+            self.send_response(200)
+            self.send_header("content-type", "text/event-stream")
+            self.send_header("transfer-encoding", "chunked")
+            self.end_headers()
+
+            def event(payload):
+                data = b"data: " + (payload if isinstance(payload, bytes) else json.dumps(payload).encode()) + b"\n\n"
+                self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+                self.wfile.flush()
+
+            chunk = {**base, "object": "chat.completion.chunk"}
+            event({**chunk, "choices": [{"index": 0, "delta": {"role": "assistant", "content": ""}, "finish_reason": None}]})
+            for i, word in enumerate(words):
+                if i and server.token_latency:
+                    time.sleep(server._delay(server.token_latency))
+                text = word if i == 0 else " " + word
+                event({**chunk, "choices": [{"index": 0, "delta": {"content": text}, "finish_reason": None}]})
+            event({**chunk, "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]})
+            if (body.get("stream_options") or {}).get("include_usage"):
+                event({**chunk, "choices": [], "usage": usage})
+            event(b"[DONE]")
+            self.wfile.write(b"0\r\n\r\n")
+            self.wfile.flush()
+
+    return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a fake Azure OpenAI endpoint (chat + embeddings).")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=0, help="0 picks a free port (printed on startup).")
+    parser.add_argument("--chat-latency", type=float, default=0.5)
+    parser.add_argument("--token-latency", type=float, default=0.0)
+    parser.add_argument("--embed-latency", type=float, default=0.05)
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--answer-words", type=int, default=40)
+    parser.add_argument("--dim", type=int, default=256)
+    args = parser.parse_args()
+    server = FakeOpenAIServer(
+        args.host,
+        args.port,
+        chat_latency=args.chat_latency,
+        token_latency=args.token_latency,
+        embed_latency=args.embed_latency,
+        jitter=args.jitter,
+        error_rate=args.error_rate,
+        answer_words=args.answer_words,
+        dim=args.dim,
+    )
+    print(server.url, flush=True)  # first stdout line: the endpoint, read by scripts/bench_load.py
+    try:
+        server._httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server._httpd.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+from src import answer_cache
+from src.answer_cache import AnswerCache
+
+
+def _cache(**kwargs) -> AnswerCache:
+    return AnswerCache("v1", "gpt-4o", **kwargs)
+
+
+def test_exact_match_ignores_case_and_spacing():
+    cache = _cache()
+    cache.put("How are chunks embedded?", [1.0, 0.0], "In batches.", ["c1"])
+    hit = cache.get("  how are CHUNKS embedded? ")
+    assert hit.answer == "In batches." and hit.chunk_ids == ["c1"]
+    assert hit.similarity == 1.0
+
+
+def test_nearest_neighbour_respects_threshold():
+    cache = _cache(threshold=0.9)
+    cache.put("How are chunks embedded?", [1.0, 0.0], "In batches.", ["c1"])
+    near = cache.get("How do chunks get embedded?", vector=[0.95, 0.1])
+    assert near.answer == "In batches." and 0.9 <= near.similarity < 1.0
+    assert cache.get("What is a deadline?", vector=[0.6, 0.8]) is None
+    assert cache.get("What is a deadline?") is None  # no vector: exact match only
+    assert cache.stats() == {"entries": 1, "hits": 1, "misses": 2}
+
+
+def test_entries_expire_after_ttl(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(answer_cache.time, "time", lambda: now[0])
+    cache = _cache(ttl_seconds=60)
+    cache.put("q", [1.0, 0.0], "a", [])
+    now[0] += 59
+    assert cache.get("q") is not None
+    now[0] += 2
+    assert cache.get("q", vector=[1.0, 0.0]) is None
+    assert cache.stats()["entries"] == 0
+
+
+def test_namespace_separates_prompt_versions_and_deployments():
+    a = AnswerCache("v1", "gpt-4o")
+    b = AnswerCache("v2", "gpt-4o")
+    c = AnswerCache("v1", "gpt-4o-mini")
+    assert len({a._key("q"), b._key("q"), c._key("q")}) == 3
+    assert a._key("q") == AnswerCache("v1", "gpt-4o")._key("Q ")
+
+
+def test_full_cache_drops_least_recently_used():
+    cache = _cache(max_entries=2)
+    cache.put("a", [1.0, 0.0], "A", [])
+    cache.put("b", [0.0, 1.0], "B", [])
+    cache.get("a")
+    cache.put("c", [0.7, 0.7], "C", [])
+    assert cache.get("b") is None
+    assert cache.get("a").answer == "A" and cache.get("c").answer == "C"
@@ -0,0 +1,94 @@
+import asyncio
+
+import pytest
+
+from src import pipeline as pipeline_mod
+
+QUESTIONS = [
+    "How are chunks embedded?",
+    "What does ERR-999 mean?",
+    "When does a request stop?",
+    "How is the BM25 index stored?",
+    "Which workers export the index?",
+    "What is a deadline?",
+]
+
+
+class BrokenChunk:
+    @property
+    def page_content(self):
+        raise ValueError("corrupt chunk")
+
+
+class ConcurrencyProbe:
+    """Wraps the compiled graph and records how many async runs are in flight at once."""
+
+    def __init__(self, graph):
+        self.graph = graph
+        self.active = 0
+        self.peak = 0
+
+    async def ainvoke(self, state, *args, **kwargs):
+        self.active += 1
+        self.peak = max(self.peak, self.active)
+        try:
+            return await self.graph.ainvoke(state, *args, **kwargs)
+        finally:
+            self.active -= 1
+
+
+@pytest.fixture
+def poison(monkeypatch):
+    """Make retrieval hand question `index` a chunk that breaks context assembly."""
+
+    def apply(index: int):
+        real = pipeline_mod.retrieve_many
+
+        def retrieve_many(*args, **kwargs):
+            chunks = real(*args, **kwargs)
+            chunks[index] = [BrokenChunk()]
+            return chunks
+
+        monkeypatch.setattr(pipeline_mod, "retrieve_many", retrieve_many)
+
+    return apply
+
+
+def _check_results(pipeline, outs, bad: int):
+    assert [o["question"] for o in outs] == QUESTIONS
+    assert "corrupt chunk" in outs[bad]["error"]
+    for i, (q, o) in enumerate(zip(QUESTIONS, outs)):
+        if i != bad:
+            single = pipeline.run(q)  # the fake answers deterministically from the prompt
+            assert "error" not in o
+            assert (o["answer"], o["chunk_ids"]) == (single["answer"], single["chunk_ids"])
+
+
+def test_run_batch_keeps_order_and_reports_item_errors(make_pipeline, poison):
+    pipeline = make_pipeline(coalesce=False)
+    poison(2)
+    _check_results(pipeline, pipeline.run_batch(QUESTIONS), bad=2)
+
+
+def test_arun_batch_keeps_order_and_reports_item_errors(make_pipeline, poison):
+    pipeline = make_pipeline(coalesce=False)
+    poison(4)
+    _check_results(pipeline, asyncio.run(pipeline.arun_batch(QUESTIONS)), bad=4)
+
+
+def test_batch_cannot_exceed_the_pipeline_cap(make_pipeline, fake_openai):
+    pipeline = make_pipeline(coalesce=False, max_concurrency=2)
+    probe = pipeline._graph = ConcurrencyProbe(pipeline._graph)
+    fake_openai.chat_latency = 0.1
+
+    async def main():
+        batch = pipeline.arun_batch(QUESTIONS, max_concurrency=50)
+        singles = [pipeline.arun(f"Single question {i}?") for i in range(3)]
+        return await asyncio.gather(batch, *singles)
+
+    outs, *singles = asyncio.run(main())
+    assert all("error" not in o for o in outs) and all(s["answer"] for s in singles)
+    assert probe.peak == 2  # batch items and single requests share one RAG_MAX_CONCURRENCY budget
+    assert pipeline._batch_concurrency(50) == 2
+    assert pipeline._batch_concurrency(None) == 2
+    assert pipeline._batch_concurrency(1) == 1
@@ -0,0 +1,169 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from src.coalesce import SingleFlight
+from src.deadline import DeadlineExceeded, deadline_after
+
+
+def test_do_runs_once_for_concurrent_callers():
+    flights = SingleFlight()
+    calls = []
+    barrier = threading.Barrier(5)
+    results = []
+
+    def work():
+        calls.append(1)
+        time.sleep(0.2)
+        return "answer"
+
+    def caller():
+        barrier.wait()
+        results.append(flights.do("q", work))
+
+    threads = [threading.Thread(target=caller) for _ in range(5)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(calls) == 1
+    assert sorted(leader for _, leader in results) == [False, False, False, False, True]
+    assert {out for out, _ in results} == {"answer"}
+    assert flights.in_flight() == 0
+
+
+def test_do_shares_the_leaders_error():
+    flights = SingleFlight()
+    started = threading.Event()
+    errors = []
+
+    def work():
+        started.set()
+        time.sleep(0.1)
+        raise ValueError("upstream failed")
+
+    def follower():
+        started.wait()
+        try:
+            flights.do("q", lambda: "unused")
+        except ValueError as e:
+            errors.append(e)
+
+    t = threading.Thread(target=follower)
+    t.start()
+    with pytest.raises(ValueError):
+        flights.do("q", work)
+    t.join()
+    assert len(errors) == 1
+
+
+def test_do_follower_timeout_leaves_leader_running():
+    flights = SingleFlight()
+    started = threading.Event()
+    out = []
+
+    def work():
+        started.set()
+        time.sleep(0.3)
+        return "late"
+
+    leader = threading.Thread(target=lambda: out.append(flights.do("q", work)))
+    leader.start()
+    started.wait()
+    with pytest.raises(TimeoutError):
+        flights.do("q", lambda: "unused", timeout=0.05)
+    leader.join()
+    assert out == [("late", True)]
+
+
+def test_ado_runs_once_and_survives_a_cancelled_caller():
+    flights = SingleFlight()
+    calls = []
+
+    async def work():
+        calls.append(1)
+        await asyncio.sleep(0.1)
+        return "answer"
+
+    async def main():
+        first = asyncio.ensure_future(flights.ado("q", work))
+        await asyncio.sleep(0)
+        others = [asyncio.ensure_future(flights.ado("q", work)) for _ in range(3)]
+        await asyncio.sleep(0.01)
+        first.cancel()  # the client that started the run went away
+        return await asyncio.gather(*others)
+
+    results = asyncio.run(main())
+    assert len(calls) == 1
+    assert results == [("answer", False)] * 3
+
+
+def test_pipeline_coalesces_identical_questions(make_pipeline, fake_openai):
+    pipeline = make_pipeline(coalesce=True)
+    fake_openai.chat_latency = 0.2
+    before = fake_openai.counts["chat"]
+
+    async def burst():
+        return await asyncio.gather(*(pipeline.arun("How are chunks embedded?") for _ in range(4)))
+
+    outs = asyncio.run(burst())
+    assert fake_openai.counts["chat"] - before == 1
+    assert sorted(o["coalesced"] for o in outs) == [False, True, True, True]
+    assert len({o["answer"] for o in outs}) == 1
+    assert all(o["input_tokens"] == 0 for o in outs if o["coalesced"])
+
+
+def test_follower_outlives_leaders_deadline(make_pipeline, fake_openai):
+    pipeline = make_pipeline(coalesce=True)
+    fake_openai.chat_latency = 0.5
+
+    async def main():
+        leader = asyncio.ensure_future(pipeline.arun("When does a request stop?", deadline=deadline_after(0.2)))
+        await asyncio.sleep(0.05)
+        follower = asyncio.ensure_future(pipeline.arun("When does a request stop?", deadline=deadline_after(5)))
+        return await asyncio.gather(leader, follower, return_exceptions=True)
+
+    led, followed = asyncio.run(main())
+    assert isinstance(led, DeadlineExceeded)
+    assert followed["answer"] and not followed["coalesced"]  # ran again on its own time
+
+
+def test_sync_follower_outlives_leaders_deadline(make_pipeline, fake_openai):
+    pipeline = make_pipeline(coalesce=True)
+    fake_openai.chat_latency = 0.5
+    results = {}
+
+    def call(name, seconds, delay):
+        time.sleep(delay)
+        try:
+            results[name] = pipeline.run("When does a request stop?", deadline=deadline_after(seconds))
+        except Exception as e:
+            results[name] = e
+
+    threads = [
+        threading.Thread(target=call, args=("leader", 0.2, 0)),
+        threading.Thread(target=call, args=("follower", 5, 0.05)),
+    ]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert isinstance(results["leader"], DeadlineExceeded)
+    assert results["follower"]["answer"]
+
+
+def test_follower_still_bound_by_its_own_deadline(make_pipeline, fake_openai):
+    pipeline = make_pipeline(coalesce=True)
+    fake_openai.chat_latency = 0.5
+
+    async def main():
+        leader = asyncio.ensure_future(pipeline.arun("When does a request stop?"))
+        await asyncio.sleep(0.05)
+        follower = asyncio.ensure_future(pipeline.arun("When does a request stop?", deadline=deadline_after(0.1)))
+        return await asyncio.gather(leader, follower, return_exceptions=True)
+
+    led, followed = asyncio.run(main())
+    assert led["answer"]
+    assert isinstance(followed, DeadlineExceeded) and followed.stage == "coalesced"
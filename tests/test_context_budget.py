@@ -0,0 +1,63 @@
+from src.context_budget import assemble_context
+from src.usage import count_tokens
+
+A = "Chunks are embedded in batches and written to the vector store with stable IDs."
+B = "Every request carries a deadline and stops spending tokens once its client has gone."
+C = "The BM25 index keeps error codes like ERR-4012 as single terms for keyword lookups."
+
+
+def test_near_duplicates_are_dropped():
+    context, stats = assemble_context([A, A + " ", B])
+    assert context == A + "\n\n" + B
+    assert stats.duplicates_dropped == 1
+    assert stats.used == [0, 2]
+
+
+def test_dedup_can_be_disabled():
+    _, stats = assemble_context([A, A], dedup_threshold=1.1)
+    # Still caught by overlap trimming, which leaves nothing of the second copy.
+    assert stats.chunks_used == 1
+
+
+def test_overlap_with_kept_chunk_is_trimmed():
+    shared = "written to the vector store with stable IDs."
+    second = shared + " Incremental ingest embeds only chunks whose hash changed."
+    context, stats = assemble_context([A, second], min_overlap_chars=20)
+    assert stats.overlaps_trimmed == 1
+    assert context.endswith("\n\nIncremental ingest embeds only chunks whose hash changed.")
+    assert stats.tokens_saved > 0
+
+
+def test_budget_skips_large_chunk_but_keeps_smaller_one():
+    long = " ".join([B] * 10)
+    budget = count_tokens(A) + count_tokens(C) + 5
+    context, stats = assemble_context([A, long, C], token_budget=budget)
+    assert stats.over_budget_dropped == 1
+    assert stats.used == [0, 2]
+    assert long not in context
+
+
+def test_budget_counts_separators():
+    sep = count_tokens("\n\n")
+    texts = [A, B, C]
+    _, stats = assemble_context(texts, token_budget=count_tokens(A) + count_tokens(B))
+    assert 1 not in stats.used  # B alone fits, B plus its separator does not
+    _, stats = assemble_context(texts, token_budget=count_tokens(A) + count_tokens(B) + sep)
+    assert stats.used == [0, 1]
+    full = sum(count_tokens(t) for t in texts) + 2 * sep
+    for budget in range(1, full + 2):
+        _, stats = assemble_context(texts, token_budget=budget)
+        assert stats.tokens_after <= budget
+        used = [texts[i] for i in stats.used]
+        assert stats.tokens_after == sum(count_tokens(t) for t in used) + sep * max(0, len(used) - 1)
+
+
+def test_precomputed_token_counts_are_used():
+    _, stats = assemble_context([A, B], token_counts=[7, None])
+    assert stats.tokens_before == 7 + count_tokens(B) + count_tokens("\n\n")
+
+
+def test_empty_input():
+    context, stats = assemble_context([])
+    assert context == ""
+    assert stats.tokens_after == 0
@@ -0,0 +1,84 @@
+import asyncio
+import time
+
+import pytest
+
+from src.admission import AdmissionController, Overloaded
+from src.deadline import DeadlineExceeded, bounded, check, deadline_after, remaining
+
+
+def test_no_deadline():
+    assert deadline_after(None) is None
+    assert deadline_after(0) is None
+    assert remaining(None) is None
+    assert check(None, "retrieve") is None
+
+
+def test_check_raises_once_passed():
+    with pytest.raises(DeadlineExceeded) as exc:
+        check(time.monotonic() - 1, "chat")
+    assert exc.value.stage == "chat"
+    assert check(deadline_after(10), "chat") > 9
+
+
+def test_bounded_cancels_slow_work():
+    cancelled = []
+
+    async def slow():
+        try:
+            await asyncio.sleep(5)
+        except asyncio.CancelledError:
+            cancelled.append(True)
+            raise
+
+    async def main():
+        await bounded(slow(), deadline_after(0.05), "chat")
+
+    with pytest.raises(DeadlineExceeded) as exc:
+        asyncio.run(main())
+    assert exc.value.stage == "chat"
+    assert cancelled == [True]
+
+
+def test_arun_stops_at_deadline(make_pipeline, fake_openai):
+    pipeline = make_pipeline(coalesce=False)
+    fake_openai.chat_latency = 1.0
+    t0 = time.monotonic()
+    with pytest.raises(DeadlineExceeded) as exc:
+        asyncio.run(pipeline.arun("When does a request stop?", deadline=deadline_after(0.3)))
+    assert exc.value.stage == "chat"
+    assert time.monotonic() - t0 < 0.9
+
+
+def test_run_stops_before_starting_past_deadline(make_pipeline, fake_openai):
+    pipeline = make_pipeline(coalesce=False)
+    before = fake_openai.counts["chat"]
+    with pytest.raises(DeadlineExceeded):
+        pipeline.run("When does a request stop?", deadline=time.monotonic() - 0.01)
+    assert fake_openai.counts["chat"] == before
+
+
+def test_admission_sheds_full_queue_and_expired_waiters():
+    admission = AdmissionController(max_active=1, max_queue=1)
+
+    async def hold(seconds: float, deadline=None):
+        async with admission.slot(deadline):
+            await asyncio.sleep(seconds)
+
+    async def main():
+        running = asyncio.ensure_future(hold(0.2))
+        await asyncio.sleep(0)
+        queued = asyncio.ensure_future(hold(0, deadline_after(0.05)))
+        await asyncio.sleep(0)
+        with pytest.raises(Overloaded) as full:
+            await hold(0)
+        with pytest.raises(Overloaded) as late:
+            await queued
+        await running
+        return full.value, late.value
+
+    full, late = asyncio.run(main())
+    assert full.reason == "queue_full"
+    assert late.reason == "deadline"
+    assert full.retry_after >= 1
+    assert admission.active == 0 and admission.queued == 0
@@ -0,0 +1,145 @@
+import threading
+import time
+
+import pytest
+from langchain_core.embeddings import Embeddings
+
+from src import clients, embed_executor, retriever
+from src.embed_executor import EmbeddingExecutor, TokenBudget, is_retryable, retry_after
+
+
+class APIError(Exception):
+    """Shaped like the OpenAI SDK's status errors: status_code plus the raw response."""
+
+    def __init__(self, status: int, headers: dict | None = None):
+        super().__init__(f"HTTP {status}")
+        self.status_code = status
+        self.response = type("Response", (), {"status_code": status, "headers": headers or {}})()
+
+
+class FakeEmbeddings(Embeddings):
+    """Fails the first len(errors) requests with the given errors, then embeds; tracks concurrency."""
+
+    def __init__(self, errors=(), latency: float = 0.0):
+        self.errors = list(errors)
+        self.latency = latency
+        self.batches: list[list[str]] = []
+        self.in_flight = 0
+        self.peak = 0
+        self._lock = threading.Lock()
+
+    def embed_documents(self, texts):
+        with self._lock:
+            self.batches.append(list(texts))
+            if self.errors:
+                raise self.errors.pop(0)
+            self.in_flight += 1
+            self.peak = max(self.peak, self.in_flight)
+        if self.latency:
+            time.sleep(self.latency)
+        with self._lock:
+            self.in_flight -= 1
+        return [[float(len(t))] for t in texts]
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    """Record backoff sleeps instead of waiting them out (patches the shared time module for the test)."""
+    slept = []
+    monkeypatch.setattr(embed_executor.time, "sleep", slept.append)
+    return slept
+
+
+def test_batches_keep_input_order():
+    inner = FakeEmbeddings()
+    texts = [f"text {i}" * (i + 1) for i in range(7)]
+    vectors = EmbeddingExecutor(inner, batch_size=3, max_in_flight=2).embed_documents(texts)
+    assert vectors == [[float(len(t))] for t in texts]
+    assert sorted(len(b) for b in inner.batches) == [1, 3, 3]
+
+
+def test_in_flight_requests_are_bounded():
+    inner = FakeEmbeddings(latency=0.05)
+    executor = EmbeddingExecutor(inner, batch_size=1, max_in_flight=3)
+    executor.embed_documents([str(i) for i in range(12)])
+    assert inner.peak == 3
+    assert executor.stats()["chunks_embedded"] == 12
+
+
+def test_retryable_errors_are_retried_with_jittered_backoff(sleeps):
+    inner = FakeEmbeddings(errors=[APIError(429), APIError(503), APIError(500)])
+    executor = EmbeddingExecutor(inner, max_retries=6, backoff_base=1.0, backoff_max=60.0)
+    assert executor.embed_batch(["a"]) == [[1.0]]
+    assert len(inner.batches) == 4
+    assert executor.retries == 3
+    assert len(sleeps) == 3
+    assert all(0 <= delay <= 2**attempt for attempt, delay in enumerate(sleeps))
+
+
+def test_gives_up_after_max_retries(sleeps):
+    inner = FakeEmbeddings(errors=[APIError(429)] * 10)
+    with pytest.raises(APIError):
+        EmbeddingExecutor(inner, max_retries=2).embed_batch(["a"])
+    assert len(inner.batches) == 3  # one attempt plus two retries, nothing nested
+
+
+def test_retry_after_header_sets_the_minimum_delay(sleeps):
+    inner = FakeEmbeddings(errors=[APIError(429, {"retry-after": "7"}), APIError(503, {"retry-after-ms": "2500"})])
+    EmbeddingExecutor(inner, backoff_base=0.001, backoff_max=0.001).embed_batch(["a"])
+    assert sleeps[0] == 7.0 and sleeps[1] == 2.5
+
+
+def test_non_retryable_errors_propagate_at_once(sleeps):
+    inner = FakeEmbeddings(errors=[APIError(400)])
+    executor = EmbeddingExecutor(inner, batch_size=1)
+    with pytest.raises(APIError):
+        executor.embed_documents(["a", "b"])
+    assert sleeps == [] and executor.retries == 0
+
+
+def test_is_retryable_and_retry_after():
+    assert all(is_retryable(APIError(s)) for s in (408, 429, 500, 502, 503, 504))
+    assert not any(is_retryable(APIError(s)) for s in (400, 401, 404, 422))
+    assert is_retryable(TimeoutError()) and is_retryable(ConnectionResetError())
+    assert is_retryable(type("APIConnectionError", (Exception,), {})())
+    assert not is_retryable(ValueError("bad input"))
+    assert retry_after(APIError(429, {"retry-after": "soon"})) is None
+    assert retry_after(APIError(429)) is None
+
+
+def test_token_budget_paces_to_tokens_per_minute(monkeypatch):
+    now = [0.0]
+    slept = []
+
+    def sleep(seconds):
+        slept.append(seconds)
+        now[0] += seconds
+
+    monkeypatch.setattr(embed_executor.time, "monotonic", lambda: now[0])
+    monkeypatch.setattr(embed_executor.time, "sleep", sleep)
+    budget = TokenBudget(tokens_per_minute=600)  # 10 tokens per second
+    budget.acquire(600)
+    assert slept == []
+    budget.acquire(50)
+    assert slept == [5.0]
+    budget.acquire(10_000)  # capped at capacity, so a huge batch still gets through
+    assert slept[-1] == pytest.approx(60.0)
+    TokenBudget(0).acquire(10**9)  # disabled
+    assert len(slept) == 2
+
+
+def test_executor_counts_tokens_against_the_budget():
+    inner = FakeEmbeddings()
+    executor = EmbeddingExecutor(inner, batch_size=2, tokens_per_minute=10**9, count_tokens=lambda t: 5)
+    executor.embed_documents(["a", "b", "c"])
+    assert executor.tokens == 15
+
+
+def test_executor_owned_embeddings_have_no_sdk_retries():
+    assert clients.embeddings_model(max_retries=0).max_retries == 0
+    assert clients.embeddings_model().max_retries != 0
+    assert retriever._ingest_embeddings(None).max_retries == 0
+    assert retriever.get_embeddings().max_retries != 0
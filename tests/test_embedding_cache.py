@@ -0,0 +1,53 @@
+import asyncio
+
+from langchain_core.embeddings import Embeddings
+
+from src.embedding_cache import CachedEmbeddings
+
+
+class CountingEmbeddings(Embeddings):
+    def __init__(self):
+        self.seen: list[str] = []
+
+    def embed_documents(self, texts):
+        self.seen.extend(texts)
+        return [[float(len(t)), 1.0] for t in texts]
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+
+def test_only_unseen_texts_reach_the_model(tmp_path):
+    inner = CountingEmbeddings()
+    cache = CachedEmbeddings(inner, tmp_path / "emb.sqlite", model="m")
+    first = cache.embed_documents(["a", "bb", "a"])
+    assert first == [[1.0, 1.0], [2.0, 1.0], [1.0, 1.0]]
+    assert inner.seen == ["a", "bb"]
+
+    assert cache.embed_documents(["bb", "ccc"]) == [[2.0, 1.0], [3.0, 1.0]]
+    assert cache.embed_query("a") == [1.0, 1.0]
+    assert asyncio.run(cache.aembed_documents(["ccc"])) == [[3.0, 1.0]]
+    assert inner.seen == ["a", "bb", "ccc"]
+    assert cache.stats() == {"hits": 3, "misses": 3, "hit_rate": 0.5}
+
+
+def test_entries_survive_reopen_and_are_keyed_by_model(tmp_path):
+    path = tmp_path / "emb.sqlite"
+    CachedEmbeddings(CountingEmbeddings(), path, model="m").embed_documents(["a"])
+    inner = CountingEmbeddings()
+    CachedEmbeddings(inner, path, model="m").embed_documents(["a"])
+    assert inner.seen == []
+    CachedEmbeddings(inner, path, model="other").embed_documents(["a"])
+    assert inner.seen == ["a"]
+
+
+def test_least_recently_used_rows_are_evicted(tmp_path):
+    inner = CountingEmbeddings()
+    cache = CachedEmbeddings(inner, tmp_path / "emb.sqlite", model="m", max_entries=2)
+    cache.embed_documents(["a"])
+    cache.embed_documents(["bb"])
+    cache.embed_query("a")  # touch "a" so "bb" is the oldest
+    cache.embed_documents(["ccc"])
+    inner.seen.clear()
+    cache.embed_documents(["a", "ccc", "bb"])
+    assert inner.seen == ["bb"]
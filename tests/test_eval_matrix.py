@@ -0,0 +1,58 @@
+import asyncio
+
+from src import pipeline as pipeline_mod
+from src.eval_matrix import run_matrix
+from src.prompts import PROMPTS
+
+QUESTIONS = ["How are chunks embedded?", "What does ERR-999 mean?", "When does a request stop?"]
+
+
+def _texts(chunks) -> list[str]:
+    return [c.page_content for c in chunks]
+
+
+def test_matrix_retrieves_once_and_slices_k_prefixes(make_pipeline, fake_openai, monkeypatch):
+    monkeypatch.setitem(PROMPTS, "terse", ("Answer in five words.", "{context}\n\nQ: {question}"))
+    pipeline = make_pipeline(coalesce=False)
+    searches = []
+    real = pipeline_mod.retrieve_many
+
+    def retrieve_many(retriever, store, questions, vectors, k=4):
+        searches.append((len(questions), k))
+        return real(retriever, store, questions, vectors, k=k)
+
+    monkeypatch.setattr(pipeline_mod, "retrieve_many", retrieve_many)
+    embeds, chats = fake_openai.counts["embeddings"], fake_openai.counts["chat"]
+
+    results, timings = asyncio.run(pipeline.arun_matrix(QUESTIONS, ["v1", "terse"], [1, 3, 2]))
+    assert searches == [(3, 3)]  # one search, at the largest k
+    assert fake_openai.counts["embeddings"] - embeds == 1
+    assert fake_openai.counts["chat"] - chats == 2 * 3 * 3
+    assert set(timings) >= {"embed_query", "vector_search"}
+    assert set(results) == {(v, k) for v in ("v1", "terse") for k in (1, 2, 3)}
+
+    for i in range(len(QUESTIONS)):
+        full = _texts(results[("v1", 3)][i][1])
+        assert len(full) == 3
+        for v in ("v1", "terse"):
+            for k in (1, 2, 3):
+                assert _texts(results[(v, k)][i][1]) == full[:k]
+        # Same context, different prompt: the fake answers from the whole prompt, so answers differ.
+        assert results[("v1", 2)][i][0] != results[("terse", 2)][i][0]
+
+
+def test_empty_ks_uses_the_pipeline_k(make_pipeline):
+    pipeline = make_pipeline(coalesce=False)
+    results, _ = asyncio.run(pipeline.arun_matrix(QUESTIONS[:1], ["v1"], []))
+    assert list(results) == [("v1", pipeline._k)]
+
+
+def test_run_matrix_summarizes_each_cell(make_pipeline):
+    pipeline = make_pipeline(coalesce=False)
+    rows = [{"question": q, "expected": "unlikely"} for q in QUESTIONS[:2]]
+    report = run_matrix(pipeline, rows, ["v1"], [1, 2])
+    assert [(c["prompt_version"], c["k"], c["runs"], c["errors"]) for c in report["cells"]] == [
+        ("v1", 1, 2, 0),
+        ("v1", 2, 2, 0),
+    ]
+    assert len(report["records"]) == 4 and all("exact" in r for r in report["records"])
@@ -0,0 +1,52 @@
+import json
+
+from src.eval_runner import iter_eval_rows, load_checkpoint, run_batch_eval
+
+ROWS = [{"question": f"q{i}", "expected": f"a{i}"} for i in range(6)]
+
+
+def _score(answer, expected):
+    return 1.0 if answer == expected else 0.0
+
+
+def test_resume_runs_only_missing_and_failed_rows(tmp_path):
+    checkpoint = tmp_path / "results.jsonl"
+    asked = []
+
+    def flaky(question):
+        asked.append(question)
+        if question == "q2":
+            raise RuntimeError("upstream 500")
+        return {"answer": "a" + question[1:]}
+
+    summary = run_batch_eval(flaky, iter(ROWS[:4]), _score, checkpoint, workers=2)
+    assert summary == {"average": 0.75, "passed": 3, "total": 4, "errors": 1}
+    assert load_checkpoint(checkpoint) == {0, 1, 3}
+    with open(checkpoint, "a") as f:
+        f.write('{"index": 4, "question": "q4"')  # interrupted mid-write
+
+    asked.clear()
+    summary = run_batch_eval(
+        lambda q: asked.append(q) or {"answer": "a" + q[1:]}, iter(ROWS), _score, checkpoint, workers=2, resume=True
+    )
+    assert summary == {"average": 1.0, "passed": 6, "total": 6, "errors": 0}
+    assert sorted(asked) == ["q2", "q4", "q5"]  # the failed row, the torn one and the never-run one
+    assert load_checkpoint(checkpoint) == set(range(6))
+    records = [json.loads(line) for line in checkpoint.read_text().splitlines() if line.endswith("}")]
+    assert sorted(r["index"] for r in records if "error" not in r) == [0, 1, 2, 3, 4, 5]
+
+
+def test_without_resume_the_checkpoint_starts_over(tmp_path):
+    checkpoint = tmp_path / "results.jsonl"
+    run_batch_eval(lambda q: {"answer": "x"}, iter(ROWS), _score, checkpoint)
+    calls = []
+    run_batch_eval(lambda q: calls.append(q) or {"answer": "x"}, iter(ROWS[:2]), _score, checkpoint)
+    assert len(calls) == 2
+    assert load_checkpoint(checkpoint) == {0, 1}
+
+
+def test_iter_eval_rows_reads_json_and_jsonl(tmp_path):
+    (tmp_path / "set.json").write_text(json.dumps(ROWS[:2]))
+    (tmp_path / "set.jsonl").write_text("\n".join(json.dumps(r) for r in ROWS[:2]) + "\n\n")
+    assert list(iter_eval_rows(tmp_path / "set.json")) == ROWS[:2]
+    assert list(iter_eval_rows(tmp_path / "set.jsonl")) == ROWS[:2]
@@ -0,0 +1,29 @@
+import httpx
+
+from tests.fake_openai import FakeOpenAIServer, hashed_embedding
+
+
+def test_hashed_embedding_is_deterministic_and_unit_length():
+    a = hashed_embedding("chunks are embedded in batches", 64)
+    assert a == hashed_embedding("Chunks are embedded in batches", 64)
+    assert abs(sum(v * v for v in a) - 1.0) < 1e-9
+    assert hashed_embedding([1, 2, 3], 64) == hashed_embedding([1, 2, 3], 64)
+
+
+def test_server_answers_chat_and_embeddings_and_counts_them():
+    with FakeOpenAIServer(chat_latency=0.0, embed_latency=0.0, answer_words=5, dim=16) as server:
+        base = f"{server.url}/openai/deployments/test"
+        chat = httpx.post(f"{base}/chat/completions", json={"messages": [{"role": "user", "content": "hi there"}]})
+        assert chat.status_code == 200
+        assert len(chat.json()["choices"][0]["message"]["content"].split()) == 5
+        emb = httpx.post(f"{base}/embeddings", json={"input": ["one", "two"]})
+        assert [len(d["embedding"]) for d in emb.json()["data"]] == [16, 16]
+        assert httpx.get(f"{server.url}/stats").json() == {"chat": 1, "embeddings": 1, "errors": 0}
+
+
+def test_injected_errors_are_503_with_retry_after():
+    with FakeOpenAIServer(embed_latency=0.0, error_rate=1.0) as server:
+        resp = httpx.post(f"{server.url}/openai/deployments/test/embeddings", json={"input": "x"})
+        assert resp.status_code == 503
+        assert resp.headers["retry-after"] == "1"
+        assert server.counts["errors"] == 1
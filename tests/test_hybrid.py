@@ -0,0 +1,34 @@
+from src.hybrid import BM25Index, rrf, tokenize
+from src.retriever import get_retriever, retrieve_many
+
+
+def test_tokenize_keeps_codes_whole():
+    assert tokenize("Failed with ERR-999 on gpt-4o.") == ["failed", "with", "err-999", "on", "gpt-4o"]
+
+
+def test_bm25_search_and_remove():
+    index = BM25Index()
+    index.add("a", "the ingest service embeds chunks")
+    index.add("b", "ERR-999 means the batch was rejected")
+    assert [cid for cid, _ in index.search("err-999")] == ["b"]
+    index.remove(["b"])
+    assert index.search("err-999") == []
+    assert len(index) == 1
+
+
+def test_rrf_rewards_agreement():
+    assert rrf([["a", "b", "c"], ["b", "d"]])[:2] == ["b", "a"]
+
+
+def test_hybrid_on_chroma_fetches_keyword_only_hits(make_pipeline, monkeypatch):
+    from src import retriever
+
+    store = make_pipeline()._store
+    monkeypatch.setattr(retriever, "RETRIEVAL_MODE", "hybrid")
+    hybrid = get_retriever(store, k=2)
+    # Only the BM25 side can find the error code; the dense side gets nothing to fuse with.
+    docs = hybrid.fuse("ERR-999", [])
+    assert docs and "ERR-999" in docs[0].page_content
+    assert "ERR-999" in hybrid.invoke("ERR-999")[0].page_content
+    vector = store.embeddings.embed_query("ERR-999")
+    assert "ERR-999" in retrieve_many(hybrid, store, ["ERR-999"], [vector], k=2)[0][0].page_content
@@ -0,0 +1,104 @@
+import pytest
+from langchain_core.embeddings import Embeddings
+
+from src import clients
+from src.hybrid import BM25Index
+from src.retriever import ingest_full, ingest_incremental, load_manifest
+
+SETTINGS = {"chunk_size": 100, "chunk_overlap": 0, "workers": 1}
+
+SECTIONS = [
+    "Section one explains how the ingest manifest records file and chunk hashes for every source.",
+    "Section two explains how unchanged chunks keep their IDs when other parts of a file change.",
+    "Section three explains how chunks of deleted files are removed from the collection again.",
+]
+
+
+class FailingEmbeddings(Embeddings):
+    """Real (fake-server) embeddings that fail for good after `calls` requests."""
+
+    def __init__(self, calls: int):
+        self.inner = clients.embeddings_model()
+        self.calls = calls
+
+    def embed_documents(self, texts):
+        if self.calls <= 0:
+            raise ValueError("embedding service gave up")
+        self.calls -= 1
+        return self.inner.embed_documents(texts)
+
+    def embed_query(self, text):
+        return self.inner.embed_query(text)
+
+
+def _write(docs, name, sections):
+    (docs / name).write_text("\n\n".join(sections))
+
+
+def _ids(store) -> set[str]:
+    return set(store._collection.get(include=[])["ids"])
+
+
+def test_incremental_ingest_embeds_only_changes(data_dir, tmp_path, fake_openai):
+    docs = tmp_path / "docs"
+    docs.mkdir()
+    _write(docs, "guide.txt", SECTIONS)
+    _write(docs, "other.txt", ["A second file about serving questions over HTTP with deadlines."])
+
+    store, stats = ingest_incremental(docs, **SETTINGS)
+    assert stats["mode"] == "full"
+    assert stats["chunks_added"] == 4
+    first_ids = _ids(store)
+
+    calls = fake_openai.counts["embeddings"]
+    store, stats = ingest_incremental(docs, **SETTINGS)
+    assert stats["mode"] == "incremental"
+    assert (stats["files_changed"], stats["chunks_added"], stats["chunks_deleted"]) == (0, 0, 0)
+    assert fake_openai.counts["embeddings"] == calls
+    assert _ids(store) == first_ids
+
+    edited = SECTIONS[:2] + ["Section three now says deleted files are purged during the next incremental run."]
+    _write(docs, "guide.txt", edited)
+    store, stats = ingest_incremental(docs, **SETTINGS)
+    assert (stats["files_changed"], stats["chunks_added"], stats["chunks_deleted"]) == (1, 1, 1)
+    assert len(_ids(store) & first_ids) == 3  # the two untouched sections and other.txt kept their IDs
+
+    (docs / "other.txt").unlink()
+    store, stats = ingest_incremental(docs, **SETTINGS)
+    assert (stats["files_removed"], stats["chunks_deleted"]) == (1, 1)
+    assert len(_ids(store)) == 3
+    manifest = load_manifest(data_dir / "chroma" / "ingest_manifest.json")
+    assert set(manifest["files"]) == {"guide.txt"}
+
+    bm25 = BM25Index.load(data_dir / "chroma" / "bm25_index.json")
+    assert len(bm25) == 3
+    assert bm25.search("purged")
+    assert not bm25.search("http")
+
+
+def test_failed_file_keeps_previous_chunks(data_dir, tmp_path):
+    docs = tmp_path / "docs"
+    docs.mkdir()
+    _write(docs, "guide.txt", SECTIONS)
+    (docs / "broken.pdf").write_bytes(b"%PDF-1.4 not really a pdf")
+    store, stats = ingest_incremental(docs, **SETTINGS)
+    assert [f["source"] for f in stats["failed_files"]] == ["broken.pdf"]
+    assert stats["chunks_added"] == 3
+
+
+def test_failed_full_rebuild_is_repaired_by_next_incremental_run(data_dir, tmp_path):
+    docs = tmp_path / "docs"
+    docs.mkdir()
+    _write(docs, "guide.txt", SECTIONS)
+    store, _ = ingest_incremental(docs, **SETTINGS)
+    ids = _ids(store)
+
+    with pytest.raises(ValueError, match="gave up"):
+        ingest_full(docs, 100, 0, workers=1, batch_size=1, max_in_flight=1, embeddings=FailingEmbeddings(calls=1))
+    assert load_manifest(data_dir / "chroma" / "ingest_manifest.json") is None
+    assert not (data_dir / "chroma" / "bm25_index.json").exists()
+
+    store, stats = ingest_incremental(docs, **SETTINGS)
+    assert stats["mode"] == "full"
+    assert _ids(store) == ids
+    assert len(BM25Index.load(data_dir / "chroma" / "bm25_index.json")) == 3
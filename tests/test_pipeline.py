@@ -0,0 +1,31 @@
+import asyncio
+
+from src.retriever import chunks_by_ids
+
+
+def test_answer_cache_hit_on_chroma(make_pipeline, fake_openai):
+    pipeline = make_pipeline(answer_cache=True, coalesce=False)
+    first = pipeline.run("How are chunks embedded?")
+    assert not first["cache_hit"]
+    assert first["chunk_ids"]
+
+    before = fake_openai.counts["chat"]
+    hit = pipeline.run("How are chunks embedded?")
+    assert hit["cache_hit"]
+    assert fake_openai.counts["chat"] == before
+    assert hit["answer"] == first["answer"]
+    assert hit["chunk_ids"] == first["chunk_ids"]
+    assert [c.page_content for c in hit["retrieved_chunks"]] == [c.page_content for c in first["retrieved_chunks"]]
+
+    async_hit = asyncio.run(pipeline.arun("how are chunks   embedded?"))
+    assert async_hit["cache_hit"]
+    assert async_hit["chunk_ids"] == first["chunk_ids"]
+
+
+def test_chunks_by_ids_keeps_order_and_skips_unknown(make_pipeline):
+    store = make_pipeline()._store
+    ids = store._collection.get(include=[])["ids"]
+    docs = chunks_by_ids(store, [ids[1], "missing", ids[0]])
+    assert [d.id for d in docs] == [ids[1], ids[0]]
+    assert all(d.page_content and d.metadata["doc_id"] == d.id for d in docs)
+    assert chunks_by_ids(store, []) == []
@@ -0,0 +1,89 @@
+import asyncio
+import time
+
+import pytest
+from langchain_core.messages import HumanMessage
+
+from src.clients import chat_model
+from src.router import ChatRouter, ChatTarget, parse_targets
+from tests.fake_openai import FakeOpenAIServer
+
+MESSAGES = [HumanMessage(content="Which target answers?")]
+
+
+@pytest.fixture
+def servers():
+    """Two extra fake chat endpoints: slow (0.6s per reply) and fast."""
+    with FakeOpenAIServer(chat_latency=0.6) as slow, FakeOpenAIServer(chat_latency=0.0) as fast:
+        yield slow, fast
+
+
+def _router(servers, **kwargs) -> ChatRouter:
+    slow, fast = servers
+    return ChatRouter(
+        targets=[
+            ChatTarget("slow", chat_model(endpoint=slow.url, max_retries=0)),
+            ChatTarget("fast", chat_model(endpoint=fast.url, max_retries=0)),
+        ],
+        **kwargs,
+    )
+
+
+def _target(message) -> dict:
+    return message.response_metadata["router"]
+
+
+def test_parse_targets():
+    targets = parse_targets('["gpt-4o", {"deployment": "gpt-4o", "endpoint": "https://east.example.com"}]')
+    assert [t["name"] for t in targets] == ["gpt-4o", "gpt-4o@east.example.com"]
+    with pytest.raises(ValueError):
+        parse_targets('["gpt-4o", "gpt-4o"]')
+
+
+def test_routes_to_lowest_median_after_probing(servers):
+    router = _router(servers, hedge=False)
+    routed = [_target(router.invoke(MESSAGES))["target"] for _ in range(4)]
+    assert routed[:2] == ["slow", "fast"]  # each unmeasured target is probed once
+    assert routed[2:] == ["fast", "fast"]
+    assert not any(_target(router.invoke(MESSAGES))["hedged"] for _ in range(2))
+
+
+def test_failed_call_moves_to_next_target(servers):
+    slow, fast = servers
+    slow.error_rate = 1.0
+    router = _router(servers, hedge=False)
+    assert _target(router.invoke(MESSAGES))["target"] == "fast"
+    stats = {s["name"]: s for s in router.stats()}
+    assert stats["slow"]["errors"] == 1
+
+
+def test_unhealthy_target_sits_out(servers):
+    router = _router(servers, hedge=False)
+    slow = router.targets[0]
+    for _ in range(3):
+        slow.started()
+        slow.finished(0.01, ok=False)
+    assert not slow.healthy
+    assert [t.name for t in router.ranked()] == ["fast", "slow"]
+
+
+def test_sync_hedge_wins_on_backup(servers):
+    router = _router(servers, hedge=True, hedge_delay=0.05)
+    t0 = time.perf_counter()
+    routed = _target(router.invoke(MESSAGES))
+    assert routed == {"target": "fast", "deployment": "gpt-4o", "hedged": True}
+    assert time.perf_counter() - t0 < 0.5
+
+
+def test_async_hedge_wins_and_cancels_slow_call(servers):
+    router = _router(servers, hedge=True, hedge_delay=0.05)
+
+    async def main():
+        t0 = time.perf_counter()
+        message = await router.ainvoke(MESSAGES)
+        return message, time.perf_counter() - t0
+
+    message, seconds = asyncio.run(main())
+    assert _target(message) == {"target": "fast", "deployment": "gpt-4o", "hedged": True}
+    assert seconds < 0.5
+    assert router.targets[0].in_flight == 0  # cancelled, not left running
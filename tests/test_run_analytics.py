@@ -0,0 +1,57 @@
+import gzip
+import json
+
+from src.run_analytics import summarize, update_index
+
+
+def _rec(version: str, latency: float = 0.1, **extra) -> str:
+    return json.dumps({"prompt_version": version, "latency_seconds": latency, "ts": 1000.0, **extra}) + "\n"
+
+
+def _runs(groups) -> dict[str, int]:
+    return {row["prompt_version"]: row["runs"] for row in summarize(groups, by_window=False)}
+
+
+def _append(path, text: str):
+    with open(path, "a") as f:
+        f.write(text)
+
+
+def test_only_new_complete_lines_are_read(tmp_path):
+    log = tmp_path / "runs.jsonl"
+    _append(log, _rec("v1") + _rec("v2", input_tokens=10))
+    assert _runs(update_index(log)) == {"v1": 1, "v2": 1}
+
+    torn = _rec("v1")
+    _append(log, _rec("v1") + torn[:10])  # writer is mid-batch
+    assert _runs(update_index(log)) == {"v1": 2, "v2": 1}
+    index = json.loads((tmp_path / "runs.jsonl.index.json").read_text())
+    assert index["active"]["offset"] == log.stat().st_size - 10
+
+    _append(log, torn[10:])
+    groups = update_index(log)
+    assert _runs(groups) == {"v1": 3, "v2": 1}
+    assert summarize(groups, by_window=False)[1]["input_tokens"] == 10
+    assert _runs(update_index(log)) == {"v1": 3, "v2": 1}  # nothing new: nothing counted twice
+
+
+def test_rotated_segment_resumes_where_the_active_file_left_off(tmp_path):
+    log = tmp_path / "runs.jsonl"
+    _append(log, _rec("v1") + _rec("v1"))
+    update_index(log)
+    _append(log, _rec("v1"))  # written after the last update, then rotated away
+    with gzip.open(tmp_path / "runs-20260101-000000.jsonl.gz", "wb") as f:
+        f.write(log.read_bytes())
+    log.unlink()
+    _append(log, _rec("v2"))
+
+    assert _runs(update_index(log)) == {"v1": 3, "v2": 1}
+    assert _runs(update_index(log)) == {"v1": 3, "v2": 1}
+    assert _runs(update_index(log, rebuild=True)) == {"v1": 3, "v2": 1}
+
+
+def test_window_change_rebuilds_the_index(tmp_path):
+    log = tmp_path / "runs.jsonl"
+    _append(log, _rec("v1") + json.dumps({"prompt_version": "v1", "latency_seconds": 0.2, "ts": 4000.0}) + "\n")
+    assert set(update_index(log)) == {("v1", 0)}
+    assert set(update_index(log, window_seconds=3600)) == {("v1", 0), ("v1", 3600)}
@@ -0,0 +1,68 @@
+import gzip
+import json
+import threading
+import time
+
+import pytest
+
+from src.run_log import RunLogWriter
+
+
+def _lines(path) -> list[dict]:
+    return [json.loads(line) for line in path.read_text().splitlines()]
+
+
+def test_records_are_written_in_batches(tmp_path, monkeypatch):
+    path = tmp_path / "runs.jsonl"
+    writer = RunLogWriter(path, batch_size=3, flush_seconds=60)
+    batches = []
+    write_batch = writer._write_batch
+    monkeypatch.setattr(writer, "_write_batch", lambda batch: batches.append(len(batch)) or write_batch(batch))
+    for i in range(3):
+        writer.write({"i": i})
+    writer.write_many([{"i": 3}, {"i": 4}])
+    writer.flush()
+    assert batches == [3, 2]
+    assert [r["i"] for r in _lines(path)] == [0, 1, 2, 3, 4]
+    writer.close()
+
+
+def test_flush_seconds_writes_a_partial_batch(tmp_path):
+    path = tmp_path / "runs.jsonl"
+    writer = RunLogWriter(path, batch_size=100, flush_seconds=0.05)
+    writer.write({"i": 0})
+    for _ in range(40):
+        if path.exists():
+            break
+        time.sleep(0.05)
+    assert _lines(path) == [{"i": 0}]
+    writer.close()
+
+
+def test_rotation_gzips_full_segments(tmp_path):
+    path = tmp_path / "runs.jsonl"
+    writer = RunLogWriter(path, batch_size=1, max_bytes=50)
+    for i in range(3):
+        writer.write({"i": i, "pad": "x" * 40})
+    writer.close()
+    segments = sorted(tmp_path.glob("runs-*.jsonl.gz"))
+    assert len(segments) == 3
+    rows = [json.loads(gzip.decompress(s.read_bytes())) for s in segments]
+    assert sorted(r["i"] for r in rows) == [0, 1, 2]
+    assert not path.exists()
+    assert writer.written == 3
+
+
+def test_close_flushes_and_later_calls_do_not_hang(tmp_path):
+    path = tmp_path / "runs.jsonl"
+    writer = RunLogWriter(path, batch_size=100, flush_seconds=60)
+    writer.write({"i": 0})
+    writer.close()
+    assert _lines(path) == [{"i": 0}]
+    done = threading.Event()
+    t = threading.Thread(target=lambda: (writer.flush(), done.set()), daemon=True)
+    t.start()
+    assert done.wait(1.0)
+    writer.close()
+    with pytest.raises(RuntimeError):
+        writer.write({"i": 1})
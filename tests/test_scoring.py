@@ -0,0 +1,77 @@
+import numpy as np
+import pytest
+from langchain_core.embeddings import Embeddings
+
+from src.eval_runner import score_checkpoint
+from src.scoring import exact_match, normalize_answer, score_rows, summarize_scores, token_f1
+
+
+class AxisEmbeddings(Embeddings):
+    """Each distinct first word gets its own axis, so cosine is 1 for the same first word, else 0."""
+
+    def __init__(self):
+        self.calls: list[list[str]] = []
+        self.axes: dict[str, int] = {}
+
+    def embed_documents(self, texts):
+        self.calls.append(list(texts))
+        out = []
+        for t in texts:
+            axis = self.axes.setdefault(t.split()[0].lower(), len(self.axes))
+            vec = [0.0] * 8
+            vec[axis] = 3.0  # not unit length: the metric normalizes
+            out.append(vec)
+        return out
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+
+ANSWERS = ["The answer is Paris.", "paris", "Berlin", "London is big"]
+EXPECTED = ["Paris", "Paris", "Paris", "london is big"]
+
+
+def test_text_metrics():
+    assert normalize_answer("The  Answer, is a Paris!") == "answer is paris"
+    assert exact_match("The answer is Paris.", "paris") == 1.0
+    assert token_f1("paris france", "paris") == pytest.approx(2 / 3)
+    assert token_f1("", "") == 1.0 and token_f1("", "x") == 0.0
+
+
+def test_score_rows_aligns_every_metric_with_the_rows():
+    embeddings = AxisEmbeddings()
+    scores = score_rows(ANSWERS, EXPECTED, ["exact", "token_f1", "cosine"], embeddings)
+    assert set(scores) == {"exact", "token_f1", "cosine"}
+    assert all(v.dtype == np.float32 and len(v) == 4 for v in scores.values())
+    assert scores["exact"].tolist() == [1.0, 1.0, 0.0, 1.0]
+    assert scores["token_f1"][1] == 1.0 and scores["token_f1"][2] == 0.0
+    assert scores["cosine"].tolist() == pytest.approx([0.0, 1.0, 0.0, 1.0])
+    embedded = [t for call in embeddings.calls for t in call]
+    assert len(embedded) == len(set(embedded)) == 6  # "Paris" is embedded once for three rows
+
+
+def test_score_rows_rejects_unknown_metrics_and_needs_embeddings_for_cosine():
+    with pytest.raises(ValueError, match="Unknown metrics: bleu"):
+        score_rows(ANSWERS, EXPECTED, ["exact", "bleu"])
+    with pytest.raises(ValueError, match="embeddings"):
+        score_rows(ANSWERS, EXPECTED, ["cosine"])
+    assert score_rows([], [], ["exact", "cosine"], AxisEmbeddings())["cosine"].shape == (0,)
+
+
+def test_summarize_scores_uses_per_metric_thresholds():
+    scores = {"exact": np.array([1, 0, 1, 1], dtype=np.float32), "token_f1": np.array([0.4, 0.6], dtype=np.float32)}
+    summary = summarize_scores(scores, {"token_f1": 0.3})
+    assert summary["exact"] == {"mean": 0.75, "threshold": 1.0, "passed": 3, "total": 4, "pass_rate": 0.75}
+    assert summary["token_f1"]["passed"] == 2
+
+
+def test_score_checkpoint_uses_latest_successful_record(tmp_path):
+    checkpoint = tmp_path / "run.jsonl"
+    checkpoint.write_text(
+        '{"index": 0, "answer": "Berlin", "expected": "Paris"}\n'
+        '{"index": 1, "answer": "", "expected": "Rome", "error": "Timeout"}\n'
+        '{"index": 0, "answer": "Paris", "expected": "Paris"}\n'
+    )
+    summary = score_checkpoint(checkpoint, ["exact"])
+    assert summary["exact"]["total"] == 1 and summary["exact"]["passed"] == 1
+    assert (tmp_path / "run.scores.jsonl").read_text() == '{"index": 0, "exact": 1.0}\n'
@@ -0,0 +1,58 @@
+import pytest
+from langchain_core.messages import AIMessage, HumanMessage
+
+from src import usage
+from src.usage import cost_usd, count_message_tokens, count_tokens, response_usage
+
+
+def test_count_tokens_uses_the_tokenizer():
+    if usage._encoding("gpt-4o") is None:
+        pytest.skip("tiktoken encoding not available offline")
+    assert count_tokens("", "gpt-4o") == 0
+    assert count_tokens("hello world", "gpt-4o") == 2
+    assert count_tokens("ERR-4012 " * 50, "gpt-4o") > 50
+
+
+def test_count_tokens_falls_back_to_length_estimate(monkeypatch):
+    monkeypatch.setattr(usage, "_encoding", lambda model: None)
+    assert count_tokens("x" * 40, "gpt-4o") == 10
+    assert count_tokens("", "gpt-4o") == 1
+
+
+def test_message_tokens_include_chat_framing():
+    messages = [HumanMessage(content="hello world")]
+    assert count_message_tokens(messages, "gpt-4o") == count_tokens("hello world", "gpt-4o") + 4 + 3
+
+
+def test_response_usage_prefers_provider_counts():
+    messages = [HumanMessage(content="hello world")]
+    reported = AIMessage(content="hi", usage_metadata={"input_tokens": 11, "output_tokens": 3, "total_tokens": 14})
+    assert response_usage(reported, messages, "hi", "gpt-4o") == {
+        "input_tokens": 11,
+        "output_tokens": 3,
+        "token_source": "usage",
+    }
+    counted = response_usage(AIMessage(content="hi"), messages, "hi", "gpt-4o")
+    assert counted["token_source"] == "tokenizer"
+    assert counted["input_tokens"] == count_message_tokens(messages, "gpt-4o")
+    assert counted["output_tokens"] == count_tokens("hi", "gpt-4o")
+
+
+def test_cost_matches_the_longest_prefix():
+    assert cost_usd(1_000_000, 0, "gpt-4o-mini-2024-07-18") == 0.15
+    assert cost_usd(1_000_000, 1_000_000, "gpt-4o") == 12.5
+    assert cost_usd(1_000_000, 1_000_000, "GPT-4.1-mini") == 2.0
+    assert cost_usd(0, 1000, "gpt-4-turbo-2024-04-09") == 0.03
+    assert cost_usd(0, 1000, "gpt-4-0125-preview") == 0.03
+    assert cost_usd(1000, 0, "gpt-4-32k-0613") == 0.06
+    assert cost_usd(1000, 0, "gpt-4-0613") == 0.03
+    assert cost_usd(1000, 1000, "my-custom-deployment") is None
+
+
+def test_price_overrides_extend_and_replace_defaults():
+    prices = dict(usage._prices('{"My-Deployment": [1, 2], "GPT-4o": [5, 20]}'))
+    assert prices["my-deployment"] == (1, 2)
+    assert prices["gpt-4o"] == (5, 20)
+    assert prices["gpt-4o-mini"] == (0.15, 0.60)
+    assert dict(usage._prices("not json")) == dict(usage._prices(""))
+    assert dict(usage._prices("[1, 2]")) == dict(usage._prices(""))
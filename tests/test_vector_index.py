@@ -0,0 +1,59 @@
+import threading
+
+from src import retriever
+from src.retriever import build_numpy_index, open_search_store
+from src.vector_index import NumpyVectorStore, read_meta
+
+
+def _leftovers(data_dir) -> list[str]:
+    return [p.name for p in data_dir.iterdir() if ".tmp-" in p.name or ".old-" in p.name]
+
+
+def test_workers_starting_together_export_once(make_pipeline, data_dir, monkeypatch):
+    store = make_pipeline()._store
+    monkeypatch.setattr(retriever, "RETRIEVER_BACKEND", "numpy")
+    exports = []
+    export = retriever._export_numpy_index
+
+    def counting_export(*args):
+        exports.append(1)
+        return export(*args)
+
+    monkeypatch.setattr(retriever, "_export_numpy_index", counting_export)
+    barrier = threading.Barrier(4)
+    opened = []
+
+    def worker():
+        barrier.wait()
+        opened.append(open_search_store(store))
+
+    threads = [threading.Thread(target=worker) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(exports) == 1
+    assert len(opened) == 4 and all(isinstance(s, NumpyVectorStore) for s in opened)
+    assert {len(s) for s in opened} == {store._collection.count()}
+    assert _leftovers(data_dir) == []
+
+
+def test_reexport_keeps_open_readers_working(make_pipeline, data_dir):
+    store = make_pipeline()._store
+    path = data_dir / "vector_index"
+    build_numpy_index(store, path)
+    reader = NumpyVectorStore.load(path, store.embeddings)
+    vector = store.embeddings.embed_query("ERR-999")
+    before = [c.id for c in reader.similarity_search_by_vector(vector, k=2)]
+    created = read_meta(path)["created"]
+
+    threads = [threading.Thread(target=build_numpy_index, args=(store, path)) for _ in range(3)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert read_meta(path)["created"] > created
+    assert [c.id for c in reader.similarity_search_by_vector(vector, k=2)] == before
+    assert [c.page_content for c in reader.get_by_ids(before)]  # old chunk store still mapped
+    assert [c.id for c in NumpyVectorStore.load(path, store.embeddings).similarity_search_by_vector(vector, k=2)] == before
+    assert _leftovers(data_dir) == []